@@ -1,9 +1,293 @@
+import datetime
+import json
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, router, transaction
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from api import outbox, sharding
+from api.deletion import delete_objects
+from api.events import publish_appointment
+from api.models import Speciality, Exercise, Patient, Doctor, Appointment, AppointmentQuerySet, OutboxEvent
+
+
+def estimate_count(queryset):
+    """
+    Оценивает количество записей QuerySet'а по плану запроса (EXPLAIN) без выполнения COUNT(*).
+    Оценка доступна только на Postgres и тем точнее, чем свежее статистика таблицы (ANALYZE).
+
+    Parameters:
+        queryset (QuerySet): Записи, количество которых оценивается.
+
+    Returns:
+        int or None: Ожидаемое планировщиком количество строк или None, если оценка недоступна.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор, который для больших выборок берет количество записей из оценки планировщика вместо COUNT(*).
+
+    Точное количество считается, только если планировщик ожидает меньше ADMIN_ESTIMATED_COUNT_MIN строк.
+    Количество страниц при этом приблизительное: последние страницы могут оказаться неполными или пустыми.
+
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_MIN:
+            return estimate
+        return super().count
+
+
+def _truncate(value, kind):
+    """
+    Усекает дату до начала года, месяца или дня в текущем часовом поясе.
+
+    Parameters:
+        value (datetime): Дата с часовым поясом.
+        kind (str): "year", "month" или "day".
+
+    Returns:
+        datetime: Начало периода.
+    """
+    value = timezone.make_naive(value).replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind in ('year', 'month'):
+        value = value.replace(day=1)
+    if kind == 'year':
+        value = value.replace(month=1)
+    return timezone.make_aware(value)
+
+
+def _next_period(start, kind):
+    """
+    Возвращает начало следующего года, месяца или дня.
+
+    Parameters:
+        start (datetime): Начало периода.
+        kind (str): "year", "month" или "day".
+
+    Returns:
+        datetime: Начало следующего периода.
+    """
+    start = timezone.make_naive(start)
+    if kind == 'year':
+        start = start.replace(year=start.year + 1)
+    elif kind == 'month':
+        start = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    else:
+        start += datetime.timedelta(days=1)
+    return timezone.make_aware(start)
+
+
+class DateProbingQuerySet(AppointmentQuerySet):
+    """
+    QuerySet назначений для иерархии дат в админке.
+
+    Django строит иерархию запросом SELECT DISTINCT по усеченной дате, который читает все строки выборки.
+    Здесь периоды находятся перескоками по индексу api_appointment_date: первая дата не раньше начала
+    следующего периода ищется запросом с ORDER BY ... LIMIT 1, поэтому на каждый год, месяц или день,
+    в котором есть назначения, выполняется один запрос, читающий одну запись индекса.
+
+    Methods:
+        datetimes(field_name, kind, order='ASC', tzinfo=None): Периоды, в которых есть записи.
+
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month', 'day') or tzinfo is not None:
+            return super().datetimes(field_name, kind, order, tzinfo)
+
+        dates = self.order_by(field_name).values_list(field_name, flat=True)
+        periods = []
+        value = dates.first()
+        while value is not None:
+            periods.append(_truncate(timezone.localtime(value), kind))
+            value = dates.filter(**{f'{field_name}__gte': _next_period(periods[-1], kind)}).first()
+        return periods if order == 'ASC' else periods[::-1]
+
+
+class PurgeDeleteMixin:
+    """
+    Примесь для админки моделей, удаление которых затрагивает назначения во всех шардах.
+
+    Стандартное удаление Django собирает зависимые записи в память и только в одной БД, поэтому назначения
+    в других шардах остались бы, а события об удалении не попали бы в outbox. Здесь объекты удаляются
+    функцией api.deletion.delete_objects(), как через API, а страница подтверждения не перечисляет
+    зависимые записи.
+
+    """
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        delete_objects(type(obj), [obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        delete_objects(queryset.model, queryset.values_list('pk', flat=True))
+
+
+class OutboxSaveMixin:
+    """
+    Примесь для админки моделей, изменения которых передаются внешним системам через outbox.
+
+    Объект сохраняется функцией api.outbox.save(), как через API: в одной транзакции с событием о создании
+    или изменении (для назначений - в шарде пациента).
+
+    """
+
+    def save_model(self, request, obj, form, change):
+        outbox.save(obj, OutboxEvent.UPDATE if change else OutboxEvent.CREATE)
+
+
+def request_shard(request):
+    """
+    Возвращает шард назначений, выбранный в админке параметром shard.
+
+    На страницах изменения и удаления параметр берется из сохраненных фильтров списка (_changelist_filters).
+
+    Parameters:
+        request (HttpRequest): Объект запроса.
+
+    Returns:
+        str: Алиас БД шарда, по умолчанию - первый шард.
+    """
+    params = request.GET
+    if '_changelist_filters' in params:
+        params = QueryDict(params['_changelist_filters'])
+    alias = params.get(ShardListFilter.parameter_name)
+    return alias if alias in sharding.shards() else sharding.shards()[0]
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """
+    Выбор шарда в списке назначений. Шард применяет AppointmentAdmin.get_queryset(), поэтому фильтр
+    не меняет QuerySet, а варианта "Все" нет: назначения разных шардов хранятся в разных БД.
+
+    """
+    title = 'шард'
+    parameter_name = 'shard'
+
+    def __init__(self, request, params, model, model_admin):
+        self.shard = request_shard(request)
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in sharding.shards()]
+
+    def queryset(self, request, queryset):
+        return queryset
+
+    def choices(self, changelist):
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == self.shard,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+
+@admin.register(Speciality)
+class SpecialityAdmin(PurgeDeleteMixin, admin.ModelAdmin):
+    list_display = ('id', 'title')
+    search_fields = ('title',)
+
+
+@admin.register(Exercise)
+class ExerciseAdmin(OutboxSaveMixin, PurgeDeleteMixin, admin.ModelAdmin):
+    ordering = ('id',)
+    list_display = ('id', 'title', 'frequency')
+    list_filter = ('frequency',)
+    search_fields = ('=id', '^title')
+    autocomplete_fields = ('specialisations',)
+
+
+@admin.register(Patient)
+class PatientAdmin(OutboxSaveMixin, PurgeDeleteMixin, admin.ModelAdmin):
+    ordering = ('id',)
+    list_display = ('id', 'name')
+    search_fields = ('=id', '^name')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Doctor)
+class DoctorAdmin(OutboxSaveMixin, PurgeDeleteMixin, admin.ModelAdmin):
+    ordering = ('id',)
+    list_display = ('id', 'name', 'speciality')
+    list_select_related = ('speciality',)
+    list_filter = ('speciality',)
+    search_fields = ('=id', '^name')
+    autocomplete_fields = ('speciality', 'patients')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Appointment)
+class AppointmentAdmin(OutboxSaveMixin, admin.ModelAdmin):
+    """
+    Назначения в админке. Показываются назначения одного шарда, выбранного фильтром "шард", по умолчанию
+    первого (см. api/sharding.py). Пациента назначения изменить нельзя: назначение пришлось бы переносить
+    в другой шард.
+
+    Как и в API, изменения записываются вместе с событиями outbox в шарде назначения, а о новых назначениях
+    публикуется событие для потока SSE (см. api/events.py).
+
+    """
+    list_display = ('id', 'appointment_date', 'doctor', 'patient', 'exercise')
+    list_filter = (ShardListFilter,)
+    list_select_related = ('doctor__speciality', 'patient', 'exercise')
+    raw_id_fields = ('doctor', 'patient', 'exercise')
+    date_hierarchy = 'appointment_date'
+    ordering = ('-appointment_date',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        alias = request_shard(request)
+        queryset = DateProbingQuerySet(model=queryset.model, query=queryset.query, using=alias)
+        if alias != router.db_for_write(Doctor):
+            # Врачи, пациенты и упражнения в другой БД: вместо JOIN - отдельные запросы на страницу
+            queryset = queryset.prefetch_related(*self.list_select_related)
+        return queryset
+
+    def get_list_select_related(self, request):
+        return self.list_select_related if request_shard(request) == router.db_for_write(Doctor) else False
+
+    def get_readonly_fields(self, request, obj=None):
+        return ('patient',) if obj is not None else ()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            publish_appointment(obj)
 
-from api.models import Speciality, Exercise, Patient, Doctor, Appointment
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Appointment._base_manager.using(obj._state.db).filter(pk=obj.pk))
 
-admin.register(Speciality)
-admin.register(Exercise)
-admin.register(Patient)
-admin.register(Doctor)
-admin.register(Appointment)
+    def delete_queryset(self, request, queryset):
+        alias = queryset.db
+        with transaction.atomic(using=alias):
+            pks = list(queryset.prefetch_related(None).values_list('pk', flat=True))
+            Appointment._base_manager.using(alias).filter(pk__in=pks)._raw_delete(alias)
+            outbox.record_deleted(Appointment, pks, alias)
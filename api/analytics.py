@@ -0,0 +1,203 @@
+import datetime
+from collections import Counter
+
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from api import sharding
+from api.models import Appointment, Doctor, Exercise
+
+#: Допустимые значения параметра period, совпадающие с kind функции Trunc.
+PERIODS = ('hour', 'day', 'week', 'month')
+
+
+def parse_window(params, default_days=30):
+    """
+    Разбирает временное окно и шаг группировки из параметров запроса.
+
+    Parameters:
+        params (QueryDict): GET-параметры запроса: from, to (YYYY-MM-DD) и period (hour, day, week или month).
+        default_days (int): Длина окна в днях, если параметр from не указан.
+
+    Returns:
+        tuple: Начало окна (datetime), конец окна (datetime, не включительно) и шаг группировки (str).
+
+    Raises:
+        ValueError: Если параметры указаны в неверном формате.
+    """
+    period = params.get('period', 'day')
+    if period not in PERIODS:
+        raise ValueError(f'Параметр period должен быть одним из: {", ".join(PERIODS)}.')
+
+    if 'to' in params:
+        end = datetime.datetime.fromisoformat(params['to']) + datetime.timedelta(days=1)
+    else:
+        end = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+    if 'from' in params:
+        start = datetime.datetime.fromisoformat(params['from'])
+    else:
+        start = end - datetime.timedelta(days=default_days)
+
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    if start >= end:
+        raise ValueError('Параметр from должен быть раньше параметра to.')
+
+    return start, end, period
+
+
+def _appointments(start, end):
+    """
+    Возвращает назначения, попадающие во временное окно, без мягко удаленных врачей, пациентов и упражнений.
+
+    Parameters:
+        start (datetime): Начало окна.
+        end (datetime): Конец окна (не включительно).
+
+    Returns:
+        QuerySet: Назначения без сортировки, чтобы не мешать группировке.
+    """
+    return Appointment.objects.filter(appointment_date__gte=start, appointment_date__lt=end) \
+        .exclude_deleted('doctor', 'patient', 'exercise').order_by()
+
+
+def _count_appointments(start, end, field, period=None):
+    """
+    Считает назначения за окно с группировкой по полю и, если указано, по интервалам времени.
+
+    Назначения хранятся в шардах (см. api/sharding.py), поэтому группирующий запрос выполняется на каждом
+    шарде, а счетчики суммируются. Группировка идет только по столбцам таблицы назначений, без соединений
+    с таблицами основной БД.
+
+    Parameters:
+        start (datetime): Начало окна.
+        end (datetime): Конец окна (не включительно).
+        field (str): Столбец группировки, например "doctor_id".
+        period (str, optional): Шаг группировки по времени (hour, day, week или month).
+
+    Returns:
+        Counter: Количество назначений по значению поля или по паре (интервал, значение поля).
+    """
+    queryset = _appointments(start, end)
+    fields = [field]
+    if period is not None:
+        queryset = queryset.annotate(period=Trunc('appointment_date', period))
+        fields = ['period', field]
+
+    counts = Counter()
+    for shard_queryset in sharding.fan_out(queryset.values(*fields).annotate(count=Count('id'))):
+        for row in shard_queryset:
+            key = tuple(row[name] for name in fields)
+            counts[key if period is not None else key[0]] += row['count']
+    return counts
+
+
+def doctor_workload(start, end):
+    """
+    Считает для каждого врача количество пациентов и количество назначений за окно.
+
+    Оба показателя считаются группировкой на стороне БД: по таблице связей врач-пациент и по таблице назначений,
+    без соединения этих таблиц между собой.
+
+    Parameters:
+        start (datetime): Начало окна.
+        end (datetime): Конец окна (не включительно).
+
+    Returns:
+        list of dict: Записи с полями doctor_id, name, patients и appointments.
+    """
+    patients = dict(
+        Doctor.patients.through.objects
+        .filter(patient__deleted_at__isnull=True)
+        .values('doctor_id')
+        .annotate(count=Count('patient_id'))
+        .values_list('doctor_id', 'count')
+    )
+    appointments = _count_appointments(start, end, 'doctor_id')
+
+    return [
+        {
+            'doctor_id': pk,
+            'name': name,
+            'patients': patients.get(pk, 0),
+            'appointments': appointments.get(pk, 0),
+        }
+        for pk, name in Doctor.objects.order_by('pk').values_list('pk', 'name')
+    ]
+
+
+def appointments_by_speciality(start, end, period):
+    """
+    Считает назначения за окно в разрезе специальностей врачей и интервалов времени.
+
+    Parameters:
+        start (datetime): Начало окна.
+        end (datetime): Конец окна (не включительно).
+        period (str): Шаг группировки (hour, day, week или month).
+
+    Returns:
+        list of dict: Записи с полями period, speciality_id, speciality и appointments.
+    """
+    specialities = {
+        pk: (speciality_id, title)
+        for pk, speciality_id, title in Doctor.all_objects.values_list('pk', 'speciality_id', 'speciality__title')
+    }
+
+    counts = Counter()
+    for (period_start, doctor_id), count in _count_appointments(start, end, 'doctor_id', period).items():
+        counts[period_start, *specialities.get(doctor_id, (None, None))] += count
+
+    return [
+        {
+            'period': period_start,
+            'speciality_id': speciality_id,
+            'speciality': title,
+            'appointments': count,
+        }
+        for (period_start, speciality_id, title), count in sorted(counts.items(), key=_sort_key)
+    ]
+
+
+def appointments_by_frequency(start, end, period):
+    """
+    Считает назначения за окно в разрезе частоты выполнения упражнений и интервалов времени.
+
+    Parameters:
+        start (datetime): Начало окна.
+        end (datetime): Конец окна (не включительно).
+        period (str): Шаг группировки (hour, day, week или month).
+
+    Returns:
+        list of dict: Записи с полями period, frequency и appointments.
+    """
+    frequencies = dict(Exercise.all_objects.values_list('pk', 'frequency'))
+
+    counts = Counter()
+    for (period_start, exercise_id), count in _count_appointments(start, end, 'exercise_id', period).items():
+        counts[period_start, frequencies.get(exercise_id)] += count
+
+    return [
+        {
+            'period': period_start,
+            'frequency': frequency,
+            'appointments': count,
+        }
+        for (period_start, frequency), count in sorted(counts.items(), key=_sort_key)
+    ]
+
+
+def _sort_key(item):
+    """
+    Ключ сортировки записей отчета: по интервалу, затем по остальным полям группировки.
+
+    Parameters:
+        item (tuple): Пара (ключ группировки, количество).
+
+    Returns:
+        tuple: Ключ сортировки, устойчивый к пустым значениям.
+    """
+    key, _ = item
+    return tuple((value is None, value if value is not None else 0) for value in key)
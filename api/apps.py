@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Регистрируем фоновые задачи, чтобы они были доступны и воркерам, и веб-процессам
+        from api import tasks  # noqa: F401
+        # Подключаем сигналы, сбрасывающие снимок связей врачей, пациентов и упражнений
+        from api import permission_graph  # noqa: F401
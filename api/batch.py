@@ -0,0 +1,162 @@
+import collections
+
+from django.conf import settings
+
+from api.models import Doctor, Exercise, Patient
+
+#: Наибольший ID: первичные ключи - bigint.
+MAX_ID = 2 ** 63 - 1
+
+
+class Relation:
+    """
+    Связь "многие ко многим", которая в ответе представлена списком ID связанных объектов.
+
+    ID загружаются одним запросом к промежуточной таблице сразу для всех записей ответа.
+
+    Methods:
+        load(ids): Загружает ID связанных объектов.
+
+    """
+
+    def __init__(self, through, source, target, **filters):
+        self.through = through
+        self.source = source
+        self.target = target
+        self.filters = filters
+
+    def load(self, ids=None):
+        """
+        Загружает ID связанных объектов.
+
+        Parameters:
+            ids (list of int, optional): ID записей. Если не указаны - для всех записей.
+
+        Returns:
+            dict: Отсортированный список ID связанных объектов по ID записи.
+        """
+        queryset = self.through.objects.filter(**self.filters)
+        if ids is not None:
+            queryset = queryset.filter(**{f'{self.source}__in': ids})
+
+        related = collections.defaultdict(list)
+        for source_id, target_id in queryset.order_by(self.source, self.target).values_list(self.source, self.target):
+            related[source_id].append(target_id)
+        return related
+
+
+#: Поля ответа, доступные в параметре fields: столбец модели или связь "многие ко многим".
+#: Связи с мягко удаленными записями не возвращаются, как и в HTML-страницах.
+FIELDS = {
+    Doctor: {
+        'id': 'id',
+        'name': 'name',
+        'speciality': 'speciality_id',
+        'patients': Relation(Doctor.patients.through, 'doctor_id', 'patient_id', patient__deleted_at__isnull=True),
+    },
+    Patient: {
+        'id': 'id',
+        'name': 'name',
+        'doctors': Relation(Doctor.patients.through, 'patient_id', 'doctor_id', doctor__deleted_at__isnull=True),
+    },
+    Exercise: {
+        'id': 'id',
+        'title': 'title',
+        'description': 'description',
+        'frequency': 'frequency',
+        'specialisations': Relation(Exercise.specialisations.through, 'exercise_id', 'speciality_id'),
+    },
+}
+
+
+def parse_ids(value):
+    """
+    Разбирает список ID из параметра ids. Повторяющиеся ID отбрасываются, чтобы каждая запись
+    загружалась один раз.
+
+    Parameters:
+        value (str): Значение параметра, например "1,2,3".
+
+    Returns:
+        list of int: ID в порядке первого упоминания.
+
+    Raises:
+        ValueError: Если ID указаны в неверном формате, вне диапазона 1..MAX_ID или их больше BATCH_MAX_IDS.
+    """
+    try:
+        ids = list(dict.fromkeys(int(item) for item in value.split(',') if item.strip()))
+        # ID вне диапазона bigint не сравниваются с первичным ключом в БД
+        if not all(1 <= pk <= MAX_ID for pk in ids):
+            raise ValueError
+    except ValueError:
+        raise ValueError('Параметр ids должен содержать целые ID через запятую.')
+    if not ids:
+        raise ValueError('Параметр ids не должен быть пустым.')
+    if len(ids) > settings.BATCH_MAX_IDS:
+        raise ValueError(f'Можно запросить не больше {settings.BATCH_MAX_IDS} записей.')
+    return ids
+
+
+def parse_fields(value, available):
+    """
+    Разбирает список полей из параметра fields.
+
+    Parameters:
+        value (str or None): Значение параметра, например "name,speciality". Если не указано - все поля.
+        available (dict): Поля, доступные для модели (см. FIELDS).
+
+    Returns:
+        list of str: Имена полей. Поле id возвращается всегда.
+
+    Raises:
+        ValueError: Если указано неизвестное поле.
+    """
+    if value is None:
+        return list(available)
+
+    fields = ['id'] + [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f'Неизвестные поля: {", ".join(unknown)}. Доступные поля: {", ".join(available)}.')
+    return list(dict.fromkeys(fields))
+
+
+def lookup(queryset, params, pk=None):
+    """
+    Загружает записи по списку ID одним запросом, выбирая из БД только запрошенные столбцы.
+    Каждая запрошенная связь "многие ко многим" загружается еще одним запросом для всех записей сразу.
+
+    Parameters:
+        queryset (QuerySet): Записи модели из FIELDS.
+        params (QueryDict): GET-параметры запроса: ids (ID через запятую) и fields (поля через запятую).
+        pk (int, optional): ID одной записи, если запрос к деталям записи. Без pk параметр ids обязателен:
+            количество записей в ответе ограничено BATCH_MAX_IDS.
+
+    Returns:
+        tuple: Записи (list of dict) в порядке запрошенных ID и запрошенные ID, которых нет (list of int).
+
+    Raises:
+        ValueError: Если параметры указаны в неверном формате или для списка не указан параметр ids.
+    """
+    available = FIELDS[queryset.model]
+    fields = parse_fields(params.get('fields'), available)
+    if pk is not None:
+        ids = [pk]
+    elif 'ids' in params:
+        ids = parse_ids(params['ids'])
+    else:
+        raise ValueError('Параметр fields для списка указывается вместе с параметром ids.')
+
+    columns = {field: available[field] for field in fields if isinstance(available[field], str)}
+    rows = {
+        values[0]: dict(zip(columns, values))
+        for values in queryset.filter(pk__in=ids).values_list(*columns.values())
+    }
+
+    for field in fields:
+        if isinstance(available[field], Relation):
+            related = available[field].load(list(rows))
+            for row_id, row in rows.items():
+                row[field] = related.get(row_id, [])
+
+    return [rows[row_id] for row_id in ids if row_id in rows], [row_id for row_id in ids if row_id not in rows]
@@ -0,0 +1,134 @@
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+#: Типы содержимого, которые имеет смысл сжимать.
+COMPRESSIBLE_TYPES = (
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'image/svg+xml',
+)
+
+
+def gzip_compress(data):
+    """
+    Сжимает данные gzip. Уровень 6 - компромисс между размером и затратами CPU для динамических ответов.
+
+    Parameters:
+        data (bytes): Исходные данные.
+
+    Returns:
+        bytes: Сжатые данные.
+    """
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def gzip_compress_sequence(sequence):
+    """
+    Потоково сжимает последовательность фрагментов gzip, отдавая сжатые данные после каждого фрагмента.
+
+    Parameters:
+        sequence (iterable of bytes): Исходные фрагменты.
+
+    Yields:
+        bytes: Сжатые фрагменты.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in sequence:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def brotli_compress(data):
+    """
+    Сжимает данные brotli с качеством 5, подходящим для сжатия на лету.
+
+    Parameters:
+        data (bytes): Исходные данные.
+
+    Returns:
+        bytes: Сжатые данные.
+    """
+    return brotli.compress(data, quality=5)
+
+
+def brotli_compress_sequence(sequence):
+    """
+    Потоково сжимает последовательность фрагментов brotli, отдавая сжатые данные после каждого фрагмента.
+
+    Parameters:
+        sequence (iterable of bytes): Исходные фрагменты.
+
+    Yields:
+        bytes: Сжатые фрагменты.
+    """
+    compressor = brotli.Compressor(quality=5)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+#: Поддерживаемые кодировки в порядке предпочтения: (имя, функция сжатия, функция потокового сжатия).
+ENCODINGS = [
+    encoding for encoding in (
+        ('br', brotli_compress, brotli_compress_sequence),
+        ('gzip', gzip_compress, gzip_compress_sequence),
+    )
+    if encoding[0] != 'br' or brotli is not None
+]
+
+
+def accepted_encodings(header):
+    """
+    Разбирает заголовок Accept-Encoding.
+
+    Parameters:
+        header (str): Значение заголовка, например "gzip, deflate, br;q=0.9".
+
+    Returns:
+        set of str: Кодировки, принимаемые клиентом (с ненулевым q).
+    """
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.lower())
+    return accepted
+
+
+def negotiate(header):
+    """
+    Выбирает кодировку сжатия для ответа.
+
+    Parameters:
+        header (str): Значение заголовка Accept-Encoding.
+
+    Returns:
+        tuple or None: Кортеж (имя, функция сжатия, функция потокового сжатия) или None, если сжимать нельзя.
+    """
+    accepted = accepted_encodings(header)
+    for encoding in ENCODINGS:
+        if encoding[0] in accepted or '*' in accepted:
+            return encoding
+    return None
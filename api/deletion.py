@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.db import models, router, transaction
+from django.http import Http404
+from django.utils import timezone
+
+from api import outbox, permission_graph, sharding, taskqueue
+from api.models import SoftDeleteModel
+
+#: Количество зависимых записей, которые удаляются одним запросом вместе с событиями об удалении.
+CASCADE_BATCH_SIZE = 1000
+
+
+def _purge_cascade(queryset, using):
+    """
+    Удаляет зависимые записи пачками по CASCADE_BATCH_SIZE, каждую пачку - в собственной короткой транзакции
+    вместе с событиями об их удалении (см. api/outbox.py).
+
+    В память загружаются только ID записей пачки: события и удаление относятся к одним и тем же записям, поэтому
+    запись, добавленная во время удаления, не может быть удалена без события. События добавляются последними,
+    непосредственно перед фиксацией, чтобы их ID оставались незафиксированными как можно меньше времени.
+
+    Parameters:
+        queryset (QuerySet): Зависимые записи.
+        using (str): Алиас базы данных.
+    """
+    model = queryset.model
+    while True:
+        with transaction.atomic(using=using):
+            pks = list(queryset.values_list('pk', flat=True)[:CASCADE_BATCH_SIZE])
+            if not pks:
+                return
+            _purge_queryset(model._base_manager.using(using).filter(pk__in=pks), using)
+            outbox.record_deleted(model, pks, using)
+        if len(pks) < CASCADE_BATCH_SIZE:
+            return
+
+
+def _purge_shards(model, pks):
+    """
+    Удаляет записи шардируемых моделей, которые зависят от объектов модели по внешним ключам с on_delete=CASCADE
+    напрямую (например, Appointment.doctor) или через другие каскадные связи (Doctor.speciality).
+
+    Шарды - отдельные БД, поэтому записи удаляются до транзакции удаления самих объектов, на каждом шарде
+    функцией _purge_cascade() короткими транзакциями. Если удаление прервется, повторный вызов удалит
+    оставшиеся записи.
+
+    Parameters:
+        model (Model): Класс модели, объекты которой удаляются.
+        pks (list): Список идентификаторов удаляемых объектов.
+    """
+    for relation in model._meta.related_objects:
+        if relation.many_to_many or relation.on_delete is not models.CASCADE:
+            continue
+        related_model = relation.related_model
+        lookup = {f'{relation.field.name}__in': pks}
+        if sharding.is_sharded(related_model):
+            for alias in sharding.shards():
+                _purge_cascade(related_model._base_manager.using(alias).filter(**lookup), alias)
+        else:
+            related_pks = list(related_model._base_manager.filter(**lookup).values_list('pk', flat=True))
+            if related_pks:
+                _purge_shards(related_model, related_pks)
+
+
+def _purge_queryset(queryset, using):
+    """
+    Удаляет записи QuerySet'а вместе с зависимыми записями той же БД, не загружая их в память.
+
+    Учитываются промежуточные таблицы связей "многие ко многим" в обе стороны (например, Doctor.patients
+    для Doctor и Patient) и обратные внешние ключи с on_delete=CASCADE, которые обрабатываются рекурсивно.
+    Связи удаляются одним запросом DELETE с подзапросом на таблицу, без отдельных событий: связь исчезает
+    вместе с объектом, о котором потребители получают событие удаления. Записи по внешним ключам удаляются
+    функцией _purge_cascade() вместе с событиями об удалении. Зависимые записи шардируемых моделей должны быть
+    удалены заранее функцией _purge_shards().
+
+    Parameters:
+        queryset (QuerySet): Удаляемые записи.
+        using (str): Алиас базы данных.
+
+    Returns:
+        int: Количество удаленных записей QuerySet'а (без учета зависимых записей).
+    """
+    model = queryset.model
+    pks = queryset.values('pk')
+
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        through._base_manager.filter(**{f'{field.m2m_field_name()}__in': pks})._raw_delete(using)
+
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            through = relation.through
+            through._base_manager.filter(**{f'{relation.field.m2m_reverse_field_name()}__in': pks})._raw_delete(using)
+        elif relation.on_delete is models.CASCADE and not sharding.is_sharded(relation.related_model):
+            related_queryset = relation.related_model._base_manager.using(using)
+            _purge_cascade(related_queryset.filter(**{f'{relation.field.name}__in': pks}), using)
+
+    return queryset._raw_delete(using)
+
+
+def purge(model, pks):
+    """
+    Физически удаляет объекты модели и все зависимые записи набором DELETE-запросов.
+
+    В отличие от Model.delete(), зависимые записи не загружаются в память: связи "многие ко многим"
+    удаляются запросом вида DELETE ... WHERE <fk> IN (...), а записи по внешним ключам - пачками ID вместе
+    с событиями об их удалении. Сначала короткими транзакциями удаляются зависимые записи в шардах, затем
+    в одной транзакции - объекты модели и их зависимые записи в основной БД. Сигналы pre_delete/post_delete
+    не отправляются, а событие об удалении самих объектов модели добавляет вызывающий код (см. delete_objects()).
+
+    Parameters:
+        model (Model): Класс модели, объекты которой удаляются.
+        pks (list): Список идентификаторов удаляемых объектов.
+
+    Returns:
+        int: Количество удаленных объектов модели (без учета зависимых записей).
+    """
+    pks = list(pks)
+    if not pks:
+        return 0
+
+    using = router.db_for_write(model)
+    _purge_shards(model, pks)
+    with transaction.atomic(using=using):
+        return _purge_queryset(model._base_manager.using(using).filter(pk__in=pks), using)
+
+
+def soft_delete(model, pks):
+    """
+    Помечает объекты модели удаленными, не трогая зависимые записи.
+
+    Parameters:
+        model (Model): Класс модели, унаследованной от SoftDeleteModel.
+        pks (list): Список идентификаторов удаляемых объектов.
+
+    Returns:
+        int: Количество помеченных объектов.
+    """
+    return model.objects.filter(pk__in=list(pks)).update(deleted_at=timezone.now())
+
+
+def delete_objects(model, pks):
+    """
+    Удаляет объекты модели так же, как API: используется и вью, и админкой.
+
+    При включенной настройке SOFT_DELETE объекты модели с мягким удалением только помечаются удаленными
+    (один UPDATE), а физическое удаление ставится в очередь фоновых задач (один INSERT). Иначе объекты и их
+    зависимые записи удаляются сразу, так же как функцией purge(). В транзакции удаления объектов добавляются
+    события об удалении для внешних систем (см. api/outbox.py).
+
+    Parameters:
+        model (Model): Класс модели, объекты которой удаляются.
+        pks (list): Список идентификаторов удаляемых объектов.
+
+    Returns:
+        int: Количество удаленных объектов модели.
+    """
+    pks = list(pks)
+    using = router.db_for_write(model)
+    soft = getattr(settings, 'SOFT_DELETE', False) and issubclass(model, SoftDeleteModel)
+    if not soft:
+        # Зависимые записи в шардах удаляются до транзакции удаления объектов (см. purge())
+        _purge_shards(model, pks)
+    with transaction.atomic(using=using):
+        if soft:
+            deleted = soft_delete(model, pks)
+            if deleted:
+                taskqueue.enqueue('purge_objects', model._meta.label, pks)
+        else:
+            deleted = _purge_queryset(model._base_manager.using(using).filter(pk__in=pks), using)
+
+        if deleted:
+            outbox.record_deleted(model, pks, using)
+
+    if deleted:
+        transaction.on_commit(permission_graph.invalidate)
+    return deleted
+
+
+def delete_object_or_404(model, pk):
+    """
+    Удаляет объект модели по идентификатору функцией delete_objects() или вызывает Http404, если объект не найден.
+
+    Parameters:
+        model (Model): Класс модели, объект которой удаляется.
+        pk (int): Идентификатор удаляемого объекта.
+
+    Raises:
+        Http404: Если не найден объект с указанным ID.
+    """
+    if not delete_objects(model, [pk]):
+        raise Http404(f'No {model._meta.object_name} matches the given query.')
+
+
+def purge_deleted(model, batch_size=1000):
+    """
+    Физически удаляет мягко удаленные объекты модели пачками.
+
+    Parameters:
+        model (Model): Класс модели, унаследованной от SoftDeleteModel.
+        batch_size (int): Количество объектов, удаляемых в одной транзакции.
+
+    Returns:
+        int: Общее количество удаленных объектов модели.
+    """
+    total = 0
+    while True:
+        pks = list(
+            model.all_objects.filter(deleted_at__isnull=False).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return total
+        total += purge(model, pks)
@@ -0,0 +1,534 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Max
+
+from api import sharding
+
+logger = logging.getLogger(__name__)
+
+#: Канал Postgres LISTEN/NOTIFY для событий о назначениях.
+PG_CHANNEL = 'api_appointment'
+
+#: Пауза в секундах перед повторным подключением к каналу LISTEN/NOTIFY.
+RECONNECT_DELAY = 1.0
+
+#: Сообщение брокера, получив которое подписчик досылает пропущенные события из БД (см. Broker.broadcast()).
+RESYNC = {'type': 'resync'}
+
+
+class Broker:
+    """
+    Внутрипроцессный pub/sub для доставки событий подписчикам (SSE-соединениям).
+
+    Каждый подписчик - это asyncio.Queue, привязанная к своему event loop. Публиковать можно из любого потока,
+    в том числе из синхронных вью: сообщение передается в loop подписчика через call_soon_threadsafe.
+    Ожидающий подписчик не потребляет CPU.
+
+    Attributes:
+        queue_size (int): Максимальный размер очереди подписчика. События для переполненной очереди
+            отбрасываются, чтобы медленный клиент не копил память.
+
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        """
+        Создает очередь подписчика на указанные каналы. Вызывается из работающего event loop.
+
+        Parameters:
+            channels (list of str): Имена каналов, например ["patient:1"].
+
+        Returns:
+            asyncio.Queue: Очередь, в которую будут поступать сообщения.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, {})[queue] = loop
+        return queue
+
+    def unsubscribe(self, channels, queue):
+        """
+        Удаляет очередь подписчика из указанных каналов.
+
+        Parameters:
+            channels (list of str): Имена каналов, переданные в subscribe().
+            queue (asyncio.Queue): Очередь подписчика.
+        """
+        with self._lock:
+            for channel in channels:
+                subscribers = self._subscribers.get(channel, {})
+                subscribers.pop(queue, None)
+                if not subscribers:
+                    self._subscribers.pop(channel, None)
+
+    def publish(self, channel, message):
+        """
+        Отправляет сообщение всем подписчикам канала.
+
+        Parameters:
+            channel (str): Имя канала.
+            message (dict): Сообщение.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, {}).items())
+        for queue, loop in subscribers:
+            loop.call_soon_threadsafe(_put_nowait, queue, message)
+
+    def broadcast(self, message):
+        """
+        Отправляет сообщение всем подписчикам всех каналов, каждому по одному разу.
+
+        Parameters:
+            message (dict): Сообщение, например RESYNC.
+        """
+        with self._lock:
+            subscribers = {
+                queue: loop for channel_subscribers in self._subscribers.values()
+                for queue, loop in channel_subscribers.items()
+            }
+        for queue, loop in subscribers.items():
+            loop.call_soon_threadsafe(_put_nowait, queue, message)
+
+
+def _put_nowait(queue, message):
+    """
+    Кладет сообщение в очередь подписчика, отбрасывая его при переполнении.
+
+    Parameters:
+        queue (asyncio.Queue): Очередь подписчика.
+        message (dict): Сообщение.
+    """
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        logger.warning('Очередь подписчика переполнена, событие отброшено')
+
+
+broker = Broker()
+
+
+def appointment_channels(message):
+    """
+    Возвращает каналы, в которые публикуется событие о назначении.
+
+    Parameters:
+        message (dict): Событие о назначении.
+
+    Returns:
+        list of str: Каналы пациента и врача.
+    """
+    return [f"patient:{message['patient_id']}", f"doctor:{message['doctor_id']}"]
+
+
+def appointment_message(appointment):
+    """
+    Формирует событие о назначении.
+
+    Parameters:
+        appointment (Appointment): Назначение.
+
+    Returns:
+        dict: JSON-сериализуемое событие с идентификаторами назначения, врача, пациента, упражнения
+            и датой назначения.
+    """
+    return {
+        'id': appointment.pk,
+        'doctor_id': appointment.doctor_id,
+        'patient_id': appointment.patient_id,
+        'exercise_id': appointment.exercise_id,
+        'appointment_date': DjangoJSONEncoder().default(appointment.appointment_date),
+    }
+
+
+def _dispatch(message):
+    """
+    Публикует событие о назначении во внутрипроцессный брокер.
+
+    Parameters:
+        message (dict): Событие о назначении.
+    """
+    for channel in appointment_channels(message):
+        broker.publish(channel, message)
+
+
+def publish_appointment(appointment):
+    """
+    Публикует событие о новом назначении после фиксации транзакции.
+
+    При EVENTS_BACKEND = "postgres" событие отправляется через NOTIFY и доставляется подписчикам всех
+    процессов, слушающих канал (Postgres сам откладывает NOTIFY до COMMIT). Иначе событие доставляется
+    только подписчикам текущего процесса.
+
+    Parameters:
+        appointment (Appointment): Созданное назначение.
+    """
+    message = appointment_message(appointment)
+
+    if getattr(settings, 'EVENTS_BACKEND', 'local') == 'postgres':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [PG_CHANNEL, json.dumps(message)])
+    else:
+        transaction.on_commit(lambda: _dispatch(message))
+
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+def ensure_listener():
+    """
+    Подключает текущий event loop к каналу Postgres LISTEN/NOTIFY, если выбран EVENTS_BACKEND = "postgres".
+
+    Для каждого event loop запускается одна задача _listen(), которая держит соединение и переподключается
+    при его потере.
+    """
+    if getattr(settings, 'EVENTS_BACKEND', 'local') != 'postgres':
+        return
+
+    loop = asyncio.get_running_loop()
+    with _listeners_lock:
+        if loop not in _listeners:
+            _listeners[loop] = loop.create_task(_listen())
+
+
+def _connect():
+    """
+    Открывает соединение psycopg2 в режиме autocommit и подписывает его на канал PG_CHANNEL.
+
+    Keepalive TCP включен, чтобы обрыв сети без закрытия сокета тоже обнаруживался.
+
+    Returns:
+        connection: Соединение psycopg2.
+    """
+    import psycopg2
+    import psycopg2.extensions
+
+    db = settings.DATABASES['default']
+    pg_connection = psycopg2.connect(
+        dbname=db['NAME'],
+        user=db['USER'],
+        password=db['PASSWORD'],
+        host=db['HOST'],
+        port=db['PORT'],
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+    )
+    pg_connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with pg_connection.cursor() as cursor:
+        cursor.execute(f'LISTEN {PG_CHANNEL}')
+    return pg_connection
+
+
+async def _listen():
+    """
+    Слушает канал PG_CHANNEL и передает уведомления во внутрипроцессный брокер.
+
+    Соединение открывается в пуле потоков, чтобы не блокировать event loop, а его сокет регистрируется в loop
+    через add_reader, поэтому ожидание уведомлений не занимает поток и не потребляет CPU. При потере соединения
+    слушатель переподключается через RECONNECT_DELAY секунд. После каждого подключения подписчикам рассылается
+    RESYNC: уведомления, отправленные, пока соединения не было, теряются, и подписчики досылают их из БД.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            pg_connection = await loop.run_in_executor(None, _connect)
+        except Exception:
+            logger.exception('Не удалось подключиться к каналу %s, повтор через %s с', PG_CHANNEL, RECONNECT_DELAY)
+            await asyncio.sleep(RECONNECT_DELAY)
+            continue
+
+        lost = loop.create_future()
+
+        def on_notify():
+            try:
+                pg_connection.poll()
+            except Exception:
+                logger.exception('Соединение с каналом %s потеряно', PG_CHANNEL)
+                if not lost.done():
+                    lost.set_result(None)
+                return
+            while pg_connection.notifies:
+                notify = pg_connection.notifies.pop(0)
+                _dispatch(json.loads(notify.payload))
+
+        fd = pg_connection.fileno()
+        loop.add_reader(fd, on_notify)
+        broker.broadcast(RESYNC)
+        try:
+            await lost
+        finally:
+            loop.remove_reader(fd)
+            pg_connection.close()
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+class EventStreamApplication:
+    """
+    ASGI-приложение с SSE-потоками событий о назначениях, оборачивающее Django-приложение.
+
+    Обрабатывает запросы GET /api/patient/<pk>/events/ и GET /api/doctor/<pk>/events/, остальные запросы
+    передаются Django. Поток обслуживается без middleware и без выделенного потока на соединение: соединение
+    ждет событий брокера и раз в heartbeat секунд отправляет комментарий, чтобы прокси не закрывали его.
+    Отключение клиента отслеживается по сообщению http.disconnect, после чего подписка снимается.
+
+    ID событий потока - курсор вида "default:12,shard_0:57" с последним ID назначения каждого шарда: ключи
+    назначений разных шардов независимы (см. api/sharding.py), поэтому одного ID недостаточно. Сразу после
+    подключения клиенту отправляется курсор на текущий момент, а при переподключении с заголовком Last-Event-ID
+    досылаются назначения, созданные в каждом шарде после позиции курсора. Так же досылаются события,
+    пропущенные при переподключении слушателя LISTEN/NOTIFY (сообщение RESYNC).
+
+    Attributes:
+        path_regex (Pattern): Регулярное выражение пути SSE-потока.
+        heartbeat (int): Интервал отправки heartbeat-комментариев в секундах.
+        backlog_limit (int): Максимальное количество досылаемых при переподключении назначений.
+
+    """
+    path_regex = re.compile(r'^/api/(?P<owner>doctor|patient)/(?P<pk>\d+)/events/$')
+    heartbeat = 15
+    backlog_limit = 100
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        match = self.path_regex.match(scope['path']) if scope['type'] == 'http' else None
+        if match is None or scope['method'] != 'GET':
+            return await self.application(scope, receive, send)
+
+        owner, pk = match['owner'], int(match['pk'])
+        headers = dict(scope['headers'])
+        last_event_id = headers.get(b'last-event-id', b'').decode()
+
+        if not await _owner_exists(owner, pk):
+            await send({
+                'type': 'http.response.start',
+                'status': 404,
+                'headers': [(b'content-type', b'application/json')],
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': json.dumps({'status': 'error', 'message': 'Not found.'}).encode(),
+            })
+            return
+
+        channels = [f'{owner}:{pk}']
+        ensure_listener()
+        queue = broker.subscribe(channels)
+        try:
+            stream = asyncio.ensure_future(self.stream(send, queue, owner, pk, last_event_id))
+            disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+            done, pending = await asyncio.wait([stream, disconnect], return_when=asyncio.FIRST_COMPLETED)
+            for future in pending:
+                future.cancel()
+            for future in done:
+                future.result()
+        finally:
+            broker.unsubscribe(channels, queue)
+
+    async def stream(self, send, queue, owner, pk, last_event_id):
+        """
+        Отправляет клиенту события из очереди подписчика.
+
+        Parameters:
+            send (callable): ASGI-функция отправки.
+            queue (asyncio.Queue): Очередь подписчика.
+            owner (str): "doctor" или "patient".
+            pk (int): Идентификатор врача или пациента.
+            last_event_id (str): Значение заголовка Last-Event-ID.
+        """
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+
+        cursor = _parse_cursor(last_event_id)
+        resync = cursor is not None
+        if cursor is None:
+            # Позиции шардов на момент подключения: браузер вернет их в Last-Event-ID при переподключении
+            cursor = await _positions()
+            await send({'type': 'http.response.body', 'body': _format_id(cursor), 'more_body': True})
+
+        sent = set()
+        while True:
+            if resync:
+                resync = False
+                for message in await _backlog(owner, pk, cursor, self.backlog_limit):
+                    await send({'type': 'http.response.body', 'body': _format(message, cursor), 'more_body': True})
+                    sent.add((_shard(message), message['id']))
+
+            try:
+                message = await asyncio.wait_for(queue.get(), self.heartbeat)
+            except asyncio.TimeoutError:
+                await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                continue
+
+            if message is RESYNC:
+                resync = True
+                continue
+
+            # Событие могло уже попасть в досылку
+            if (_shard(message), message['id']) in sent:
+                sent.discard((_shard(message), message['id']))
+                continue
+            await send({'type': 'http.response.body', 'body': _format(message, cursor), 'more_body': True})
+
+
+def _shard(message):
+    """
+    Возвращает шард, в котором хранится назначение события.
+
+    Parameters:
+        message (dict): Событие о назначении.
+
+    Returns:
+        str: Алиас БД шарда.
+    """
+    return sharding.shard_for(message['patient_id'])
+
+
+def _parse_cursor(last_event_id):
+    """
+    Разбирает курсор из заголовка Last-Event-ID.
+
+    Шарды, которых нет в курсоре, не досылаются. Число без шарда - ID назначения, сохраненный клиентом
+    до появления курсоров, - применяется ко всем шардам.
+
+    Parameters:
+        last_event_id (str): Значение заголовка Last-Event-ID.
+
+    Returns:
+        dict or None: Последний полученный ID назначения по алиасу шарда или None, если курсор не указан
+            или некорректен.
+    """
+    if last_event_id.isdigit():
+        return {alias: int(last_event_id) for alias in sharding.shards()}
+
+    cursor = {}
+    for position in last_event_id.split(','):
+        alias, _, last_id = position.rpartition(':')
+        if alias in sharding.shards() and last_id.isdigit():
+            cursor[alias] = int(last_id)
+    return cursor or None
+
+
+def _format_id(cursor):
+    """
+    Кодирует курсор в SSE-сообщение только с полем id. Браузер запоминает его как Last-Event-ID,
+    не создавая события.
+
+    Parameters:
+        cursor (dict): Последний ID назначения по алиасу шарда.
+
+    Returns:
+        bytes: SSE-сообщение.
+    """
+    return f"id: {','.join(f'{alias}:{last_id}' for alias, last_id in cursor.items())}\n\n".encode()
+
+
+def _format(message, cursor):
+    """
+    Продвигает курсор и кодирует событие о назначении в формат text/event-stream.
+
+    Parameters:
+        message (dict): Событие о назначении.
+        cursor (dict): Последний ID назначения по алиасу шарда, изменяется на месте.
+
+    Returns:
+        bytes: SSE-сообщение с полями id, event и data.
+    """
+    alias = _shard(message)
+    cursor[alias] = max(cursor.get(alias, 0), message['id'])
+    return _format_id(cursor)[:-1] + f'event: appointment\ndata: {json.dumps(message)}\n\n'.encode()
+
+
+async def _wait_disconnect(receive):
+    """
+    Ожидает отключения клиента.
+
+    Parameters:
+        receive (callable): ASGI-функция получения сообщений.
+    """
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+@sync_to_async
+def _owner_exists(owner, pk):
+    """
+    Проверяет существование врача или пациента.
+
+    Parameters:
+        owner (str): "doctor" или "patient".
+        pk (int): Идентификатор врача или пациента.
+
+    Returns:
+        bool: True, если запись существует.
+    """
+    from api.models import Doctor, Patient
+
+    close_old_connections()
+    model = Doctor if owner == 'doctor' else Patient
+    return model.objects.filter(pk=pk).exists()
+
+
+@sync_to_async
+def _positions():
+    """
+    Возвращает последний ID назначения в каждом шарде.
+
+    Returns:
+        dict: Последний ID назначения (0 для пустого шарда) по алиасу шарда.
+    """
+    from api.models import Appointment
+
+    close_old_connections()
+    return {
+        queryset.db: queryset.aggregate(last_id=Max('pk'))['last_id'] or 0
+        for queryset in sharding.fan_out(Appointment.objects.all())
+    }
+
+
+@sync_to_async
+def _backlog(owner, pk, cursor, limit):
+    """
+    Возвращает события о назначениях, созданных после позиций курсора.
+
+    Parameters:
+        owner (str): "doctor" или "patient".
+        pk (int): Идентификатор врача или пациента.
+        cursor (dict): Последний полученный клиентом ID назначения по алиасу шарда.
+        limit (int): Максимальное количество событий.
+
+    Returns:
+        list of dict: События о назначениях в порядке возрастания ID внутри каждого шарда.
+    """
+    from api.models import Appointment
+
+    close_old_connections()
+    queryset = Appointment.objects.filter(**{f'{owner}_id': pk}).order_by('pk')
+    # Назначения пациента лежат в одном шарде, назначения врача разбросаны по всем (см. api/sharding.py)
+    aliases = [sharding.shard_for(pk)] if owner == 'patient' else sharding.shards()
+    querysets = [queryset.using(alias).filter(pk__gt=cursor[alias])[:limit] for alias in aliases if alias in cursor]
+    appointments = sharding.merge(querysets, key=lambda appointment: appointment.pk)[:limit]
+    return [appointment_message(appointment) for appointment in appointments]
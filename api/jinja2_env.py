@@ -0,0 +1,44 @@
+from django.templatetags.static import static
+from jinja2 import BaseLoader, Environment
+from static_precompiler.templatetags.compile_static import compile_filter
+
+from api.template_loaders import strip_whitespace
+
+
+class MinifyingLoader(BaseLoader):
+    """
+    Загрузчик Jinja2, убирающий отступы из HTML-шаблонов при загрузке, как загрузчики из api/template_loaders.py.
+
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = self.loader.get_source(environment, template)
+        if template.endswith('.html'):
+            source = strip_whitespace(source)
+        return source, filename, uptodate
+
+    def list_templates(self):
+        return self.loader.list_templates()
+
+
+def environment(**options):
+    """
+    Создает окружение Jinja2 для шаблонов из api/jinja2 (см. настройку LIST_TEMPLATE_ENGINE).
+
+    В окружение добавляются функция static() и фильтр compile, аналогичные тегу {% static %} и фильтру
+    compile из django-static-precompiler. Отступы из шаблонов убираются при загрузке.
+
+    Parameters:
+        **options: Параметры окружения из OPTIONS настройки TEMPLATES.
+
+    Returns:
+        Environment: Окружение Jinja2.
+    """
+    options['loader'] = MinifyingLoader(options['loader'])
+    env = Environment(**options)
+    env.globals['static'] = static
+    env.filters['compile'] = compile_filter
+    return env
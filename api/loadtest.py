@@ -0,0 +1,385 @@
+import asyncio
+import bisect
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+#: Границы корзин гистограммы задержек в миллисекундах.
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+#: Операции нагрузки и их доли по умолчанию.
+DEFAULT_MIX = {
+    'list': 25,
+    'detail': 20,
+    'timeline': 20,
+    'analytics': 5,
+    'task': 5,
+    'create': 5,
+    'appoint': 10,
+    'patch': 4,
+    'put': 3,
+    'delete': 3,
+}
+
+
+class HttpConnection:
+    """
+    Минимальный асинхронный HTTP/1.1-клиент с keep-alive поверх asyncio-потоков.
+
+    Разбирает ответы с Content-Length, chunked-ответы и ответы до закрытия соединения. При закрытии
+    соединения сервером переподключается при следующем запросе.
+
+    Methods:
+        request(method, path, body=None, headers=None): Выполняет запрос.
+        close(): Закрывает соединение.
+
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """
+        Выполняет запрос.
+
+        Parameters:
+            method (str): HTTP-метод.
+            path (str): Путь запроса.
+            body (dict, optional): Тело запроса, отправляется в JSON.
+            headers (dict, optional): Дополнительные заголовки.
+
+        Returns:
+            tuple: HTTP-код и тело ответа (bytes).
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = (
+            f'{method} {path} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(payload)}\r\n'
+            + ''.join(f'{name}: {value}\r\n' for name, value in (headers or {}).items())
+            + '\r\n'
+        )
+        try:
+            self.writer.write(head.encode() + payload)
+            await self.writer.drain()
+            return await self.read_response()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            raise
+
+    async def read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in headers:
+            content = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            content = b''
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                content += chunk[:-2]
+        else:
+            content = await self.reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, content
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Stats:
+    """
+    Результаты нагрузки по операциям: задержки, HTTP-коды и ошибки соединения.
+
+    Methods:
+        record(operation, status, latency): Учитывает выполненный запрос.
+        summary(duration): Сводка по операциям и в целом.
+
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, operation, status, latency):
+        """
+        Учитывает выполненный запрос.
+
+        Parameters:
+            operation (str): Имя операции.
+            status (int or None): HTTP-код ответа или None при ошибке соединения.
+            latency (float): Задержка в миллисекундах.
+        """
+        self.latencies.setdefault(operation, []).append(latency)
+        statuses = self.statuses.setdefault(operation, {})
+        statuses[status] = statuses.get(status, 0) + 1
+
+    @staticmethod
+    def describe(latencies, statuses, duration):
+        latencies = sorted(latencies)
+        count = len(latencies)
+        errors = sum(number for status, number in statuses.items() if status is None or status >= 500)
+        histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for latency in latencies:
+            histogram[bisect.bisect_left(HISTOGRAM_BOUNDS, latency)] += 1
+
+        def percentile(share):
+            return latencies[min(count - 1, int(count * share))] if count else 0.0
+
+        return {
+            'requests': count,
+            'rps': count / duration if duration else 0.0,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': latencies[-1] if count else 0.0,
+            'client_errors': sum(number for status, number in statuses.items() if status and 400 <= status < 500),
+            'throttled': statuses.get(429, 0) + statuses.get(503, 0),
+            'error_rate': errors / count if count else 0.0,
+            'histogram': histogram,
+        }
+
+    def summary(self, duration):
+        """
+        Сводка по операциям и в целом.
+
+        Parameters:
+            duration (float): Длительность нагрузки в секундах.
+
+        Returns:
+            dict: Сводка {"total": {...}, "operations": {имя операции: {...}}}.
+        """
+        total_statuses = {}
+        for statuses in self.statuses.values():
+            for status, number in statuses.items():
+                total_statuses[status] = total_statuses.get(status, 0) + number
+        return {
+            'total': self.describe(
+                [latency for latencies in self.latencies.values() for latency in latencies], total_statuses, duration
+            ),
+            'operations': {
+                operation: self.describe(latencies, self.statuses[operation], duration)
+                for operation, latencies in sorted(self.latencies.items())
+            },
+        }
+
+
+class Scenario:
+    """
+    Набор запросов, из которых состоит нагрузка, по маршрутам api/urls.py.
+
+    Идентификаторы берутся из fixtures: существующие врачи, пациенты, упражнения и задачи только читаются,
+    а изменяющие операции работают с объектами, созданными для нагрузки:
+
+    - list, detail, timeline, analytics, task - GET списков, деталей, страниц назначений, аналитики и задач;
+    - create - POST нового врача, пациента или упражнения;
+    - appoint - POST назначения: каждая тройка (врач, пациент, упражнение) из fixtures["appointments"]
+      отправляется один раз, чтобы назначения не отклонялись как дубликаты;
+    - patch - PATCH пациента, связанного с врачом;
+    - put - PUT созданного для нагрузки врача, упражнения или пациента, связанного с врачом;
+    - delete - DELETE пациента из отдельного пула, который больше ни в каких операциях не участвует.
+
+    Methods:
+        build(operation): Возвращает запрос для операции.
+
+    """
+
+    def __init__(self, fixtures, prefix):
+        self.fixtures = fixtures
+        self.prefix = prefix
+        self.pool = list(fixtures['pool'])
+        random.shuffle(self.pool)
+        self.appointments = list(fixtures['appointments'])
+        random.shuffle(self.appointments)
+        self.counter = 0
+
+    def name(self):
+        """
+        Возвращает новое уникальное имя с префиксом нагрузки, по которому созданные объекты удаляются после теста.
+
+        Returns:
+            str: Имя.
+        """
+        self.counter += 1
+        return f'{self.prefix}{self.counter}'
+
+    def body(self, kind):
+        """
+        Возвращает тело POST- или PUT-запроса для врача, пациента или упражнения.
+
+        Parameters:
+            kind (str): "doctor", "patient" или "exercise".
+
+        Returns:
+            dict: Тело запроса.
+        """
+        if kind == 'doctor':
+            return {'name': self.name(), 'speciality': random.choice(self.fixtures['speciality'])}
+        if kind == 'exercise':
+            return {
+                'title': self.name(), 'description': 'loadtest', 'frequency': random.choice(self.fixtures['frequency'])
+            }
+        return {'name': self.name()}
+
+    def build(self, operation):
+        """
+        Возвращает запрос для операции.
+
+        Parameters:
+            operation (str): Имя операции из DEFAULT_MIX.
+
+        Returns:
+            tuple or None: Метод, путь и тело запроса или None, если для операции нет данных.
+        """
+        fixtures = self.fixtures
+        if operation == 'list':
+            return 'GET', f'/api/{random.choice(("doctor", "patient", "exercise"))}/', None
+        if operation == 'detail':
+            kind = random.choice(('doctor', 'patient', 'exercise'))
+            return 'GET', f'/api/{kind}/{random.choice(fixtures[kind])}/', None
+        if operation == 'timeline':
+            kind = random.choice(('doctor', 'patient'))
+            return 'GET', f'/api/{kind}/{random.choice(fixtures[kind])}/exercises/', None
+        if operation == 'analytics':
+            report = random.choice(('doctors', 'specialities', 'frequencies'))
+            return 'GET', f'/api/analytics/{report}/', None
+        if operation == 'task' and fixtures['task']:
+            return 'GET', f'/api/tasks/{random.choice(fixtures["task"])}/', None
+        if operation == 'create':
+            kind = random.choice(('doctor', 'patient', 'exercise'))
+            return 'POST', f'/api/{kind}/', self.body(kind)
+        if operation == 'appoint' and self.appointments:
+            doctor_id, patient_id, exercise_id = self.appointments.pop()
+            return 'POST', f'/api/doctor/{doctor_id}/appoint/', {'patient_id': patient_id, 'exercise_id': exercise_id}
+        if operation == 'patch' and fixtures['linked']:
+            return 'PATCH', f'/api/patient/{random.choice(fixtures["linked"])}/', self.body('patient')
+        if operation == 'put':
+            kind, ids = random.choice((
+                ('doctor', fixtures['own_doctor']),
+                ('patient', fixtures['linked']),
+                ('exercise', fixtures['own_exercise']),
+            ))
+            if ids:
+                return 'PUT', f'/api/{kind}/{random.choice(ids)}/', self.body(kind)
+        if operation == 'delete' and self.pool:
+            return 'DELETE', f'/api/patient/{self.pool.pop()}/', None
+        return None
+
+
+def client_address(index):
+    """
+    Возвращает адрес условного клиента нагрузки для заголовка X-Forwarded-For.
+
+    Parameters:
+        index (int): Номер клиента.
+
+    Returns:
+        str: IPv4-адрес из сети 10.0.0.0/8.
+    """
+    return f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}'
+
+
+async def _worker(base_url, scenario, mix, deadline, stats, clients):
+    parts = urlsplit(base_url)
+    connection = HttpConnection(parts.hostname, parts.port or 80)
+    operations, weights = list(mix), list(mix.values())
+    try:
+        while time.monotonic() < deadline:
+            operation = random.choices(operations, weights)[0]
+            request = scenario.build(operation)
+            if request is None:
+                # Данные операции закончились: отдаем управление другим соединениям
+                await asyncio.sleep(0)
+                continue
+            method, path, body = request
+            # Запросы распределяются по клиентам, чтобы ограничение частоты на клиента не искажало результаты
+            headers = {'X-Forwarded-For': client_address(random.randrange(clients))}
+            started = time.perf_counter()
+            try:
+                status, _ = await connection.request(method, path, body, headers)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                status = None
+            stats.record(operation, status, (time.perf_counter() - started) * 1000)
+    finally:
+        connection.close()
+
+
+async def run(base_url, fixtures, mix, duration, concurrency, prefix, clients=1000):
+    """
+    Нагружает сервер запросами из Scenario в concurrency параллельных соединений.
+
+    Каждый запрос отправляется с заголовком X-Forwarded-For одного из clients условных клиентов. Сервер учитывает
+    его при RATELIMIT_PROXY_HOPS = 1 (так запускается сервер команды loadtest --start-server), и нагрузка
+    распределяется по корзинам ограничителя частоты, как от многих реальных клиентов.
+
+    Parameters:
+        base_url (str): Адрес сервера, например "http://127.0.0.1:8000".
+        fixtures (dict): Идентификаторы объектов для запросов (см. Scenario).
+        mix (dict): Доли операций.
+        duration (float): Длительность нагрузки в секундах.
+        concurrency (int): Количество параллельных соединений.
+        prefix (str): Префикс имен создаваемых объектов.
+        clients (int): Количество условных клиентов.
+
+    Returns:
+        dict: Сводка результатов (см. Stats.summary).
+    """
+    stats = Stats()
+    scenario = Scenario(fixtures, prefix)
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _worker(base_url, scenario, mix, deadline, stats, clients) for _ in range(concurrency)
+    ))
+    return stats.summary(time.monotonic() - started)
+
+
+def compare(summary, baseline, tolerance):
+    """
+    Сравнивает результаты с сохраненным эталоном.
+
+    Parameters:
+        summary (dict): Текущие результаты.
+        baseline (dict): Эталонные результаты.
+        tolerance (float): Допустимое ухудшение, например 0.2 - на 20%.
+
+    Returns:
+        list of str: Описания ухудшений.
+    """
+    regressions = []
+    sections = [('total', summary['total'], baseline['total'])] + [
+        (operation, summary['operations'][operation], baseline['operations'][operation])
+        for operation in summary['operations'] if operation in baseline.get('operations', {})
+    ]
+    for name, current, expected in sections:
+        # Пропускная способность отдельных операций зависит от случайной смеси, поэтому сравнивается только общая
+        if name == 'total' and current['rps'] < expected['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: пропускная способность {current['rps']:.1f} < {expected['rps']:.1f} rps")
+        if current['p95'] > expected['p95'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95']:.1f} > {expected['p95']:.1f} мс")
+        if current['error_rate'] > expected['error_rate'] + 0.01:
+            regressions.append(f"{name}: доля ошибок {current['error_rate']:.2%} > {expected['error_rate']:.2%}")
+    return regressions
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Min
+from django.utils import timezone
+
+from api import partitioning, sharding
+from api.models import Appointment
+
+
+class Command(BaseCommand):
+    """
+    Команда для обслуживания месячных партиций назначений на всех шардах.
+
+    На Postgres с партиционированной таблицей назначений (миграция 0006) заранее создает партиции будущих
+    месяцев и отсоединяет партиции месяцев старше APPOINTMENT_HOT_MONTHS, выгружая их в файлы
+    <каталог архива>/<шард>/api_appointment_yГГГГmММ.ndjson.gz. На других СУБД устаревшие назначения
+    выгружаются и удаляются пачками, по файлу на пачку: api_appointment_yГГГГmММ.<первый ID>.ndjson.gz.
+    Файлы перезаписываются целиком, поэтому повторный запуск после сбоя не дублирует назначения в архиве.
+
+    Предназначена для периодического запуска в фоне (cron, systemd timer), например раз в сутки.
+
+    Example:
+        ```
+        python manage.py appointment_partitions --ahead 3 --keep-months 12 --archive-dir /var/backups/appointments
+        ```
+    """
+
+    help = 'Создает партиции назначений на будущие месяцы и выгружает устаревшие месяцы в архив.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=3,
+                            help='Количество будущих месяцев, для которых создаются партиции.')
+        parser.add_argument('--keep-months', type=int, default=settings.APPOINTMENT_HOT_MONTHS,
+                            help='Количество последних месяцев, которые остаются в БД.')
+        parser.add_argument('--archive-dir', default=str(settings.BASE_DIR / 'archive'),
+                            help='Каталог для файлов архива.')
+
+    def handle(self, *args, **options):
+        current = partitioning.month_start(timezone.localdate())
+        cutoff = partitioning.add_months(current, -options['keep_months'])
+
+        for alias in sharding.shards():
+            connection = connections[alias]
+
+            if partitioning.is_partitioned(connection):
+                for offset in range(options['ahead'] + 1):
+                    month = partitioning.add_months(current, offset)
+                    if partitioning.create_partition(connection, month):
+                        self.stdout.write(f'{alias}: создана партиция {partitioning.partition_name(month)}')
+
+                # Отсоединенные партиции остаются после прерванной выгрузки и выгружаются повторно
+                stale = {**partitioning.partitions(connection), **partitioning.detached_partitions(connection)}
+                for month in sorted(stale):
+                    if month < cutoff:
+                        count = partitioning.archive_partition(connection, month, options['archive_dir'])
+                        self.stdout.write(
+                            f'{alias}: партиция {partitioning.partition_name(month)} выгружена в архив ({count})'
+                        )
+
+            # Оставшиеся устаревшие назначения: вся таблица без партиционирования
+            # или партиция по умолчанию на Postgres
+            self.archive_rows(alias, cutoff, options['archive_dir'])
+
+    def archive_rows(self, alias, cutoff, directory):
+        """
+        Выгружает в архив назначения шарда, дата которых раньше начала месяца cutoff.
+
+        Parameters:
+            alias (str): Алиас БД шарда.
+            cutoff (date): Первое число первого оперативного месяца.
+            directory (str): Каталог архива.
+        """
+        first = Appointment._base_manager.using(alias).aggregate(first=Min('appointment_date'))['first']
+        if first is None:
+            return
+
+        month = partitioning.month_start(timezone.localtime(first))
+        while month < cutoff:
+            count = partitioning.archive_month(connections[alias], month, directory)
+            if count:
+                self.stdout.write(f'{alias}: назначения за {month:%m.%Y} выгружены в архив ({count})')
+            month = partitioning.add_months(month, 1)
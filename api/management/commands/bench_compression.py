@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api import compression
+
+#: Страницы, для которых по умолчанию измеряется сжатие.
+DEFAULT_URLS = ('/api/doctor/', '/api/patient/', '/api/exercise/')
+
+
+class Command(BaseCommand):
+    """
+    Команда для оценки сжатия ответов: размер на проводе и затраты CPU на один ответ для каждой кодировки.
+
+    Страницы запрашиваются у приложения без сжатия, после чего каждое тело ответа многократно сжимается
+    поддерживаемыми кодировками. Для показательных результатов наполните БД данными заранее.
+
+    Example:
+        ```
+        python manage.py bench_compression --url /api/doctor/ --iterations 200
+        ```
+    """
+
+    help = 'Измеряет размер ответов и затраты CPU на их сжатие для каждой кодировки.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Адрес страницы. Можно указать несколько раз.')
+        parser.add_argument('--iterations', type=int, default=100,
+                            help='Количество сжатий каждого ответа.')
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST='localhost')
+        iterations = options['iterations']
+
+        self.stdout.write(f"{'url':<32}{'encoding':<10}{'bytes':>12}{'ratio':>8}{'cpu, us':>12}")
+        for url in options['urls'] or DEFAULT_URLS:
+            body = client.get(url).content
+            self.stdout.write(f"{url:<32}{'identity':<10}{len(body):>12}{1:>8.2f}{0:>12.1f}")
+
+            for name, compress, _ in compression.ENCODINGS:
+                started = time.process_time()
+                for _ in range(iterations):
+                    compressed = compress(body)
+                cpu = (time.process_time() - started) / iterations * 1e6
+
+                ratio = len(compressed) / len(body) if body else 1
+                self.stdout.write(f'{url:<32}{name:<10}{len(compressed):>12}{ratio:>8.2f}{cpu:>12.1f}')
@@ -0,0 +1,131 @@
+import collections
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+#: Код, который выполняется в отдельном процессе: запуск Django, WSGI-приложение и загрузка всех маршрутов,
+#: то есть то же, что делает воркер до первого запроса.
+STARTUP_SCRIPT = '''
+import json, resource, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+startup_ms = (time.perf_counter() - started) * 1000
+# ru_maxrss в Linux сохраняется при exec и может быть максимумом родительского процесса,
+# поэтому пиковая память берется из /proc, где она есть
+try:
+    with open("/proc/self/status") as status:
+        rss_kib = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+except OSError:
+    rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"startup_ms": startup_ms, "rss_kib": rss_kib}))
+'''
+
+
+def _package(module):
+    """
+    Возвращает пакет, к которому относится модуль: первый компонент имени, а для django.contrib - приложение.
+
+    Parameters:
+        module (str): Имя модуля, например "django.contrib.admin.sites".
+
+    Returns:
+        str: Имя пакета, например "django.contrib.admin".
+    """
+    parts = module.split('.')
+    return '.'.join(parts[:3]) if parts[:2] == ['django', 'contrib'] else parts[0]
+
+
+def measure(profile):
+    """
+    Запускает приложение в отдельном процессе с python -X importtime и измеряет холодный старт.
+
+    Parameters:
+        profile (str): Профиль приложения (APP_PROFILE): "full" или "api".
+
+    Returns:
+        dict: Количество импортированных модулей ("modules"), суммарное время импорта ("import_ms"),
+            время запуска приложения ("startup_ms"), пиковая память процесса ("rss_mib") и собственное
+            время импорта по пакетам в миллисекундах ("packages").
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'APP_PROFILE': profile},
+        capture_output=True,
+        text=True
+    )
+    if result.returncode:
+        raise CommandError(f'Не удалось запустить приложение с профилем {profile}:\n{result.stderr[-2000:]}')
+
+    packages = collections.Counter()
+    modules = import_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        modules += 1
+        packages[_package(module.strip())] += int(own) / 1000
+        # Время модулей верхнего уровня включает время вложенных импортов
+        if not module.startswith('  ', 1):
+            import_us += int(cumulative)
+
+    startup = json.loads(result.stdout.splitlines()[-1])
+    return {
+        'modules': modules,
+        'import_ms': import_us / 1000,
+        'startup_ms': startup['startup_ms'],
+        'rss_mib': startup['rss_kib'] / 1024,
+        'packages': packages,
+    }
+
+
+class Command(BaseCommand):
+    """
+    Команда для измерения холодного старта приложения в профилях APP_PROFILE.
+
+    Каждый замер выполняется в новом процессе: запускается Django, создается WSGI-приложение и загружаются
+    все маршруты. Выводятся медианы по --repeat замерам: количество импортированных модулей, суммарное время
+    импорта по данным python -X importtime, время запуска и пиковая память процесса, а также пакеты, импорт
+    которых занимает больше всего времени.
+
+    Example:
+        ```
+        python manage.py bench_startup --repeat 5 --top 10
+        ```
+    """
+
+    help = 'Измеряет время запуска, импорты и память процесса приложения в профилях full и api.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', choices=['full', 'api'],
+                            help='Профиль приложения. Можно указать несколько раз.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Количество замеров для каждого профиля.')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Количество самых медленных пакетов в выводе.')
+
+    def handle(self, *args, **options):
+        profiles = options['profile'] or ['full', 'api']
+        results = {profile: [measure(profile) for _ in range(options['repeat'])] for profile in profiles}
+
+        self.stdout.write(f"{'profile':<10}{'modules':>10}{'import, ms':>12}{'startup, ms':>13}{'RSS, MiB':>10}")
+        for profile, runs in results.items():
+            self.stdout.write(
+                f"{profile:<10}{statistics.median(run['modules'] for run in runs):>10.0f}"
+                f"{statistics.median(run['import_ms'] for run in runs):>12.1f}"
+                f"{statistics.median(run['startup_ms'] for run in runs):>13.1f}"
+                f"{statistics.median(run['rss_mib'] for run in runs):>10.1f}"
+            )
+
+        for profile, runs in results.items():
+            self.stdout.write(f'\nСамые медленные пакеты ({profile}), мс:')
+            for package, elapsed in runs[-1]['packages'].most_common(options['top']):
+                self.stdout.write(f'{package:<32}{elapsed:>8.1f}')
@@ -0,0 +1,115 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.utils import timezone
+
+from api.models import Appointment, Doctor, Exercise, Patient, Speciality
+
+#: Количество строк в списках по умолчанию.
+DEFAULT_ROWS = (10, 1000, 10000)
+
+
+def _prefetched(instance, name, objects):
+    """
+    Подставляет объекты в кэш prefetch_related связи "многие ко многим", чтобы шаблон не обращался к БД.
+
+    Parameters:
+        instance (Model): Объект модели.
+        name (str): Имя атрибута связи, например "patients".
+        objects (list of Model): Связанные объекты.
+    """
+    manager = getattr(instance, name)
+    queryset = manager.model._base_manager.all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    instance._prefetched_objects_cache = {manager.prefetch_cache_name: queryset}
+
+
+def _contexts(rows):
+    """
+    Строит контексты шаблонов списков из объектов в памяти, без обращений к БД.
+
+    Parameters:
+        rows (int): Количество строк в списке.
+
+    Returns:
+        dict: Контекст по имени шаблона.
+    """
+    speciality = Speciality(pk=1, title='Терапевт')
+    patients = [Patient(pk=index + 1, name=f'Пациент {index}') for index in range(rows)]
+    doctors = [Doctor(pk=index + 1, name=f'Врач {index}', speciality=speciality) for index in range(rows)]
+    exercises = [
+        Exercise(pk=index + 1, title=f'Упражнение {index}', description='Описание упражнения ' * 5)
+        for index in range(rows)
+    ]
+
+    for index, doctor in enumerate(doctors):
+        _prefetched(doctor, 'patients', patients[index:index + 3])
+    for index, patient in enumerate(patients):
+        _prefetched(patient, 'doctor_set', doctors[index:index + 3])
+    for exercise in exercises:
+        _prefetched(exercise, 'specialisations', [speciality])
+
+    now = timezone.now()
+    doctor, patient = doctors[0], patients[0]
+    doctor.appointments = [
+        Appointment(pk=index + 1, doctor=doctor, patient=patients[index], exercise=exercises[index],
+                    appointment_date=now)
+        for index in range(rows)
+    ]
+    patient.appointments = [
+        Appointment(pk=index + 1, doctor=doctors[index], patient=patient, exercise=exercises[index],
+                    appointment_date=now)
+        for index in range(rows)
+    ]
+
+    return {
+        'api/html/doctor.html': {'doctors': doctors},
+        'api/html/patient.html': {'patients': patients},
+        'api/html/exercise.html': {'exercises': exercises},
+        'api/html/doctor_exercises.html': {'doctors': [doctor]},
+        'api/html/patient_exercises.html': {'patients': [patient]},
+    }
+
+
+class Command(BaseCommand):
+    """
+    Команда для измерения времени рендеринга шаблонов списков на 10, 1 000 и 10 000 строк.
+
+    Данные создаются в памяти, поэтому измеряется только рендеринг, без запросов к БД. Шаблоны, для которых
+    есть версия в api/jinja2, измеряются и в Jinja2 (если пакет jinja2 установлен). Первый рендеринг
+    (загрузка и компиляция шаблона) в замер не входит.
+
+    Example:
+        ```
+        python manage.py bench_templates --rows 10 --rows 1000 --rows 10000
+        ```
+    """
+
+    help = 'Измеряет время рендеринга шаблонов списков для разного количества строк.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append',
+                            help='Количество строк в списке. Можно указать несколько раз.')
+        parser.add_argument('--min-time', type=float, default=0.5,
+                            help='Минимальное время замера для каждого шаблона в секундах.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'template':<36}{'engine':<8}{'rows':>8}{'ms':>10}{'KiB':>10}")
+        for rows in options['rows'] or DEFAULT_ROWS:
+            for name, context in _contexts(rows).items():
+                for engine in engines.all():
+                    try:
+                        template = engine.get_template(name)
+                    except Exception:  # у шаблона нет версии для этого шаблонизатора
+                        continue
+
+                    size = len(template.render(context).encode())
+                    count, started = 0, time.perf_counter()
+                    while time.perf_counter() - started < options['min_time']:
+                        template.render(context)
+                        count += 1
+                    elapsed = (time.perf_counter() - started) / count * 1000
+
+                    self.stdout.write(f'{name:<36}{engine.name:<8}{rows:>8}{elapsed:>10.2f}{size / 1024:>10.1f}')
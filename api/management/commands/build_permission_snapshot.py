@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import permission_graph
+
+
+class Command(BaseCommand):
+    """
+    Команда для построения снимка связей врачей, пациентов и упражнений (см. api/permission_graph.py).
+
+    Без --interval строит снимок один раз. С --interval работает постоянно и перестраивает снимок, когда
+    изменились данные или снимок прожил половину PERMISSION_SNAPSHOT_MAX_AGE.
+
+    Example:
+        ```
+        python manage.py build_permission_snapshot --interval 1
+        ```
+    """
+
+    help = 'Строит снимок связей врачей, пациентов и упражнений для проверки прав на назначение.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Пауза в секундах между проверками актуальности снимка.')
+
+    def handle(self, *args, **options):
+        if not settings.PERMISSION_SNAPSHOT_FILE:
+            raise CommandError('Не задана настройка PERMISSION_SNAPSHOT_FILE.')
+
+        version = permission_graph.build()
+        self.stdout.write(f'Снимок построен, версия данных {version}')
+        if options['interval'] is None:
+            return
+
+        built_at = time.monotonic()
+        while True:
+            time.sleep(options['interval'])
+            if permission_graph.current_version() != version \
+                    or time.monotonic() - built_at > settings.PERMISSION_SNAPSHOT_MAX_AGE / 2:
+                version = permission_graph.build()
+                built_at = time.monotonic()
+                self.stdout.write(f'Снимок построен, версия данных {version}')
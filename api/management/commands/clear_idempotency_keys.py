@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """
+    Команда для удаления истекших ключей идемпотентности (см. IdempotencyMiddleware).
+
+    Предназначена для периодического запуска в фоне (cron, systemd timer).
+
+    Example:
+        ```
+        python manage.py clear_idempotency_keys
+        ```
+    """
+
+    help = 'Удаляет истекшие ключи идемпотентности вместе с сохраненными ответами.'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(f'Удалено ключей: {deleted}')
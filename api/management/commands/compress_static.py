@@ -0,0 +1,59 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import compression
+
+#: Расширения статических файлов, для которых создаются сжатые копии.
+EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt')
+
+
+class Command(BaseCommand):
+    """
+    Команда для создания заранее сжатых копий (.gz и .br) статических файлов в STATIC_ROOT.
+
+    Запускается при сборке после collectstatic и compilestatic, чтобы веб-сервер (например, nginx
+    с gzip_static/brotli_static) отдавал сжатые файлы без сжатия на лету. Копии .br создаются, если
+    установлен пакет brotli.
+
+    Example:
+        ```
+        python manage.py compilestatic
+        python manage.py collectstatic --noinput
+        python manage.py compress_static
+        ```
+    """
+
+    help = 'Создает сжатые копии (.gz и .br) статических файлов в STATIC_ROOT.'
+
+    def handle(self, *args, **options):
+        compressors = [('.gz', lambda data: compression.gzip.compress(data, compresslevel=9, mtime=0))]
+        if compression.brotli is not None:
+            compressors.append(('.br', lambda data: compression.brotli.compress(data, quality=11)))
+
+        written = 0
+        for root, _, files in os.walk(settings.STATIC_ROOT):
+            for name in files:
+                if not name.endswith(EXTENSIONS):
+                    continue
+
+                path = os.path.join(root, name)
+                mtime = os.path.getmtime(path)
+                with open(path, 'rb') as file:
+                    data = None
+                    for suffix, compress in compressors:
+                        target = path + suffix
+                        if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                            continue
+                        data = data if data is not None else file.read()
+                        compressed = compress(data)
+                        # Сжатая копия, которая не меньше оригинала, бесполезна
+                        if len(compressed) >= len(data):
+                            continue
+                        with open(target, 'wb') as output:
+                            output.write(compressed)
+                        written += 1
+                        self.stdout.write(f'{target}: {len(data)} -> {len(compressed)} байт')
+
+        self.stdout.write(f'Создано сжатых файлов: {written}')
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import sharding
+from api.models import Appointment
+
+
+class Command(BaseCommand):
+    """
+    Команда для подготовки шардов назначений после migrate.
+
+    Сдвигает счетчик первичных ключей таблицы назначений каждого шарда на <номер шарда> * ID_STRIDE,
+    чтобы ключи разных шардов не пересекались и записи можно было переносить между шардами.
+    Повторный запуск безопасен: счетчик никогда не уменьшается.
+
+    Example:
+        ```
+        python manage.py migrate --database shard_0
+        python manage.py init_appointment_shards
+        ```
+    """
+
+    help = 'Разводит диапазоны первичных ключей назначений по шардам.'
+
+    def handle(self, *args, **options):
+        table = Appointment._meta.db_table
+        for index, alias in enumerate(sharding.shards()):
+            start = index * sharding.ID_STRIDE
+            connection = connections[alias]
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(
+                        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                        f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {table})))",
+                        [table, max(start, 1)]
+                    )
+                elif connection.vendor == 'sqlite':
+                    cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                    row = cursor.fetchone()
+                    if row is None:
+                        cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+                    elif row[0] < start:
+                        cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table])
+                else:
+                    self.stderr.write(f'{alias}: СУБД {connection.vendor} не поддерживается')
+                    continue
+
+            self.stdout.write(f'{alias}: ключи назначений начинаются не раньше {start}')
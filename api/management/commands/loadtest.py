@@ -0,0 +1,265 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import loadtest, permission_graph
+from api.deletion import purge
+from api.models import Doctor, Exercise, Patient, Speciality, Task
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочного тестирования API.
+
+    Запросы отправляются параллельно в --concurrency соединений в пропорциях --mix (см. api/loadtest.py) от имени
+    --clients условных клиентов (заголовок X-Forwarded-For), поэтому ограничение частоты срабатывает так же, как
+    при реальной нагрузке от многих клиентов. Сервер, запущенный с --start-server, получает RATELIMIT_PROXY_HOPS = 1;
+    отдельно запущенный сервер нужно настроить так же, иначе все запросы придут от одного адреса и получат 429.
+
+    Для изменяющих операций создаются пациенты, привязанные к случайным врачам, отдельный пул пациентов для удаления,
+    врачи и упражнения для PUT и завершенные задачи для GET /api/tasks/<id>/. Назначения отправляются по уникальным
+    тройкам (врач, пациент, упражнение), чтобы не получать ответы о дубликатах. После теста все объекты с префиксом
+    нагрузки удаляются вместе со связями и назначениями. Команда работает с БД из настроек, поэтому сервер должен
+    использовать ту же БД (SQLite-файл или локальный Postgres).
+
+    Результаты можно сохранить как эталон (--save-baseline) и сравнивать с ним следующие запуски (--baseline):
+    при ухудшении больше --tolerance команда завершается с ненулевым кодом.
+
+    Example:
+        ```
+        python manage.py loadtest --start-server --duration 30 --concurrency 20 --save-baseline baseline.json
+        python manage.py loadtest --start-server --duration 30 --concurrency 20 --baseline baseline.json
+        ```
+    """
+
+    help = 'Нагружает API смесью запросов и выводит пропускную способность, задержки и долю ошибок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Адрес сервера.')
+        parser.add_argument('--start-server', action='store_true',
+                            help='Запустить runserver на адресе --url на время теста.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность нагрузки в секундах.')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Количество параллельных соединений.')
+        parser.add_argument('--mix',
+                            help='Доли операций, например "list=30,detail=20,appoint=10". '
+                                 f'Операции: {", ".join(loadtest.DEFAULT_MIX)}.')
+        parser.add_argument('--pool', type=int, default=200,
+                            help='Количество пациентов, создаваемых для изменяющих операций и для удаления.')
+        parser.add_argument('--clients', type=int, default=1000,
+                            help='Количество условных клиентов, между которыми распределяются запросы.')
+        parser.add_argument('--baseline',
+                            help='JSON-файл эталонных результатов для сравнения.')
+        parser.add_argument('--save-baseline',
+                            help='Сохранить результаты в JSON-файл как эталон.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимое ухудшение относительно эталона (0.2 - на 20%%).')
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix']) if options['mix'] else loadtest.DEFAULT_MIX
+        prefix = f'loadtest-{int(time.time())}-'
+        server = self.start_server(options['url']) if options['start_server'] else None
+        try:
+            fixtures = self.create_fixtures(prefix, options['pool'])
+            summary = asyncio.run(loadtest.run(
+                options['url'], fixtures, mix, options['duration'], options['concurrency'], prefix, options['clients']
+            ))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            self.cleanup(prefix)
+
+        self.report(summary)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as file:
+                json.dump(summary, file, indent=2)
+            self.stdout.write(f"Эталон сохранен в {options['save_baseline']}")
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            regressions = loadtest.compare(summary, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Результаты хуже эталона:\n' + '\n'.join(regressions))
+            self.stdout.write('Результаты в пределах эталона.')
+
+    @staticmethod
+    def parse_mix(value):
+        """
+        Разбирает доли операций из строки вида "list=30,detail=20".
+
+        Parameters:
+            value (str): Строка с долями.
+
+        Returns:
+            dict: Доля по имени операции.
+
+        Raises:
+            CommandError: Если указана неизвестная операция или неверная доля.
+        """
+        mix = {}
+        for item in value.split(','):
+            operation, _, weight = item.partition('=')
+            operation = operation.strip()
+            if operation not in loadtest.DEFAULT_MIX:
+                raise CommandError(f'Неизвестная операция: {operation}')
+            try:
+                mix[operation] = float(weight)
+            except ValueError:
+                raise CommandError(f'Неверная доля операции {operation}: {weight}')
+        return mix
+
+    @staticmethod
+    def start_server(url):
+        """
+        Запускает runserver и ждет, пока он начнет принимать соединения.
+
+        Сервер учитывает последний адрес X-Forwarded-For (RATELIMIT_PROXY_HOPS = 1), которым нагрузка
+        различает клиентов.
+
+        Parameters:
+            url (str): Адрес сервера.
+
+        Returns:
+            Popen: Процесс сервера.
+        """
+        parts = urlsplit(url)
+        address = (parts.hostname, parts.port or 80)
+        server = subprocess.Popen(
+            [sys.executable, 'manage.py', 'runserver', '--noreload', f'{address[0]}:{address[1]}'],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'RATELIMIT_PROXY_HOPS': '1'},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(address, timeout=1).close()
+                return server
+            except OSError:
+                if server.poll() is not None:
+                    break
+                time.sleep(0.2)
+        server.kill()
+        raise CommandError(f'Не удалось запустить сервер на {url}')
+
+    def create_fixtures(self, prefix, pool_size):
+        """
+        Собирает идентификаторы объектов для запросов и создает объекты для изменяющих операций.
+
+        Parameters:
+            prefix (str): Префикс имен создаваемых объектов.
+            pool_size (int): Количество пациентов для изменения и для удаления.
+
+        Returns:
+            dict: Идентификаторы для Scenario.
+        """
+        fixtures = {
+            'doctor': list(Doctor.objects.values_list('pk', flat=True)[:1000]),
+            'patient': list(Patient.objects.values_list('pk', flat=True)[:1000]),
+            'exercise': list(Exercise.objects.values_list('pk', flat=True)[:1000]),
+            'speciality': list(Speciality.objects.values_list('pk', flat=True)[:1000]),
+        }
+        if not all(fixtures.values()):
+            raise CommandError('Для нагрузки нужны хотя бы одна специальность, врач, пациент и упражнение.')
+        fixtures['frequency'] = [value for value, _ in Exercise.EXERCISE_FREQUENCY]
+
+        pool = Patient.objects.bulk_create([Patient(name=f'{prefix}pool {index}') for index in range(pool_size)])
+        fixtures['pool'] = [patient.pk for patient in pool]
+        doctors = Doctor.objects.bulk_create([
+            Doctor(name=f'{prefix}doctor {index}', speciality_id=random.choice(fixtures['speciality']))
+            for index in range(10)
+        ])
+        fixtures['own_doctor'] = [doctor.pk for doctor in doctors]
+        exercises = Exercise.objects.bulk_create([
+            Exercise(title=f'{prefix}exercise {index}', description='loadtest') for index in range(10)
+        ])
+        fixtures['own_exercise'] = [exercise.pk for exercise in exercises]
+        tasks = Task.objects.bulk_create([
+            Task(name=f'{prefix}task', status=Task.SUCCEEDED, result={'loadtest': index}) for index in range(10)
+        ])
+        fixtures['task'] = [task.pk for task in tasks]
+
+        exercises = {}
+        for exercise_id, speciality_id in Exercise.specialisations.through.objects.values_list(
+                'exercise_id', 'speciality_id'):
+            exercises.setdefault(speciality_id, []).append(exercise_id)
+        doctors = [
+            (doctor_id, exercises[speciality_id])
+            for doctor_id, speciality_id in Doctor.objects.values_list('pk', 'speciality_id')[:1000]
+            if speciality_id in exercises
+        ]
+
+        fixtures['linked'], fixtures['appointments'] = [], []
+        if doctors:
+            linked = Patient.objects.bulk_create([
+                Patient(name=f'{prefix}linked {index}') for index in range(pool_size)
+            ])
+            links = []
+            for patient in linked:
+                doctor_id, exercise_ids = random.choice(doctors)
+                links.append(Doctor.patients.through(doctor_id=doctor_id, patient_id=patient.pk))
+                # Каждое упражнение назначается пациенту один раз: пары (пациент, упражнение) не повторяются
+                fixtures['appointments'].extend((doctor_id, patient.pk, exercise_id) for exercise_id in exercise_ids)
+            Doctor.patients.through.objects.bulk_create(links)
+            permission_graph.invalidate()
+            fixtures['linked'] = [patient.pk for patient in linked]
+        else:
+            self.stderr.write(
+                'Нет врачей со специальностью, подходящей хотя бы одному упражнению: appoint и patch пропускаются.'
+            )
+        return fixtures
+
+    @staticmethod
+    def cleanup(prefix):
+        """
+        Удаляет врачей, пациентов, упражнения и задачи, созданные нагрузкой, вместе с их связями и назначениями.
+
+        Parameters:
+            prefix (str): Префикс имен объектов.
+        """
+        purge(Doctor, Doctor.all_objects.filter(name__startswith=prefix).values_list('pk', flat=True))
+        purge(Patient, Patient.all_objects.filter(name__startswith=prefix).values_list('pk', flat=True))
+        purge(Exercise, Exercise.all_objects.filter(title__startswith=prefix).values_list('pk', flat=True))
+        Task.objects.filter(name__startswith=prefix).delete()
+        permission_graph.invalidate()
+
+    def report(self, summary):
+        """
+        Выводит сводку результатов и гистограмму задержек.
+
+        Parameters:
+            summary (dict): Сводка (см. Stats.summary).
+        """
+        self.stdout.write(
+            f"{'operation':<12}{'requests':>10}{'rps':>10}{'p50, ms':>10}{'p95, ms':>10}{'p99, ms':>10}"
+            f"{'max, ms':>10}{'4xx':>8}{'429/503':>9}{'errors':>9}"
+        )
+        rows = list(summary['operations'].items()) + [('total', summary['total'])]
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<12}{row['requests']:>10}{row['rps']:>10.1f}{row['p50']:>10.1f}{row['p95']:>10.1f}"
+                f"{row['p99']:>10.1f}{row['max']:>10.1f}{row['client_errors']:>8}{row['throttled']:>9}"
+                f"{row['error_rate']:>9.2%}"
+            )
+
+        self.stdout.write('\nЗадержки, мс:')
+        histogram = summary['total']['histogram']
+        peak = max(histogram) or 1
+        labels = [f'<= {bound}' for bound in loadtest.HISTOGRAM_BOUNDS] + [f'> {loadtest.HISTOGRAM_BOUNDS[-1]}']
+        for label, count in zip(labels, histogram):
+            self.stdout.write(f"{label:>9} {count:>8} {'#' * round(40 * count / peak)}")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.deletion import purge_deleted
+from api.models import Doctor, Patient, Exercise
+
+
+class Command(BaseCommand):
+    """
+    Команда для физического удаления мягко удаленных врачей, пациентов и упражнений.
+
+    Предназначена для периодического запуска в фоне (cron, systemd timer) при включенной настройке SOFT_DELETE.
+
+    Example:
+        ```
+        python manage.py purge_deleted --batch-size 500
+        ```
+    """
+
+    help = 'Физически удаляет мягко удаленных врачей, пациентов и упражнения вместе с их назначениями.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество объектов, удаляемых в одной транзакции.')
+
+    def handle(self, *args, **options):
+        for model in (Doctor, Patient, Exercise):
+            deleted = purge_deleted(model, batch_size=options['batch_size'])
+            self.stdout.write(f'{model._meta.verbose_name_plural}: удалено {deleted}')
@@ -0,0 +1,180 @@
+import json
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from api import outbox
+from api.models import OutboxCheckpoint
+
+
+class NdjsonDirectory:
+    """
+    Получатель событий: каталог NDJSON-файлов, по файлу на пачку.
+
+    Файл называется <БД>-<первый ID>-<последний ID>.ndjson и появляется целиком (запись во временный файл
+    и переименование). Если команда остановилась до сохранения позиции, пачка записывается повторно
+    в файл с тем же именем.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def send(self, alias, lines, first, last):
+        name = os.path.join(self.path, f'{alias}-{first:020d}-{last:020d}.ndjson')
+        with open(f'{name}.tmp', 'w', encoding='utf-8') as file:
+            file.writelines(lines)
+        os.replace(f'{name}.tmp', name)
+
+    def close(self):
+        pass
+
+
+class SocketStream:
+    """
+    Получатель событий: поток NDJSON в TCP-сокет ("host:port") или Unix-сокет (путь к файлу сокета).
+
+    """
+
+    def __init__(self, address):
+        host, _, port = address.rpartition(':')
+        if port.isdigit():
+            self.socket = socket.create_connection((host, int(port)))
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(address)
+
+    def send(self, alias, lines, first, last):
+        self.socket.sendall(''.join(lines).encode())
+
+    def close(self):
+        self.socket.close()
+
+
+class Command(BaseCommand):
+    """
+    Команда для передачи событий об изменениях (см. api/outbox.py) потребителю пачками.
+
+    События читаются из основной БД и шардов назначений по порядку ID, начиная с позиции потребителя --consumer,
+    и после отправки пачки позиция сохраняется. События долгих транзакций, ID которых позиция уже прошла,
+    передаются позже, вне порядка (см. outbox.late()). Доставка "как минимум один раз": после сбоя последняя
+    пачка может быть отправлена повторно, поэтому потребитель должен пропускать события с уже обработанным ID.
+
+    Example:
+        ```
+        python manage.py relay_outbox --consumer analytics --output /var/lib/urbanmedic/outbox --interval 1
+        python manage.py relay_outbox --consumer notifications --socket 127.0.0.1:9100 --interval 1 --prune
+        ```
+    """
+
+    help = 'Передает события об изменениях врачей, пациентов, упражнений и назначений потребителю.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', default='default',
+                            help='Имя потребителя, под которым сохраняется позиция.')
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--output',
+                            help='Каталог для NDJSON-файлов.')
+        target.add_argument('--socket',
+                            help='Адрес "host:port" TCP-сокета или путь к Unix-сокету.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Максимальное количество событий в пачке.')
+        parser.add_argument('--interval', type=float,
+                            help='Пауза в секундах между проверками новых событий. Без нее события '
+                                 'передаются один раз.')
+        parser.add_argument('--prune', action='store_true',
+                            help='Удалять события, переданные всем потребителям.')
+
+    def handle(self, *args, **options):
+        try:
+            target = NdjsonDirectory(options['output']) if options['output'] else SocketStream(options['socket'])
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть получателя событий: {e}')
+
+        try:
+            while True:
+                sent = sum(self.relay(alias, target, options) for alias in outbox.databases())
+                if options['interval'] is None:
+                    break
+                if not sent:
+                    time.sleep(options['interval'])
+        finally:
+            target.close()
+
+    def relay(self, alias, target, options):
+        """
+        Передает события одной БД, пока они есть: сначала зафиксированные в пропусках позиции, затем новые.
+
+        Parameters:
+            alias (str): Алиас БД.
+            target (NdjsonDirectory or SocketStream): Получатель событий.
+            options (dict): Параметры команды.
+
+        Returns:
+            int: Количество переданных событий.
+        """
+        position = outbox.checkpoint(options['consumer'], alias)
+        sent = 0
+        while position.gaps:
+            events, gaps = outbox.late(alias, position.gaps, options['batch_size'], settings.OUTBOX_GAP_RETENTION)
+            if events:
+                self.send(alias, target, events, options)
+            position.gaps = gaps
+            self.save(position)
+            sent += len(events)
+            if not events:
+                break
+
+        while True:
+            events = outbox.pending(alias, position.last_event_id, options['batch_size'], settings.OUTBOX_GAP_TIMEOUT)
+            if not events:
+                break
+
+            self.send(alias, target, events, options)
+            now = time.time()
+            position.gaps += [[first, last, now] for first, last in outbox.skipped(position.last_event_id, events)]
+            position.last_event_id = events[-1].pk
+            self.save(position)
+            sent += len(events)
+
+        if options['prune'] and sent:
+            outbox.prune(alias)
+        return sent
+
+    def send(self, alias, target, events, options):
+        """
+        Отправляет пачку событий получателю.
+
+        Parameters:
+            alias (str): Алиас БД.
+            target (NdjsonDirectory or SocketStream): Получатель событий.
+            events (list of OutboxEvent): События.
+            options (dict): Параметры команды.
+        """
+        lines = [
+            json.dumps(outbox.message(event, alias), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+            for event in events
+        ]
+        target.send(alias, lines, events[0].pk, events[-1].pk)
+        if options['verbosity'] > 1:
+            self.stdout.write(f'{alias}: переданы события {events[0].pk}-{events[-1].pk}')
+
+    @staticmethod
+    def save(position):
+        """
+        Сохраняет позицию потребителя.
+
+        Parameters:
+            position (OutboxCheckpoint): Позиция.
+        """
+        OutboxCheckpoint.objects.using('default').filter(pk=position.pk).update(
+            last_event_id=position.last_event_id,
+            gaps=position.gaps,
+            updated_at=timezone.now()
+        )
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Mod
+
+from api import sharding
+from api.models import Appointment
+
+
+class Command(BaseCommand):
+    """
+    Команда для переноса назначений между шардами при смене карты шардов.
+
+    Текущая карта передается явно (--from-map), а не берется из настроек процесса: так команда может
+    исправить и распределение, сделанное не по той карте, которая сейчас указана в SHARD_MAP_FILE.
+
+    Перенос выполняется в два прохода, чтобы не останавливать запись:
+
+    1. Копирование: назначения корзин, которые меняют шард, копируются в новый шард с сохранением ключей.
+       Копирование идемпотентно, его можно повторять.
+    2. После того как новая карта указана в SHARD_MAP_FILE и процессы перезапущены, запуск с --cleanup
+       докопирует назначения, созданные в старых шардах за время переключения, и удалит их оттуда.
+
+    Example:
+        ```
+        python manage.py reshard_appointments --from-map current.json new.json
+        python manage.py reshard_appointments --from-map current.json new.json --cleanup
+        ```
+    """
+
+    help = 'Переносит назначения между шардами согласно новой карте шардов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target_map', help='JSON-файл новой карты шардов.')
+        parser.add_argument('--from-map', required=True,
+                            help='JSON-файл карты шардов, по которой сейчас распределены назначения.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Количество назначений, копируемых за один запрос.')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Удалить перенесенные назначения из старых шардов.')
+
+    def handle(self, *args, **options):
+        try:
+            source = sharding.read_shard_map(options['from_map'])
+            target = sharding.read_shard_map(options['target_map'])
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        moves = {}
+        for bucket, (old, new) in enumerate(zip(source, target)):
+            if old != new:
+                moves.setdefault((old, new), []).append(bucket)
+
+        if not moves:
+            self.stdout.write('Карты совпадают, переносить нечего.')
+            return
+
+        for (old, new), buckets in moves.items():
+            copied = self.copy(old, new, buckets, options['batch_size'])
+            self.stdout.write(f'{old} -> {new}: корзин {len(buckets)}, скопировано назначений {copied}')
+
+            if options['cleanup']:
+                deleted = self.moved(old, buckets)._raw_delete(old)
+                self.stdout.write(f'{old}: удалено перенесенных назначений {deleted}')
+
+    @staticmethod
+    def moved(alias, buckets):
+        """
+        Возвращает назначения шарда, относящиеся к переносимым корзинам.
+
+        Parameters:
+            alias (str): Алиас БД шарда.
+            buckets (list of int): Номера корзин.
+
+        Returns:
+            QuerySet: Назначения переносимых корзин.
+        """
+        return Appointment._base_manager.using(alias) \
+            .annotate(bucket=Mod('patient_id', settings.SHARD_BUCKETS)) \
+            .filter(bucket__in=buckets)
+
+    def copy(self, old, new, buckets, batch_size):
+        """
+        Копирует назначения переносимых корзин из старого шарда в новый пачками по возрастанию ключа.
+
+        Parameters:
+            old (str): Алиас БД старого шарда.
+            new (str): Алиас БД нового шарда.
+            buckets (list of int): Номера корзин.
+            batch_size (int): Размер пачки.
+
+        Returns:
+            int: Количество обработанных назначений.
+        """
+        copied, last_pk = 0, 0
+        fields = [field.attname for field in Appointment._meta.concrete_fields]
+        while True:
+            rows = list(self.moved(old, buckets).filter(pk__gt=last_pk).order_by('pk').values(*fields)[:batch_size])
+            if not rows:
+                return copied
+
+            with transaction.atomic(using=new):
+                Appointment._base_manager.using(new).bulk_create(
+                    [Appointment(**row) for row in rows],
+                    ignore_conflicts=True
+                )
+            copied += len(rows)
+            last_pk = rows[-1]['id']
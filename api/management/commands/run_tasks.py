@@ -0,0 +1,62 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import taskqueue
+
+
+def _work(poll_interval, once, stale_after):
+    """
+    Точка входа дочернего процесса воркера.
+
+    Parameters:
+        poll_interval (float): Пауза в секундах между опросами пустой очереди.
+        once (bool): Если True, выполнить все готовые задачи и выйти.
+        stale_after (int): Время в секундах, после которого выполняющаяся задача возвращается в очередь.
+    """
+    # Соединения, унаследованные от родительского процесса, нельзя использовать после fork
+    connections.close_all()
+    taskqueue.work(poll_interval=poll_interval, once=once, stale_after=stale_after)
+
+
+class Command(BaseCommand):
+    """
+    Команда для запуска воркеров очереди фоновых задач.
+
+    Очередь хранится в таблице api_task, поэтому внешний брокер не нужен.
+
+    Example:
+        ```
+        python manage.py run_tasks --processes 4
+        ```
+    """
+
+    help = 'Запускает воркеры очереди фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Количество процессов-воркеров.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза в секундах между опросами пустой очереди.')
+        parser.add_argument('--stale-after', type=int, default=3600,
+                            help='Время в секундах без сохранения прогресса, после которого выполняющаяся задача '
+                                 'возвращается в очередь. Воркеры проверяют зависшие задачи раз в минуту.')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить все готовые задачи и выйти.')
+
+    def handle(self, *args, **options):
+        worker_args = (options['poll_interval'], options['once'], options['stale_after'])
+        if options['processes'] == 1:
+            taskqueue.work(*worker_args)
+            return
+
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_work, args=worker_args)
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,393 @@
+import contextlib
+import datetime
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from api.compression import COMPRESSIBLE_TYPES, negotiate
+from api.models import IdempotencyKey
+from api.profiling import QueryProfiler, StackSampler
+from api.ratelimit import AdmissionController, QueryTimer, client_key, get_limiter, route_rate
+from api.routers import replica_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Middleware для сжатия ответов brotli или gzip в зависимости от заголовка Accept-Encoding.
+
+    Brotli используется, если установлен пакет brotli, иначе - gzip. Ответы меньше COMPRESSION_MIN_LENGTH байт
+    и ответы с несжимаемыми типами содержимого не сжимаются. Потоковые ответы сжимаются по мере отдачи.
+
+    """
+
+    def process_response(self, request, response):
+        """
+        Сжимает ответ, если клиент поддерживает одну из кодировок.
+
+        Parameters:
+            request (HttpRequest): Объект запроса от клиента.
+            response (HttpResponse): Ответ вью.
+
+        Returns:
+            HttpResponse: Сжатый или исходный ответ.
+        """
+        if response.has_header('Content-Encoding'):
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        name, compress, compress_sequence = encoding
+
+        if response.streaming:
+            # Асинхронные потоковые ответы не сжимаем, чтобы не превращать их в синхронные
+            if getattr(response, 'is_async', False):
+                return response
+            response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+                return response
+            compressed = compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(response.content))
+
+        # Сжатое представление не совпадает побайтово с исходным, поэтому сильный ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+        response.headers['Content-Encoding'] = name
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Middleware, разрешающий PrimaryReplicaRouter читать с реплик в GET-запросах к вью с use_replica = True.
+
+    После успешного изменяющего запроса клиенту выставляется cookie REPLICA_STICKY_COOKIE со временем,
+    до которого его чтения идут в основную БД (read-your-writes), - на REPLICA_STICKY_SECONDS секунд.
+    Клиенты без поддержки cookie могут передать заголовок X-Read-Primary: 1.
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            sticky_until = time.time() + settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                f'{sticky_until:.3f}',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if request.method in ('GET', 'HEAD') and getattr(view_class, 'use_replica', False) \
+                and not self.is_sticky(request):
+            replica_reads.set(True)
+
+    @staticmethod
+    def is_sticky(request):
+        """
+        Проверяет, должны ли чтения клиента идти в основную БД.
+
+        Parameters:
+            request (HttpRequest): Объект запроса от клиента.
+
+        Returns:
+            bool: True, если клиент недавно выполнял запись или явно запросил основную БД.
+        """
+        if request.headers.get('X-Read-Primary') == '1':
+            return True
+        try:
+            return float(request.COOKIES.get(settings.REPLICA_STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class RateLimitMiddleware:
+    """
+    Middleware, ограничивающий изменяющие запросы (POST, PUT, PATCH, DELETE).
+
+    1. Частота запросов ограничивается маркерной корзиной на пару (IP клиента, имя маршрута), IP клиента
+       за прокси берется из X-Forwarded-For (см. api.ratelimit.client_key()):
+       RATELIMIT_RATE запросов в секунду со всплеском до RATELIMIT_BURST, для отдельных маршрутов -
+       по RATELIMIT_ROUTES. Превышение отклоняется с кодом 429.
+    2. Число одновременно выполняемых запросов процесса ограничено ADMISSION_MAX_CONCURRENT, а при среднем
+       времени одного SQL-запроса выше ADMISSION_DB_LATENCY_MS запросы выполняются по одному. Лишние запросы
+       отклоняются с кодом 503.
+
+    Допуск проверяется до ограничения частоты, поэтому отклоненный с кодом 503 запрос не расходует маркер
+    клиента. Оба ответа содержат заголовок Retry-After. Чтения не ограничиваются.
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limiter = get_limiter()
+        self.admission = AdmissionController(
+            settings.ADMISSION_MAX_CONCURRENT,
+            settings.ADMISSION_DB_LATENCY_MS / 1000
+        )
+
+    def __call__(self, request):
+        if request.method in SAFE_METHODS:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+
+        if getattr(request, '_admitted', False):
+            self.admission.release(timer.average)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+
+        if not self.admission.try_acquire():
+            return self.reject(503, 'Сервис перегружен. Повторите позже.', 1)
+
+        route = request.resolver_match.url_name or request.resolver_match.route
+        rate, burst = route_rate(route)
+        wait = self.limiter.acquire(f'{client_key(request)}:{route}', rate, burst)
+        if wait:
+            self.admission.release()
+            return self.reject(429, 'Слишком много запросов. Повторите позже.', wait)
+        request._admitted = True
+        return None
+
+    @staticmethod
+    def reject(status, message, retry_after):
+        """
+        Формирует ответ на отклоненный запрос.
+
+        Parameters:
+            status (int): HTTP-код ответа.
+            message (str): Сообщение об ошибке.
+            retry_after (float): Через сколько секунд можно повторить запрос.
+
+        Returns:
+            JsonResponse: Ответ с заголовком Retry-After.
+        """
+        response = JsonResponse({'status': 'error', 'message': message}, status=status)
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
+
+
+class IdempotencyMiddleware:
+    """
+    Middleware, делающий POST-запросы с заголовком Idempotency-Key идемпотентными.
+
+    Первый запрос с ключом выполняется как обычно, а его ответ сохраняется в таблице api_idempotencykey
+    на IDEMPOTENCY_TTL секунд. Повтор с тем же ключом получает сохраненный ответ (с заголовком
+    Idempotent-Replayed: true) за один запрос к БД, не выполняя вью. Повтор с тем же ключом, но другим
+    телом или адресом отклоняется с кодом 422, повтор во время выполнения первого запроса - с кодом 409.
+
+    Ответы с кодами 429 и 5xx не сохраняются: такой запрос можно повторить с тем же ключом.
+
+    На время выполнения ключ занимается на IDEMPOTENCY_LEASE секунд и продлевается до IDEMPOTENCY_TTL, только
+    когда ответ сохранен. Если процесс упадет во время выполнения, ключ освободится через IDEMPOTENCY_LEASE.
+    Ответ сохраняется, только пока ключ занят этим же запросом: если аренда истекла и ключ занял повтор,
+    ответ первого запроса не перезаписывает его строку.
+
+    Ключи разных клиентов (по client_key) не пересекаются: в таблице хранится хэш адреса клиента и ключа.
+
+    """
+
+    HEADER = 'Idempotency-Key'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.headers.get(self.HEADER)
+        if request.method != 'POST' or key is None:
+            return self.get_response(request)
+
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return JsonResponse({'status': 'error', 'message': f'Некорректный заголовок {self.HEADER}.'}, status=400)
+
+        fingerprint = hashlib.sha256(
+            b'\n'.join((request.method.encode(), request.get_full_path().encode(), request.body))
+        ).hexdigest()
+
+        key = self.scope(client_key(request), key)
+        stored = IdempotencyKey.objects.filter(pk=key, expires_at__gt=timezone.now()).first()
+        if stored is None:
+            stored, created = self.claim(key, fingerprint)
+            if created:
+                return self.get_response_and_store(request, stored)
+
+        if stored.fingerprint != fingerprint:
+            return JsonResponse(
+                {'status': 'error', 'message': f'{self.HEADER} уже использован для другого запроса.'},
+                status=422
+            )
+        if stored.status_code is None:
+            response = JsonResponse(
+                {'status': 'error', 'message': 'Запрос с этим ключом еще выполняется.'},
+                status=409
+            )
+            response.headers['Retry-After'] = '1'
+            return response
+
+        response = HttpResponse(
+            zlib.decompress(stored.content),
+            status=stored.status_code,
+            content_type=stored.content_type
+        )
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    @staticmethod
+    def scope(client, key):
+        """
+        Возвращает ключ таблицы api_idempotencykey для ключа клиента.
+
+        Parameters:
+            client (str): Адрес клиента, см. client_key.
+            key (str): Значение заголовка Idempotency-Key.
+
+        Returns:
+            str: Хэш адреса клиента и ключа.
+        """
+        return hashlib.sha256(b'\n'.join((client.encode(), key.encode()))).hexdigest()
+
+    @staticmethod
+    def claim(key, fingerprint):
+        """
+        Занимает ключ на время выполнения запроса, но не дольше IDEMPOTENCY_LEASE секунд.
+
+        Parameters:
+            key (str): Ключ, см. scope.
+            fingerprint (str): Отпечаток запроса.
+
+        Returns:
+            tuple: Ключ и True, если он занят этим запросом, или ключ, занятый параллельным запросом, и False.
+        """
+        now = timezone.now()
+        expires_at = now + datetime.timedelta(seconds=settings.IDEMPOTENCY_LEASE)
+        # Истекший ключ освобождается и занимается заново
+        IdempotencyKey.objects.filter(pk=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(key=key, fingerprint=fingerprint, expires_at=expires_at), True
+        except IntegrityError:
+            return IdempotencyKey.objects.get(pk=key), False
+
+    def get_response_and_store(self, request, claimed):
+        """
+        Выполняет запрос и сохраняет ответ под ключом на IDEMPOTENCY_TTL секунд.
+
+        Ответ сохраняется, только если ключ все еще занят этим запросом: после истечения аренды его мог занять
+        повтор, и тогда строка принадлежит повтору.
+
+        Parameters:
+            request (HttpRequest): Объект запроса от клиента.
+            claimed (IdempotencyKey): Ключ, занятый этим запросом.
+
+        Returns:
+            HttpResponse: Ответ вью.
+        """
+        lease = IdempotencyKey.objects.filter(
+            pk=claimed.pk,
+            fingerprint=claimed.fingerprint,
+            expires_at=claimed.expires_at,
+            status_code__isnull=True
+        )
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            lease.delete()
+            raise
+
+        if response.streaming or response.status_code == 429 or response.status_code >= 500:
+            lease.delete()
+        else:
+            lease.update(
+                status_code=response.status_code,
+                content_type=response.get('Content-Type', ''),
+                content=zlib.compress(response.content),
+                expires_at=timezone.now() + datetime.timedelta(seconds=settings.IDEMPOTENCY_TTL)
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Middleware для профилирования SQL-запросов отдельных HTTP-запросов.
+
+    Профилируется доля PROFILING_SAMPLE_RATE всех запросов, а при PROFILING_HEADER = True - еще и запросы
+    с заголовком X-Profile: 1. Для профилируемого запроса записываются текст, время и место вызова каждого
+    SQL-запроса, а для запросов дольше SLOW_QUERY_MS - еще и план выполнения. Медленные запросы и сводка
+    по HTTP-запросу пишутся в журнал SLOW_QUERY_LOG, время работы с БД возвращается в заголовке Server-Timing.
+
+    С заголовком X-Profile: flamegraph стек обработки запроса сэмплируется, и свернутые стеки сохраняются
+    в каталог PROFILING_DIR для построения флеймграфа.
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        header = request.headers.get('X-Profile', '') if settings.PROFILING_HEADER else ''
+        if not header and random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profiler = QueryProfiler()
+        sampler = StackSampler(threading.get_ident()) if header == 'flamegraph' else None
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            profiler.attach(stack)
+            if sampler is not None:
+                sampler.start()
+                stack.callback(sampler.stop)
+            response = self.get_response(request)
+        duration = (time.perf_counter() - started) * 1000
+
+        profiler.log(request, response.status_code, duration)
+        response.headers['Server-Timing'] = \
+            f'db;dur={profiler.total_ms:.1f};desc="{len(profiler.queries)} queries", app;dur={duration:.1f}'
+
+        if sampler is not None:
+            name = f'{time.strftime("%Y%m%d-%H%M%S")}-{request.method}-{request.path.strip("/").replace("/", "_")}'
+            sampler.dump(os.path.join(settings.PROFILING_DIR, f'{name}.folded'))
+        return response
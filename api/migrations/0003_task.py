@@ -0,0 +1,38 @@
+# Generated by Django 4.2.3 on 2026-10-19 11:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, verbose_name='name')),
+                ('args', models.JSONField(default=list, verbose_name='args')),
+                ('kwargs', models.JSONField(default=dict, verbose_name='kwargs')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает выполнения'), ('running', 'Выполняется'), ('succeeded', 'Выполнена'), ('failed', 'Завершилась ошибкой')], default='pending', max_length=16, verbose_name='status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='max attempts')),
+                ('progress_current', models.PositiveIntegerField(default=0, verbose_name='progress current')),
+                ('progress_total', models.PositiveIntegerField(blank=True, null=True, verbose_name='progress total')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='result')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('worker', models.CharField(blank=True, max_length=128, verbose_name='worker')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='run after')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='started at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='api_task_status_run_after')],
+            },
+        ),
+    ]
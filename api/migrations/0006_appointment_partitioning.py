@@ -0,0 +1,83 @@
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = 'api_appointment'
+LEGACY = 'api_appointment_legacy'
+
+# Сколько месячных партиций создается вперед от текущего месяца
+AHEAD = 2
+
+
+def month_bound(year, month):
+    index = year * 12 + month - 1
+    return timezone.make_aware(datetime.datetime(index // 12, index % 12 + 1, 1))
+
+
+def partition_appointments(apps, schema_editor):
+    """
+    Переводит таблицу назначений на декларативное партиционирование Postgres по месяцам appointment_date.
+
+    Существующие назначения копируются в новую партиционированную таблицу, индексы пересоздаются
+    на родительской таблице и наследуются партициями. На других СУБД миграция ничего не делает.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [TABLE, f'{TABLE}_pkey']
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {LEGACY}')
+        cursor.execute(f'ALTER TABLE {LEGACY} RENAME CONSTRAINT {TABLE}_pkey TO {LEGACY}_pkey')
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {LEGACY} INCLUDING DEFAULTS INCLUDING IDENTITY, '
+            f'PRIMARY KEY (id, appointment_date)) PARTITION BY RANGE (appointment_date)'
+        )
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'SELECT MIN(appointment_date) FROM {LEGACY}')
+        first = timezone.localtime(cursor.fetchone()[0] or timezone.now())
+        now = timezone.localtime()
+        for index in range(first.year * 12 + first.month - 1, now.year * 12 + now.month + AHEAD):
+            year, month = index // 12, index % 12 + 1
+            cursor.execute(
+                f'CREATE TABLE {TABLE}_y{year}m{month:02d} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                [month_bound(year, month), month_bound(year, month + 1)]
+            )
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {LEGACY}')
+
+        # Счетчик ключей продолжается с того же значения, включая сдвиг шарда (init_appointment_shards)
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id'), pg_get_serial_sequence(%s, 'id')",
+            [LEGACY, TABLE]
+        )
+        legacy_sequence, sequence = cursor.fetchone()
+        cursor.execute(f'SELECT last_value, is_called FROM {legacy_sequence}')
+        last_value, is_called = cursor.fetchone()
+        cursor.execute('SELECT setval(%s, %s, %s)', [sequence, last_value, is_called])
+
+        cursor.execute(f'DROP TABLE {LEGACY}')
+        for indexdef in indexes:
+            cursor.execute(indexdef)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_appointment_sharding'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            partition_appointments,
+            migrations.RunPython.noop,
+            hints={'model_name': 'appointment'}
+        ),
+    ]
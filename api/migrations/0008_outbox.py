@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2026-10-19 12:24
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=64, verbose_name='consumer')),
+                ('database', models.CharField(max_length=64, verbose_name='database')),
+                ('last_event_id', models.BigIntegerField(default=0, verbose_name='last event id')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32, verbose_name='model')),
+                ('object_id', models.BigIntegerField(verbose_name='object id')),
+                ('action', models.CharField(choices=[('create', 'Создание'), ('update', 'Изменение'), ('delete', 'Удаление')], max_length=8, verbose_name='action')),
+                ('data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='data')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='outboxcheckpoint',
+            constraint=models.UniqueConstraint(fields=('consumer', 'database'), name='api_outbox_checkpoint_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def shorten_errors(apps, schema_editor):
+    """
+    Заменяет сохраненные в задачах трейсбеки классом исключения: статус задачи доступен без авторизации.
+    """
+    Task = apps.get_model('api', 'Task')
+    tasks = Task.objects.using(schema_editor.connection.alias).filter(error__startswith='Traceback')
+    for task in tasks.only('pk', 'error').iterator():
+        task.error = task.error.strip().splitlines()[-1].partition(':')[0]
+        task.save(update_fields=['error'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_outbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(shorten_errors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_started_at(apps, schema_editor):
+    """
+    Заполняет heartbeat_at выполняющихся задач временем начала попытки.
+    """
+    Task = apps.get_model('api', 'Task')
+    Task.objects.using(schema_editor.connection.alias).filter(status='running').update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_outbox_checkpoint_gaps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='heartbeat at'),
+        ),
+        migrations.RunPython(copy_started_at, migrations.RunPython.noop),
+    ]
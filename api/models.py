@@ -1,4 +1,47 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteManager(models.Manager):
+    """
+    Менеджер, скрывающий мягко удаленные записи.
+
+    Methods:
+        get_queryset(): Возвращает QuerySet только с неудаленными записями.
+
+    """
+
+    def get_queryset(self):
+        """
+        Возвращает QuerySet без записей, помеченных как удаленные.
+
+        Returns:
+            QuerySet: Записи, у которых не заполнено поле deleted_at.
+        """
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class SoftDeleteModel(models.Model):
+    """
+    Абстрактная модель с поддержкой мягкого удаления.
+
+    Запись помечается удаленной заполнением поля deleted_at, а физически удаляется позже
+    командой purge_deleted (см. api/deletion.py).
+
+    Attributes:
+        deleted_at (DateTimeField): Дата мягкого удаления. Пустое значение означает, что запись активна.
+        objects (SoftDeleteManager): Менеджер по умолчанию, возвращающий только активные записи.
+        all_objects (Manager): Менеджер, возвращающий все записи, включая удаленные.
+
+    """
+    deleted_at = models.DateTimeField('deleted at', null=True, blank=True, db_index=True, editable=False)
+
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        abstract = True
 
 
 class Speciality(models.Model):
@@ -21,7 +64,7 @@ class Speciality(models.Model):
         return self.title
 
 
-class Exercise(models.Model):
+class Exercise(SoftDeleteModel):
     """
     Сущность "Упражнение".
 
@@ -39,6 +82,7 @@ class Exercise(models.Model):
             выбора из списка EXERCISE_FREQUENCY. По умолчанию установлено значение "Каждый день".
         specialisations (ManyToManyField): Связь с моделью Speciality для определения специализаций, к которым
             относится упражнение.
+        deleted_at (DateTimeField): Дата мягкого удаления упражнения (см. SoftDeleteModel).
 
     Methods:
         __str__(): Возвращает строковое представление объекта упражнения (название упражнения).
@@ -76,12 +120,13 @@ class Exercise(models.Model):
         return self.title
 
 
-class Patient(models.Model):
+class Patient(SoftDeleteModel):
     """
     Сущность "Пациент".
 
     Attributes:
         name (CharField): Имя пациента. Поле типа CharField, максимальная длина 128 символов.
+        deleted_at (DateTimeField): Дата мягкого удаления пациента (см. SoftDeleteModel).
 
     Methods:
         __str__(): Возвращает строковое представление объекта пациента (имя пациента).
@@ -99,7 +144,7 @@ class Patient(models.Model):
         return self.name
 
 
-class Doctor(models.Model):
+class Doctor(SoftDeleteModel):
     """
     Сущность "Врач".
 
@@ -109,6 +154,7 @@ class Doctor(models.Model):
                                  с вариантом удаления CASCADE.
         patients (ManyToManyField): Пациенты, связанные с врачом. Множественное отношение "многие ко многим"
                                    с моделью Patient.
+        deleted_at (DateTimeField): Дата мягкого удаления врача (см. SoftDeleteModel).
 
     Methods:
         __str__(): Возвращает строковое представление объекта врача.
@@ -128,6 +174,77 @@ class Doctor(models.Model):
         return f"Имя: {self.name}, Специальность: {self.speciality}"
 
 
+class AppointmentQuerySet(models.QuerySet):
+    """
+    QuerySet назначений с выборками, учитывающими шардирование по пациенту (см. api/sharding.py).
+
+    Methods:
+        exclude_deleted(*fields): Назначения без мягко удаленных врачей, пациентов и упражнений.
+        for_patient(patient_id): Назначения пациента из его шарда.
+        for_doctor(doctor_id): Назначения врача со всех шардов.
+
+    """
+
+    def exclude_deleted(self, *fields):
+        """
+        Исключает назначения, связанные с мягко удаленными объектами: до физического удаления фоновой задачей
+        (см. api/deletion.py) их назначения остаются в шардах. Таблицы шардов нельзя соединить с таблицами
+        основной БД, поэтому ID удаленных объектов всех указанных связей загружаются одним запросом.
+
+        Parameters:
+            fields (str): Связи назначения: "doctor", "patient" или "exercise".
+
+        Returns:
+            QuerySet: Назначения без связанных удаленных объектов.
+        """
+        querysets = [
+            self.model._meta.get_field(field).related_model.all_objects
+            .filter(deleted_at__isnull=False)
+            .values_list(models.Value(field, output_field=models.CharField()), 'pk')
+            for field in fields
+        ]
+        deleted = {}
+        for field, pk in querysets[0].union(*querysets[1:], all=True):
+            deleted.setdefault(field, []).append(pk)
+
+        queryset = self
+        for field, pks in deleted.items():
+            queryset = queryset.exclude(**{f'{field}_id__in': pks})
+        return queryset
+
+    def for_patient(self, patient_id):
+        """
+        Возвращает назначения пациента без мягко удаленных врачей и упражнений. Запрос выполняется
+        только в шарде пациента.
+
+        Parameters:
+            patient_id (int): ID пациента.
+
+        Returns:
+            QuerySet: Назначения пациента.
+        """
+        from api.sharding import shard_for
+
+        return self.using(shard_for(patient_id)).filter(patient_id=patient_id).exclude_deleted('doctor', 'exercise')
+
+    def for_doctor(self, doctor_id):
+        """
+        Возвращает назначения врача без мягко удаленных пациентов и упражнений, отсортированные по дате.
+        Запрос выполняется на всех шардах, результаты объединяются.
+
+        Parameters:
+            doctor_id (int): ID врача.
+
+        Returns:
+            list of Appointment: Назначения врача.
+        """
+        from api.sharding import fan_out, merge
+
+        queryset = self.filter(doctor_id=doctor_id).exclude_deleted('patient', 'exercise')
+        querysets = fan_out(queryset.order_by('appointment_date', 'pk'))
+        return merge(querysets, key=lambda appointment: (appointment.appointment_date, appointment.pk))
+
+
 class Appointment(models.Model):
     """
     Сущность "Назначение".
@@ -139,17 +256,26 @@ class Appointment(models.Model):
                               С вариантом удаления CASCADE, что означает удаление связанного назначения при удалении пациента.
         exercise (ForeignKey): Внешний ключ на модель Exercise. Ссылается на упражнение, связанное с назначением.
                                С вариантом удаления CASCADE, что означает удаление связанного назначения при удалении упражнения.
+        Внешние ключи создаются без ограничений в БД, так как назначения могут храниться в шардах отдельно
+        от врачей, пациентов и упражнений (см. api/sharding.py).
         appointment_date (DateTimeField): Дата назначения упражнения. Поле типа DateTimeField.
 
     Methods:
         __str__(): Возвращает строковое представление объекта назначения.
 
     """
-    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
-    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
-    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, db_constraint=False)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, db_constraint=False)
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, db_constraint=False)
     appointment_date = models.DateTimeField('Дата назначения')
 
+    objects = AppointmentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['appointment_date'], name='api_appointment_date'),
+        ]
+
     def __str__(self):
         """
         Возвращает строковое представление объекта назначения.
@@ -159,3 +285,213 @@ class Appointment(models.Model):
                  Упражнение: <название упражнения>".
         """
         return f"Доктор: {self.doctor.name}, Пациент: {self.patient.name}, Упражнение: {self.exercise.title}"
+
+
+class Task(models.Model):
+    """
+    Сущность "Фоновая задача" очереди задач (см. api/taskqueue.py).
+
+    Attributes:
+        PENDING (str): Константа для статуса "Ожидает выполнения".
+        RUNNING (str): Константа для статуса "Выполняется".
+        SUCCEEDED (str): Константа для статуса "Выполнена".
+        FAILED (str): Константа для статуса "Завершилась ошибкой".
+        TASK_STATUS (list of tuple): Список с кортежами статусов задачи.
+
+        name (CharField): Имя зарегистрированной функции задачи.
+        args (JSONField): Позиционные аргументы функции задачи.
+        kwargs (JSONField): Именованные аргументы функции задачи.
+        status (CharField): Статус задачи из списка TASK_STATUS.
+        attempts (PositiveIntegerField): Количество выполненных попыток.
+        max_attempts (PositiveIntegerField): Максимальное количество попыток до перевода задачи в FAILED.
+        progress_current (PositiveIntegerField): Количество обработанных элементов.
+        progress_total (PositiveIntegerField): Общее количество элементов, если известно.
+        result (JSONField): Результат, возвращенный функцией задачи.
+        error (TextField): Класс исключения последней ошибки. Трейсбек пишется в лог api.taskqueue.
+        worker (CharField): Идентификатор воркера, выполняющего задачу.
+        run_after (DateTimeField): Время, раньше которого задачу нельзя брать в работу.
+        created_at (DateTimeField): Время постановки задачи в очередь.
+        started_at (DateTimeField): Время начала последней попытки.
+        heartbeat_at (DateTimeField): Время последнего сигнала воркера о выполнении: захвата задачи
+                                      или сохранения прогресса.
+        finished_at (DateTimeField): Время завершения задачи.
+
+    Methods:
+        set_progress(current, total=None): Сохраняет прогресс выполнения задачи и продлевает heartbeat_at.
+
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    TASK_STATUS = [
+        (PENDING, 'Ожидает выполнения'),
+        (RUNNING, 'Выполняется'),
+        (SUCCEEDED, 'Выполнена'),
+        (FAILED, 'Завершилась ошибкой'),
+    ]
+
+    name = models.CharField('name', max_length=128)
+    args = models.JSONField('args', default=list)
+    kwargs = models.JSONField('kwargs', default=dict)
+    status = models.CharField('status', max_length=16, choices=TASK_STATUS, default=PENDING)
+    attempts = models.PositiveIntegerField('attempts', default=0)
+    max_attempts = models.PositiveIntegerField('max attempts', default=3)
+    progress_current = models.PositiveIntegerField('progress current', default=0)
+    progress_total = models.PositiveIntegerField('progress total', null=True, blank=True)
+    result = models.JSONField('result', null=True, blank=True)
+    error = models.TextField('error', blank=True)
+    worker = models.CharField('worker', max_length=128, blank=True)
+    run_after = models.DateTimeField('run after', default=timezone.now)
+    created_at = models.DateTimeField('created at', auto_now_add=True)
+    started_at = models.DateTimeField('started at', null=True, blank=True)
+    heartbeat_at = models.DateTimeField('heartbeat at', null=True, blank=True)
+    finished_at = models.DateTimeField('finished at', null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='api_task_status_run_after'),
+        ]
+
+    def set_progress(self, current, total=None):
+        """
+        Сохраняет прогресс выполнения задачи одним UPDATE-запросом и продлевает heartbeat_at: задача, которая
+        сообщает прогресс, не считается зависшей (см. taskqueue.requeue_stale()). Долгим задачам стоит сообщать
+        прогресс чаще, чем раз в stale_after секунд воркера.
+
+        Parameters:
+            current (int): Количество обработанных элементов.
+            total (int, optional): Общее количество элементов. Если не указано, остается прежним.
+
+        Returns:
+            bool: False, если задача уже возвращена в очередь и выполняется другим воркером.
+        """
+        self.progress_current = current
+        fields = {'progress_current': current, 'heartbeat_at': timezone.now()}
+        if total is not None:
+            self.progress_total = total
+            fields['progress_total'] = total
+
+        return bool(Task.objects.filter(pk=self.pk, worker=self.worker, status=Task.RUNNING).update(**fields))
+
+    def __str__(self):
+        """
+        Возвращает строковое представление объекта задачи.
+
+        Returns:
+            str: Строковое представление задачи в формате "<имя задачи> #<id> (<статус>)".
+        """
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Сущность "Ключ идемпотентности": сохраненный ответ на POST-запрос с заголовком Idempotency-Key
+    (см. api/middleware.py, IdempotencyMiddleware).
+
+    Attributes:
+        key (CharField): Значение заголовка Idempotency-Key.
+        fingerprint (CharField): SHA-256 метода, пути и тела запроса.
+        status_code (PositiveSmallIntegerField): HTTP-код ответа или None, пока запрос выполняется.
+        content_type (CharField): Тип содержимого ответа.
+        content (BinaryField): Тело ответа, сжатое zlib.
+        expires_at (DateTimeField): Время, после которого ключ считается свободным.
+
+    """
+    key = models.CharField('key', max_length=255, primary_key=True)
+    fingerprint = models.CharField('fingerprint', max_length=64)
+    status_code = models.PositiveSmallIntegerField('status code', null=True, blank=True)
+    content_type = models.CharField('content type', max_length=128, blank=True)
+    content = models.BinaryField('content', default=b'')
+    expires_at = models.DateTimeField('expires at', db_index=True)
+
+    def __str__(self):
+        """
+        Возвращает строковое представление объекта ключа идемпотентности.
+
+        Returns:
+            str: Значение ключа.
+        """
+        return self.key
+
+
+class OutboxEvent(models.Model):
+    """
+    Сущность "Событие об изменении" врача, пациента, упражнения или назначения для внешних систем
+    (см. api/outbox.py).
+
+    Событие записывается в той же транзакции и в той же БД, что и изменение, поэтому назначения
+    пишут события в свой шард. Команда relay_outbox передает события потребителям.
+
+    Attributes:
+        CREATE (str): Константа для действия "Создание".
+        UPDATE (str): Константа для действия "Изменение".
+        DELETE (str): Константа для действия "Удаление".
+        EVENT_ACTIONS (list of tuple): Список с кортежами действий.
+
+        model (CharField): Имя модели в нижнем регистре, например "doctor".
+        object_id (BigIntegerField): ID измененного объекта.
+        action (CharField): Действие из списка EVENT_ACTIONS.
+        data (JSONField): Поля объекта после изменения или None при удалении.
+        created_at (DateTimeField): Время изменения.
+
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    EVENT_ACTIONS = [
+        (CREATE, 'Создание'),
+        (UPDATE, 'Изменение'),
+        (DELETE, 'Удаление'),
+    ]
+
+    model = models.CharField('model', max_length=32)
+    object_id = models.BigIntegerField('object id')
+    action = models.CharField('action', max_length=8, choices=EVENT_ACTIONS)
+    data = models.JSONField('data', null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField('created at', default=timezone.now)
+
+    def __str__(self):
+        """
+        Возвращает строковое представление объекта события.
+
+        Returns:
+            str: Строковое представление события в формате "<id>: <действие> <модель> <ID объекта>".
+        """
+        return f"{self.pk}: {self.action} {self.model} {self.object_id}"
+
+
+class OutboxCheckpoint(models.Model):
+    """
+    Сущность "Позиция потребителя" в журнале событий об изменениях одной БД (см. api/outbox.py).
+
+    Attributes:
+        consumer (CharField): Имя потребителя.
+        database (CharField): Алиас БД, из которой читаются события.
+        last_event_id (BigIntegerField): ID последнего переданного события.
+        gaps (JSONField): Пропуски в ID до last_event_id, события которых еще могут быть зафиксированы:
+                          список [первый ID, последний ID, время обнаружения в секундах Unix].
+        updated_at (DateTimeField): Время последнего сдвига позиции.
+
+    """
+    consumer = models.CharField('consumer', max_length=64)
+    database = models.CharField('database', max_length=64)
+    last_event_id = models.BigIntegerField('last event id', default=0)
+    gaps = models.JSONField('gaps', default=list)
+    updated_at = models.DateTimeField('updated at', auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['consumer', 'database'], name='api_outbox_checkpoint_unique'),
+        ]
+
+    def __str__(self):
+        """
+        Возвращает строковое представление объекта позиции потребителя.
+
+        Returns:
+            str: Строковое представление позиции в формате "<потребитель>@<БД>: <ID события>".
+        """
+        return f"{self.consumer}@{self.database}: {self.last_event_id}"
@@ -0,0 +1,263 @@
+import datetime
+import functools
+import operator
+import time
+
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from api import sharding
+from api.models import OutboxCheckpoint, OutboxEvent
+
+
+def databases():
+    """
+    Возвращает алиасы БД, в которых записываются события: основная БД и шарды назначений.
+
+    Returns:
+        list of str: Алиасы БД.
+    """
+    return sharding.shards()
+
+
+def _data(instance):
+    """
+    Возвращает поля объекта для события: значения столбцов без первичного ключа и даты мягкого удаления.
+    Для внешних ключей возвращается ID связанного объекта.
+
+    Parameters:
+        instance (Model): Объект модели.
+
+    Returns:
+        dict: Значение по имени поля.
+    """
+    return {
+        field.name: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name != 'deleted_at'
+    }
+
+
+def atomic(instance):
+    """
+    Открывает транзакцию в БД, в которую записывается объект (для назначений - в шарде пациента).
+
+    Parameters:
+        instance (Model): Объект модели.
+
+    Returns:
+        Atomic: Контекстный менеджер транзакции.
+    """
+    return transaction.atomic(using=router.db_for_write(type(instance), instance=instance))
+
+
+def record(instances, action):
+    """
+    Добавляет события об изменении объектов. События записываются в БД объектов, поэтому вызов должен
+    выполняться в транзакции изменения (см. atomic() и save()). На каждую БД выполняется один INSERT,
+    поэтому для объектов из bulk_create события добавляются одним запросом.
+
+    Parameters:
+        instances (Model or list of Model): Сохраненные объекты.
+        action (str): OutboxEvent.CREATE или OutboxEvent.UPDATE.
+    """
+    if isinstance(instances, models.Model):
+        instances = [instances]
+
+    events = {}
+    for instance in instances:
+        alias = instance._state.db or router.db_for_write(type(instance), instance=instance)
+        events.setdefault(alias, []).append(OutboxEvent(
+            model=instance._meta.model_name,
+            object_id=instance.pk,
+            action=action,
+            data=_data(instance)
+        ))
+    for alias, alias_events in events.items():
+        OutboxEvent.objects.using(alias).bulk_create(alias_events)
+
+
+def record_deleted(model, pks, using):
+    """
+    Добавляет события об удалении объектов. Вызов должен выполняться в транзакции удаления.
+
+    Parameters:
+        model (Model): Класс модели удаленных объектов.
+        pks (list of int): ID удаленных объектов.
+        using (str): Алиас БД, в которой выполнялось удаление.
+    """
+    OutboxEvent.objects.using(using).bulk_create([
+        OutboxEvent(model=model._meta.model_name, object_id=pk, action=OutboxEvent.DELETE) for pk in pks
+    ])
+
+
+def save(instance, action):
+    """
+    Сохраняет объект и добавляет событие об изменении в одной транзакции.
+
+    Parameters:
+        instance (Model): Объект модели.
+        action (str): OutboxEvent.CREATE или OutboxEvent.UPDATE.
+    """
+    with atomic(instance):
+        instance.save()
+        record(instance, action)
+
+
+def message(event, alias):
+    """
+    Преобразует событие в сообщение для потребителей.
+
+    Parameters:
+        event (OutboxEvent): Событие.
+        alias (str): Алиас БД, из которой прочитано событие.
+
+    Returns:
+        dict: Сообщение с полями id, db, time, model, action, pk и data.
+    """
+    return {
+        'id': event.pk,
+        'db': alias,
+        'time': event.created_at,
+        'model': event.model,
+        'action': event.action,
+        'pk': event.object_id,
+        'data': event.data,
+    }
+
+
+def pending(alias, after, limit, gap_timeout):
+    """
+    Возвращает события, которые можно передать потребителю, по порядку ID.
+
+    ID выдаются при INSERT, а видимым событие становится при фиксации транзакции, поэтому событие с меньшим ID
+    может появиться позже события с большим. Если в последовательности ID есть пропуск, события после него
+    возвращаются, только когда они старше gap_timeout секунд: обычно к этому времени транзакция с пропущенным ID
+    уже зафиксирована или отменена. Пропуски, через которые сдвигается позиция (см. skipped()), сохраняются
+    в позиции потребителя, и события долгих транзакций передаются позже функцией late().
+
+    Parameters:
+        alias (str): Алиас БД.
+        after (int): ID последнего переданного события.
+        limit (int): Максимальное количество событий.
+        gap_timeout (float): Время в секундах, после которого пропуск в ID считается окончательным.
+
+    Returns:
+        list of OutboxEvent: События.
+    """
+    horizon = timezone.now() - datetime.timedelta(seconds=gap_timeout)
+    events = []
+    for event in OutboxEvent.objects.using(alias).filter(pk__gt=after).order_by('pk')[:limit]:
+        # У нового потребителя (after = 0) события до первого могли быть удалены после передачи другим
+        if after and event.pk != after + 1 and event.created_at > horizon:
+            break
+        events.append(event)
+        after = event.pk
+    return events
+
+
+def skipped(after, events):
+    """
+    Возвращает пропуски в ID, через которые позиция потребителя сдвигается вместе с событиями из pending().
+
+    Parameters:
+        after (int): ID последнего переданного события.
+        events (list of OutboxEvent): События по порядку ID.
+
+    Returns:
+        list of tuple: Первый и последний ID каждого пропуска.
+    """
+    gaps = []
+    for event in events:
+        # У нового потребителя (after = 0) события до первого не пропущены, а переданы другим потребителям
+        if after and event.pk > after + 1:
+            gaps.append((after + 1, event.pk - 1))
+        after = event.pk
+    return gaps
+
+
+def _split(gaps, pk):
+    """
+    Исключает ID из пропусков.
+
+    Parameters:
+        gaps (list): Пропуски [первый ID, последний ID, время обнаружения].
+        pk (int): ID появившегося события.
+
+    Returns:
+        list: Пропуски без этого ID.
+    """
+    result = []
+    for first, last, since in gaps:
+        if first <= pk <= last:
+            if first < pk:
+                result.append([first, pk - 1, since])
+            if pk < last:
+                result.append([pk + 1, last, since])
+        else:
+            result.append([first, last, since])
+    return result
+
+
+def late(alias, gaps, limit, retention):
+    """
+    Возвращает события, зафиксированные в пропусках ID уже после того, как позиция потребителя прошла их.
+
+    Пропуск ждет событий retention секунд с момента обнаружения, после этого его ID считаются выданными
+    отмененным транзакциям (такие ID так и остаются пропусками).
+
+    Parameters:
+        alias (str): Алиас БД.
+        gaps (list): Пропуски позиции потребителя (см. OutboxCheckpoint.gaps).
+        limit (int): Максимальное количество событий.
+        retention (float): Время в секундах, в течение которого пропуск ждет событий.
+
+    Returns:
+        tuple: События (list of OutboxEvent) по порядку ID и пропуски, которые еще ждут событий (list).
+    """
+    horizon = time.time() - retention
+    gaps = [gap for gap in gaps if gap[2] > horizon]
+    if not gaps:
+        return [], gaps
+
+    condition = functools.reduce(operator.or_, (models.Q(pk__range=(first, last)) for first, last, _ in gaps))
+    events = list(OutboxEvent.objects.using(alias).filter(condition).order_by('pk')[:limit])
+    for event in events:
+        gaps = _split(gaps, event.pk)
+    return events, gaps
+
+
+def checkpoint(consumer, alias):
+    """
+    Возвращает позицию потребителя в журнале событий БД, создавая ее при первом обращении.
+
+    Parameters:
+        consumer (str): Имя потребителя.
+        alias (str): Алиас БД, из которой читаются события.
+
+    Returns:
+        OutboxCheckpoint: Позиция потребителя.
+    """
+    position, _ = OutboxCheckpoint.objects.using('default').get_or_create(consumer=consumer, database=alias)
+    return position
+
+
+def prune(alias):
+    """
+    Удаляет события, которые переданы всем потребителям этой БД. События из незакрытых пропусков
+    (см. late()) остаются, пока пропуск ждет событий.
+
+    Parameters:
+        alias (str): Алиас БД.
+
+    Returns:
+        int: Количество удаленных событий.
+    """
+    positions = OutboxCheckpoint.objects.using('default').filter(database=alias).values_list('last_event_id', 'gaps')
+    last_event_id = min(
+        (min([last] + [first - 1 for first, _, _ in gaps]) for last, gaps in positions),
+        default=0
+    )
+    if not last_event_id:
+        return 0
+    return OutboxEvent.objects.using(alias).filter(pk__lte=last_event_id)._raw_delete(alias)
@@ -0,0 +1,293 @@
+import datetime
+import gzip
+import json
+import os
+import re
+
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Appointment
+
+#: Родительская таблица назначений.
+PARENT = Appointment._meta.db_table
+
+#: Партиция по умолчанию для назначений вне созданных месячных партиций.
+DEFAULT_PARTITION = f'{PARENT}_default'
+
+#: Имя месячной партиции, например api_appointment_y2023m07.
+PARTITION_NAME = re.compile(rf'^{PARENT}_y(?P<year>\d{{4}})m(?P<month>\d{{2}})$')
+
+#: Столбцы, выгружаемые в архив.
+COLUMNS = ('id', 'doctor_id', 'patient_id', 'exercise_id', 'appointment_date')
+
+
+def month_start(value):
+    """
+    Возвращает начало месяца для даты.
+
+    Parameters:
+        value (date or datetime): Дата.
+
+    Returns:
+        date: Первое число месяца.
+    """
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """
+    Сдвигает начало месяца на указанное количество месяцев.
+
+    Parameters:
+        month (date): Первое число месяца.
+        count (int): Количество месяцев (может быть отрицательным).
+
+    Returns:
+        date: Первое число месяца после сдвига.
+    """
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """
+    Возвращает границы месяца в текущем часовом поясе.
+
+    Parameters:
+        month (date): Первое число месяца.
+
+    Returns:
+        tuple: Начало месяца и начало следующего месяца (datetime с часовым поясом).
+    """
+    start = timezone.make_aware(datetime.datetime.combine(month, datetime.time()))
+    end = timezone.make_aware(datetime.datetime.combine(add_months(month, 1), datetime.time()))
+    return start, end
+
+
+def partition_name(month):
+    """
+    Возвращает имя месячной партиции.
+
+    Parameters:
+        month (date): Первое число месяца.
+
+    Returns:
+        str: Имя партиции.
+    """
+    return f'{PARENT}_y{month.year}m{month.month:02d}'
+
+
+def is_partitioned(connection):
+    """
+    Проверяет, хранятся ли назначения в партиционированной таблице.
+
+    Parameters:
+        connection (BaseDatabaseWrapper): Соединение с БД.
+
+    Returns:
+        bool: True для партиционированной таблицы Postgres.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s',
+            [PARENT]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(connection):
+    """
+    Возвращает месячные партиции назначений.
+
+    Parameters:
+        connection (BaseDatabaseWrapper): Соединение с Postgres.
+
+    Returns:
+        dict: Имя партиции по первому числу месяца.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent '
+            'WHERE p.relname = %s',
+            [PARENT]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    result = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            result[datetime.date(int(match['year']), int(match['month']), 1)] = name
+    return result
+
+
+def detached_partitions(connection):
+    """
+    Возвращает месячные партиции, которые отсоединены от таблицы назначений, но еще не удалены
+    (выгрузка в архив была прервана).
+
+    Parameters:
+        connection (BaseDatabaseWrapper): Соединение с Postgres.
+
+    Returns:
+        dict: Имя таблицы по первому числу месяца.
+    """
+    attached = set(partitions(connection).values())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname LIKE %s",
+            [f'{PARENT}_y%']
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    result = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match and name not in attached:
+            result[datetime.date(int(match['year']), int(match['month']), 1)] = name
+    return result
+
+
+def create_partition(connection, month):
+    """
+    Создает месячную партицию, перенося в нее подходящие назначения из партиции по умолчанию.
+
+    Parameters:
+        connection (BaseDatabaseWrapper): Соединение с Postgres.
+        month (date): Первое число месяца.
+
+    Returns:
+        bool: True, если партиция создана, False - если она уже существовала.
+    """
+    if month in partitions(connection):
+        return False
+
+    name = partition_name(month)
+    start, end = month_bounds(month)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS ('
+            f'DELETE FROM {DEFAULT_PARTITION} WHERE appointment_date >= %s AND appointment_date < %s RETURNING *'
+            f') INSERT INTO {name} SELECT * FROM moved',
+            [start, end]
+        )
+        cursor.execute(f'ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', [start, end])
+    return True
+
+
+def _write_rows(path, rows):
+    """
+    Записывает назначения в сжатый NDJSON-файл архива, заменяя файл целиком.
+
+    Строки пишутся во временный файл, который затем атомарно переименовывается, поэтому файл архива либо
+    отсутствует, либо полон. Если транзакция удаления после записи откатится, повторная выгрузка тех же
+    назначений перезапишет файл, а не продублирует строки.
+
+    Parameters:
+        path (str): Путь к файлу .ndjson.gz.
+        rows (iterable of tuple): Значения столбцов COLUMNS.
+
+    Returns:
+        int: Количество записанных назначений.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    count = 0
+    temporary = f'{path}.tmp'
+    with gzip.open(temporary, 'wt', encoding='utf-8') as file:
+        for row in rows:
+            record = dict(zip(COLUMNS, row))
+            record['appointment_date'] = record['appointment_date'].isoformat()
+            file.write(json.dumps(record) + '\n')
+            count += 1
+    os.replace(temporary, path)
+    return count
+
+
+def archive_partition(connection, month, directory):
+    """
+    Отсоединяет месячную партицию, выгружает ее в сжатый NDJSON-файл и удаляет.
+
+    DETACH PARTITION берет ACCESS EXCLUSIVE на таблицу назначений, поэтому выполняется в отдельной короткой
+    транзакции (DETACH PARTITION CONCURRENTLY недоступен при партиции по умолчанию). Отсоединенная таблица
+    выгружается серверным курсором пачками, не загружаясь в память целиком и не блокируя назначения шарда,
+    и удаляется последней транзакцией. Если выгрузка прервется, отсоединенная таблица остается
+    (см. detached_partitions()) и выгружается повторно.
+
+    Parameters:
+        connection (BaseDatabaseWrapper): Соединение с Postgres.
+        month (date): Первое число месяца.
+        directory (str): Каталог архива.
+
+    Returns:
+        int: Количество выгруженных назначений.
+    """
+    name = partition_name(month)
+    path = os.path.join(directory, connection.alias, f'{name}.ndjson.gz')
+
+    if month in partitions(connection):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {PARENT} DETACH PARTITION {name}')
+
+    with transaction.atomic(using=connection.alias), connection.chunked_cursor() as cursor:
+        cursor.execute(f'SELECT {", ".join(COLUMNS)} FROM {name} ORDER BY id')
+        count = _write_rows(path, _rows(cursor))
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {name}')
+    return count
+
+
+def _rows(cursor):
+    """
+    Построчно читает результат запроса пачками.
+
+    Parameters:
+        cursor (CursorWrapper): Курсор с выполненным запросом. Для серверного курсора (connection.chunked_cursor())
+            каждая пачка запрашивается у сервера отдельно.
+
+    Yields:
+        tuple: Строка результата.
+    """
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            return
+        yield from rows
+
+
+def archive_month(connection, month, directory, batch_size=5000):
+    """
+    Выгружает назначения месяца из непартиционированной таблицы в сжатые NDJSON-файлы и удаляет их.
+
+    Каждая пачка удаляется в своей транзакции и пишется в свой файл <партиция>.<первый ID пачки>.ndjson.gz:
+    после сбоя повторный запуск начинает с той же неудаленной пачки и перезаписывает ее файл.
+
+    Parameters:
+        connection (BaseDatabaseWrapper): Соединение с БД.
+        month (date): Первое число месяца.
+        directory (str): Каталог архива.
+        batch_size (int): Количество назначений, обрабатываемых в одной транзакции.
+
+    Returns:
+        int: Количество выгруженных назначений.
+    """
+    start, end = month_bounds(month)
+    queryset = Appointment._base_manager.using(connection.alias) \
+        .filter(appointment_date__gte=start, appointment_date__lt=end) \
+        .order_by('pk')
+
+    count = 0
+    while True:
+        with transaction.atomic(using=connection.alias):
+            rows = list(queryset.values_list(*COLUMNS)[:batch_size])
+            if not rows:
+                return count
+            path = os.path.join(directory, connection.alias, f'{partition_name(month)}.{rows[0][0]}.ndjson.gz')
+            count += _write_rows(path, rows)
+            queryset.filter(pk__in=[row[0] for row in rows])._raw_delete(connection.alias)
@@ -0,0 +1,282 @@
+import array
+import bisect
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
+from api.models import Doctor, Exercise, Patient
+
+#: Заголовок снимка: сигнатура, версия данных, время построения, количество строк и ширина строки битовой
+#: матрицы "упражнение - специальность", количество строк индекса и количество связей "врач - пациент".
+HEADER = struct.Struct('<8sQdQQQQ')
+MAGIC = b'UMPGRAPH'
+
+#: Счетчик версии данных в файле <снимок>.version.
+VERSION = struct.Struct('<Q')
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class PermissionGraph:
+    """
+    Снимок связей, от которых зависит право врача назначить упражнение пациенту.
+
+    Файл снимка отображается в память (mmap) и разделяется всеми процессами на сервере:
+
+    - битовая матрица "упражнение - специальность": бит speciality_id в строке exercise_id;
+    - связи "врач - пациент" в формате CSR: для врача doctor_id его пациенты - отсортированный участок
+      patients[offsets[doctor_id]:offsets[doctor_id + 1]].
+
+    Attributes:
+        version (int): Версия данных, по которой построен снимок.
+        built_at (float): Время построения снимка (time.time()).
+
+    Methods:
+        exercise_has_speciality(exercise_id, speciality_id): Относится ли упражнение к специальности.
+        doctor_has_patient(doctor_id, patient_id): Связан ли пациент с врачом.
+
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.stat = os.fstat(file.fileno())
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.version, self.built_at, self.exercise_rows, self.row_bytes, doctor_rows, edges = \
+            HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f'{path} не является снимком связей.')
+
+        view = memoryview(self.buffer)
+        offset = HEADER.size
+        self.specialities = view[offset:offset + self.exercise_rows * self.row_bytes]
+        offset = _align(offset + self.exercise_rows * self.row_bytes)
+        self.offsets = view[offset:offset + (doctor_rows + 1) * 8].cast('q')
+        offset += (doctor_rows + 1) * 8
+        self.patients = view[offset:offset + edges * 8].cast('q')
+
+    def exercise_has_speciality(self, exercise_id, speciality_id):
+        """
+        Проверяет, относится ли упражнение к специальности.
+
+        Parameters:
+            exercise_id (int): ID упражнения.
+            speciality_id (int): ID специальности.
+
+        Returns:
+            bool: True, если специальность входит в specialisations упражнения.
+        """
+        byte = speciality_id >> 3
+        if exercise_id >= self.exercise_rows or byte >= self.row_bytes:
+            return False
+        return bool(self.specialities[exercise_id * self.row_bytes + byte] & (1 << (speciality_id & 7)))
+
+    def doctor_has_patient(self, doctor_id, patient_id):
+        """
+        Проверяет, связан ли пациент с врачом.
+
+        Parameters:
+            doctor_id (int): ID врача.
+            patient_id (int): ID пациента.
+
+        Returns:
+            bool: True, если пациент входит в patients врача.
+        """
+        if doctor_id + 1 >= len(self.offsets):
+            return False
+        low, high = self.offsets[doctor_id], self.offsets[doctor_id + 1]
+        index = bisect.bisect_left(self.patients, patient_id, low, high)
+        return index < high and self.patients[index] == patient_id
+
+
+def _version_path():
+    return f'{settings.PERMISSION_SNAPSHOT_FILE}.version'
+
+
+def _open_version():
+    """
+    Открывает файл счетчика версии данных, создавая его при необходимости.
+
+    Returns:
+        int: Файловый дескриптор.
+    """
+    fd = os.open(_version_path(), os.O_RDWR | os.O_CREAT, 0o644)
+    if os.fstat(fd).st_size < VERSION.size:
+        os.pwrite(fd, VERSION.pack(0), 0)
+    return fd
+
+
+_version_buffer = None
+
+
+def current_version():
+    """
+    Возвращает текущую версию данных. Счетчик отображается в память, поэтому чтение не требует системных вызовов.
+
+    Returns:
+        int: Версия данных.
+    """
+    global _version_buffer
+    if _version_buffer is None:
+        fd = _open_version()
+        try:
+            _version_buffer = mmap.mmap(fd, VERSION.size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+    return VERSION.unpack_from(_version_buffer)[0]
+
+
+def invalidate():
+    """
+    Увеличивает версию данных, после чего существующий снимок считается устаревшим во всех процессах.
+    Ничего не делает, если снимок не используется (пустая настройка PERMISSION_SNAPSHOT_FILE).
+    """
+    if not settings.PERMISSION_SNAPSHOT_FILE:
+        return
+    fd = _open_version()
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        version, = VERSION.unpack(os.pread(fd, VERSION.size, 0))
+        os.pwrite(fd, VERSION.pack(version + 1), 0)
+    finally:
+        os.close(fd)
+
+
+def build(path=None):
+    """
+    Строит снимок по текущим данным БД и атомарно заменяет им файл снимка.
+
+    Parameters:
+        path (str, optional): Путь к файлу снимка. По умолчанию - PERMISSION_SNAPSHOT_FILE.
+
+    Returns:
+        int: Версия данных, по которой построен снимок.
+    """
+    path = path or settings.PERMISSION_SNAPSHOT_FILE
+    # Версия читается до чтения данных: изменение во время построения сделает снимок устаревшим
+    version = current_version()
+
+    exercise_specialities = Exercise.specialisations.through.objects \
+        .filter(exercise__deleted_at__isnull=True) \
+        .values_list('exercise_id', 'speciality_id')
+    pairs = list(exercise_specialities)
+    exercise_rows = max((exercise_id for exercise_id, _ in pairs), default=-1) + 1
+    row_bytes = (max((speciality_id for _, speciality_id in pairs), default=-1) >> 3) + 1
+    specialities = bytearray(exercise_rows * row_bytes)
+    for exercise_id, speciality_id in pairs:
+        specialities[exercise_id * row_bytes + (speciality_id >> 3)] |= 1 << (speciality_id & 7)
+
+    doctor_patients = Doctor.patients.through.objects \
+        .filter(doctor__deleted_at__isnull=True, patient__deleted_at__isnull=True) \
+        .order_by('doctor_id', 'patient_id') \
+        .values_list('doctor_id', 'patient_id')
+    counts, patients = array.array('q'), array.array('q')
+    for doctor_id, patient_id in doctor_patients.iterator():
+        if doctor_id >= len(counts):
+            counts.extend([0] * (doctor_id + 1 - len(counts)))
+        counts[doctor_id] += 1
+        patients.append(patient_id)
+    offsets = array.array('q', [0])
+    for count in counts:
+        offsets.append(offsets[-1] + count)
+
+    header = HEADER.pack(MAGIC, version, time.time(), exercise_rows, row_bytes, len(counts), len(patients))
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(header)
+        file.write(specialities)
+        file.write(b'\0' * (_align(len(header) + len(specialities)) - len(header) - len(specialities)))
+        file.write(offsets.tobytes())
+        file.write(patients.tobytes())
+    os.replace(temporary, path)
+    return version
+
+
+_snapshot = None
+
+
+def snapshot():
+    """
+    Возвращает актуальный снимок процесса, при необходимости переоткрывая перестроенный файл.
+
+    Снимок считается устаревшим, если после его построения изменились данные (версия в снимке меньше
+    текущей) или он старше PERMISSION_SNAPSHOT_MAX_AGE секунд.
+
+    Returns:
+        PermissionGraph or None: Снимок или None, если снимок не используется, отсутствует или устарел.
+    """
+    global _snapshot
+    path = settings.PERMISSION_SNAPSHOT_FILE
+    if not path:
+        return None
+
+    version = current_version()
+    graph = _snapshot
+    if graph is None or graph.version != version or time.time() - graph.built_at > settings.PERMISSION_SNAPSHOT_MAX_AGE:
+        try:
+            stat = os.stat(path)
+            if graph is None or (stat.st_ino, stat.st_mtime_ns) != (graph.stat.st_ino, graph.stat.st_mtime_ns):
+                graph = _snapshot = PermissionGraph(path)
+        except (OSError, ValueError):
+            return None
+        if graph.version != version or time.time() - graph.built_at > settings.PERMISSION_SNAPSHOT_MAX_AGE:
+            return None
+    return graph
+
+
+def exercise_has_speciality(exercise, speciality_id):
+    """
+    Проверяет, относится ли упражнение к специальности: по снимку, а если он устарел - запросом к БД.
+
+    Parameters:
+        exercise (Exercise): Упражнение.
+        speciality_id (int): ID специальности.
+
+    Returns:
+        bool: True, если специальность входит в specialisations упражнения.
+    """
+    graph = snapshot()
+    if graph is not None:
+        return graph.exercise_has_speciality(exercise.pk, speciality_id)
+    return exercise.specialisations.filter(pk=speciality_id).exists()
+
+
+def doctor_has_patient(doctor, patient_id):
+    """
+    Проверяет, связан ли пациент с врачом: по снимку, а если он устарел - запросом к БД.
+
+    Parameters:
+        doctor (Doctor): Врач.
+        patient_id (int): ID пациента.
+
+    Returns:
+        bool: True, если пациент входит в patients врача.
+    """
+    graph = snapshot()
+    if graph is not None:
+        return graph.doctor_has_patient(doctor.pk, patient_id)
+    return doctor.patients.filter(pk=patient_id).exists()
+
+
+@receiver(m2m_changed, sender=Doctor.patients.through)
+@receiver(m2m_changed, sender=Exercise.specialisations.through)
+def invalidate_on_m2m_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # До фиксации транзакции снимок остается верным, а перестроенный раньше фиксации был бы устаревшим
+        transaction.on_commit(invalidate)
+
+
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=Patient)
+@receiver(post_delete, sender=Exercise)
+def invalidate_on_delete(sender, **kwargs):
+    transaction.on_commit(invalidate)
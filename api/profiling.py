@@ -0,0 +1,238 @@
+import collections
+import json
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+#: Пути, кадры из которых пропускаются при поиске места вызова запроса в коде приложения:
+#: Django, стандартная библиотека и этот модуль.
+_SKIPPED_PATHS = (os.path.dirname(django.__file__) + os.sep, sysconfig.get_paths()['stdlib'] + os.sep, __file__)
+
+_log_lock = threading.Lock()
+
+
+def call_site():
+    """
+    Возвращает место в коде приложения, из которого выполнен SQL-запрос: первый кадр стека вне Django
+    и стандартной библиотеки.
+
+    Returns:
+        str: Строка вида "api/views.py:111 in post" или пустая строка.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_SKIPPED_PATHS):
+            return f'{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return ''
+
+
+def mask_params(params):
+    """
+    Заменяет значения параметров запроса их типами, чтобы данные пациентов не попадали в журнал.
+
+    Parameters:
+        params (list, tuple, dict or None): Параметры запроса.
+
+    Returns:
+        list, dict or None: Имена типов параметров, например ["str", "int"].
+    """
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def explain(connection, sql, params):
+    """
+    Получает план выполнения запроса: EXPLAIN (ANALYZE, BUFFERS) на Postgres, EXPLAIN QUERY PLAN на SQLite.
+
+    Анализируются только SELECT-запросы, потому что EXPLAIN ANALYZE выполняет запрос повторно.
+
+    Parameters:
+        connection (BaseDatabaseWrapper): Соединение, в котором выполнялся запрос.
+        sql (str): Текст запроса.
+        params (list or tuple): Параметры запроса.
+
+    Returns:
+        str or None: План или None, если его получить нельзя.
+    """
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return None
+
+    try:
+        # Точка сохранения не дает ошибке EXPLAIN прервать транзакцию запроса
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'EXPLAIN не выполнен: {e}'
+
+
+def write_log(record):
+    """
+    Записывает событие в журнал медленных запросов SLOW_QUERY_LOG (JSON, одна строка на событие).
+    Без файла журнала событие пишется в логгер api.profiling.
+
+    Parameters:
+        record (dict): Событие.
+    """
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    if not settings.SLOW_QUERY_LOG:
+        logger.warning(line)
+        return
+    with _log_lock, open(settings.SLOW_QUERY_LOG, 'a', encoding='utf-8') as file:
+        file.write(line + '\n')
+
+
+class QueryProfiler:
+    """
+    Обертка выполнения SQL-запросов (connection.execute_wrapper), записывающая текст, типы параметров, время
+    и место вызова каждого запроса. Значения параметров не сохраняются (см. mask_params()). Для запросов
+    дольше SLOW_QUERY_MS сохраняется план выполнения.
+
+    Attributes:
+        queries (list of dict): Выполненные запросы.
+
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            query = {
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': mask_params(params) if not many else None,
+                'duration_ms': round(duration, 3),
+                'call_site': call_site(),
+            }
+            if duration >= settings.SLOW_QUERY_MS and not many:
+                self.explaining = True
+                try:
+                    query['explain'] = explain(context['connection'], sql, params)
+                finally:
+                    self.explaining = False
+            self.queries.append(query)
+
+    def attach(self, stack):
+        """
+        Подключает обертку ко всем соединениям текущего потока.
+
+        Parameters:
+            stack (ExitStack): Стек, при закрытии которого обертка отключается.
+        """
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+
+    @property
+    def total_ms(self):
+        return sum(query['duration_ms'] for query in self.queries)
+
+    def log(self, request, status_code, duration):
+        """
+        Записывает медленные запросы в журнал, а если такие были - и сводку по всем запросам HTTP-запроса.
+
+        Parameters:
+            request (HttpRequest): Объект запроса от клиента.
+            status_code (int): HTTP-код ответа.
+            duration (float): Время обработки HTTP-запроса в миллисекундах.
+        """
+        slow = [query for query in self.queries if query['duration_ms'] >= settings.SLOW_QUERY_MS]
+        if not slow:
+            return
+
+        now = timezone.now().isoformat()
+        for query in slow:
+            write_log({'time': now, 'type': 'slow_query', 'method': request.method, 'path': request.path, **query})
+        write_log({
+            'time': now,
+            'type': 'request',
+            'method': request.method,
+            'path': request.path,
+            'status': status_code,
+            'duration_ms': round(duration, 3),
+            'db_ms': round(self.total_ms, 3),
+            'queries': [
+                {key: query[key] for key in ('alias', 'sql', 'duration_ms', 'call_site')} for query in self.queries
+            ],
+        })
+
+
+class StackSampler:
+    """
+    Сэмплирующий профилировщик потока: раз в interval секунд снимает стек потока и считает одинаковые стеки.
+
+    Результат сохраняется в формате "свернутых стеков" (folded stacks), который открывают flamegraph.pl,
+    speedscope и другие просмотрщики флеймграфов.
+
+    Methods:
+        start(): Запускает сэмплирование в фоновом потоке.
+        stop(): Останавливает сэмплирование.
+        dump(path): Сохраняет свернутые стеки в файл.
+
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        """
+        Сохраняет свернутые стеки в файл.
+
+        Parameters:
+            path (str): Путь к файлу.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
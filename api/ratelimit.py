@@ -0,0 +1,264 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+#: Размер таблицы корзин в памяти процесса, после которого из нее удаляются полные корзины
+#: (не чаще раза в секунду).
+MAX_LOCAL_BUCKETS = 10000
+
+
+class LocalRateLimiter:
+    """
+    Ограничитель частоты запросов по алгоритму маркерной корзины, хранящий корзины в памяти процесса.
+
+    Корзина с ключом key вмещает burst маркеров и пополняется со скоростью rate маркеров в секунду,
+    каждый запрос забирает один маркер. Решение принимается за один словарный поиск под блокировкой.
+
+    Methods:
+        acquire(key, rate, burst): Забирает маркер из корзины.
+
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.pruned_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, key, rate, burst):
+        """
+        Забирает маркер из корзины.
+
+        Parameters:
+            key (str): Ключ корзины.
+            rate (float): Скорость пополнения, маркеров в секунду.
+            burst (int): Емкость корзины.
+
+        Returns:
+            float: 0, если запрос разрешен, иначе время в секундах до появления маркера.
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, stamp = self.buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - stamp) * rate)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                if len(self.buckets) > MAX_LOCAL_BUCKETS and now - self.pruned_at > 1:
+                    self.prune(now)
+                return 0.0
+            self.buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def prune(self, now):
+        """
+        Удаляет корзины, которые не использовались дольше времени наполнения самой большой корзины:
+        они уже полны, и их удаление не меняет решений ограничителя. Вызывается под блокировкой.
+
+        Parameters:
+            now (float): Текущее время time.monotonic().
+        """
+        horizon = max(burst / rate for rate, burst in rates())
+        self.pruned_at = now
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if now - bucket[1] < horizon}
+
+
+class CacheRateLimiter:
+    """
+    Ограничитель частоты запросов, хранящий счетчики в кэше Django, общем для всех процессов
+    (например, Redis или Memcached).
+
+    Маркерную корзину нельзя обновить атомарно операциями кэша, поэтому используется фиксированное окно
+    длительностью burst / rate секунд, в котором разрешено burst запросов: средняя частота та же, что
+    у корзины, но на границе окон возможен всплеск до 2 * burst. Счетчик окна создается cache.add()
+    и увеличивается cache.incr(), которые атомарны в Redis и Memcached, поэтому одновременные запросы
+    из разных процессов не превышают лимит.
+
+    Methods:
+        acquire(key, rate, burst): Учитывает запрос в счетчике окна.
+
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def acquire(self, key, rate, burst):
+        """
+        Учитывает запрос в счетчике текущего окна.
+
+        Parameters:
+            key (str): Ключ счетчика.
+            rate (float): Допустимая средняя частота, запросов в секунду.
+            burst (int): Количество запросов за окно.
+
+        Returns:
+            float: 0, если запрос разрешен, иначе время в секундах до начала следующего окна.
+        """
+        window = burst / rate
+        now = time.time()
+        index = int(now // window)
+        cache_key = f'ratelimit:{key}:{index}'
+        timeout = math.ceil(window) + 1
+
+        self.cache.add(cache_key, 0, timeout=timeout)
+        try:
+            count = self.cache.incr(cache_key)
+        except ValueError:
+            # Счетчик вытеснен из кэша между add() и incr()
+            self.cache.add(cache_key, 1, timeout=timeout)
+            count = 1
+        return 0.0 if count <= burst else (index + 1) * window - now
+
+
+class AdmissionController:
+    """
+    Контроль допуска изменяющих запросов: ограничивает число одновременно выполняемых запросов процесса
+    и сбрасывает нагрузку, когда БД начинает отвечать медленно.
+
+    Время одного SQL-запроса усредняется экспоненциально. Среднее не зависит от того, сколько SQL-запросов
+    выполняют разные HTTP-запросы, поэтому растет только тогда, когда БД отвечает медленнее. Пока среднее выше
+    latency_limit, допускается только один запрос за раз - он служит пробой, по которой видно, что БД
+    восстановилась.
+
+    Attributes:
+        limit (int): Максимум одновременно выполняемых запросов.
+        latency_limit (float): Допустимое среднее время одного SQL-запроса, в секундах.
+        in_flight (int): Количество выполняемых сейчас запросов.
+        latency (float): Среднее время одного SQL-запроса, в секундах.
+
+    Methods:
+        try_acquire(): Пытается допустить запрос.
+        release(latency=None): Отмечает завершение допущенного запроса.
+
+    """
+
+    #: Вес нового измерения в среднем времени SQL-запроса.
+    SMOOTHING = 0.2
+
+    def __init__(self, limit, latency_limit):
+        self.limit = limit
+        self.latency_limit = latency_limit
+        self.in_flight = 0
+        self.latency = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def overloaded(self):
+        return self.latency > self.latency_limit
+
+    def try_acquire(self):
+        """
+        Пытается допустить запрос.
+
+        Returns:
+            bool: True, если запрос допущен и после выполнения нужно вызвать release().
+        """
+        with self.lock:
+            limit = 1 if self.overloaded else self.limit
+            if self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency=None):
+        """
+        Отмечает завершение допущенного запроса.
+
+        Parameters:
+            latency (float, optional): Среднее время SQL-запросов во время обработки, в секундах. Не указывается,
+                если запрос не обращался к БД: тогда среднее не меняется.
+        """
+        with self.lock:
+            self.in_flight -= 1
+            if latency is not None:
+                self.latency += (latency - self.latency) * self.SMOOTHING
+
+
+class QueryTimer:
+    """
+    Обертка выполнения SQL-запросов (connection.execute_wrapper), суммирующая их время и количество.
+
+    Attributes:
+        elapsed (float): Суммарное время запросов в секундах.
+        count (int): Количество запросов.
+
+    """
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.count = 0
+
+    @property
+    def average(self):
+        """
+        Returns:
+            float or None: Среднее время запроса в секундах или None, если запросов не было.
+        """
+        return self.elapsed / self.count if self.count else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - start
+            self.count += 1
+
+
+def get_limiter():
+    """
+    Создает ограничитель частоты запросов согласно настройке RATELIMIT_CACHE.
+
+    Returns:
+        LocalRateLimiter or CacheRateLimiter: Ограничитель.
+    """
+    if settings.RATELIMIT_CACHE:
+        return CacheRateLimiter(caches[settings.RATELIMIT_CACHE])
+    return LocalRateLimiter()
+
+
+def client_key(request):
+    """
+    Возвращает адрес клиента, по которому ограничивается частота его запросов.
+
+    За обратными прокси REMOTE_ADDR - адрес ближайшего прокси, одинаковый для всех клиентов. Поэтому при
+    RATELIMIT_PROXY_HOPS = N адрес берется из заголовка X-Forwarded-For: N-й элемент с конца, то есть адрес,
+    добавленный самым внешним доверенным прокси. Элементы левее него подделываются клиентом и не учитываются.
+
+    Parameters:
+        request (HttpRequest): Объект запроса от клиента.
+
+    Returns:
+        str: IP-адрес клиента.
+    """
+    hops = settings.RATELIMIT_PROXY_HOPS
+    if hops:
+        forwarded = [address.strip() for address in request.headers.get('X-Forwarded-For', '').split(',')]
+        forwarded = [address for address in forwarded if address]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def rates():
+    """
+    Возвращает все настроенные лимиты.
+
+    Returns:
+        list of tuple: Пары (скорость пополнения, емкость корзины).
+    """
+    return [(settings.RATELIMIT_RATE, settings.RATELIMIT_BURST), *settings.RATELIMIT_ROUTES.values()]
+
+
+def route_rate(route):
+    """
+    Возвращает лимит для маршрута.
+
+    Parameters:
+        route (str): Имя URL маршрута.
+
+    Returns:
+        tuple: Скорость пополнения (запросов в секунду) и емкость корзины.
+    """
+    return settings.RATELIMIT_ROUTES.get(route, (settings.RATELIMIT_RATE, settings.RATELIMIT_BURST))
@@ -0,0 +1,35 @@
+import contextvars
+import random
+
+from django.conf import settings
+
+#: Признак того, что чтения текущего запроса можно отправлять на реплику. Устанавливается
+#: ReplicaRoutingMiddleware; контекстная переменная корректно работает и в потоках, и в asyncio.
+replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Роутер БД, отправляющий запись в основную БД, а чтение - на реплики.
+
+    На реплику уходят только чтения запросов, для которых ReplicaRoutingMiddleware установил replica_reads:
+    GET-запросы к вью с атрибутом use_replica = True от клиентов, которые недавно ничего не записывали.
+    Все остальные чтения, как и запись, выполняются в основной БД. Реплика выбирается случайно из
+    REPLICA_DATABASES; если список пуст, роутер ничего не меняет.
+
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and settings.REPLICA_DATABASES:
+            return random.choice(settings.REPLICA_DATABASES)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
@@ -0,0 +1,198 @@
+import functools
+import heapq
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+#: Шардируемые модели и поле, по которому выбирается шард. Новые таблицы с данными пациента
+#: шардируются так же - добавлением сюда метки модели и поля patient_id.
+SHARD_KEYS = {
+    'api.appointment': 'patient_id',
+}
+
+#: Шаг между начальными значениями первичных ключей шардов. Благодаря ему ключи разных шардов
+#: не пересекаются, и записи можно переносить между шардами без перенумерации.
+ID_STRIDE = 2 ** 40
+
+
+def is_sharded(model):
+    """
+    Проверяет, хранится ли модель в шардах.
+
+    Parameters:
+        model (Model): Класс модели.
+
+    Returns:
+        bool: True, если модель шардируется.
+    """
+    return model._meta.label_lower in SHARD_KEYS
+
+
+def shards():
+    """
+    Возвращает алиасы БД всех шардов.
+
+    Returns:
+        list of str: Алиасы из APPOINTMENT_SHARDS.
+    """
+    return list(settings.APPOINTMENT_SHARDS)
+
+
+def default_shard_map():
+    """
+    Строит карту шардов по умолчанию для единственного шарда: все корзины в первом шарде.
+
+    Returns:
+        list of str: Алиас БД для каждой корзины.
+    """
+    return [shards()[0]] * settings.SHARD_BUCKETS
+
+
+def read_shard_map(path):
+    """
+    Читает карту шардов из JSON-файла вида {"default": [[0, 511]], "shard_0": [[512, 1023]]}.
+
+    Parameters:
+        path (str): Путь к файлу карты.
+
+    Returns:
+        list of str: Алиас БД для каждой корзины.
+
+    Raises:
+        ValueError: Если карта покрывает не все корзины или ссылается на неизвестный шард.
+    """
+    with open(path, encoding='utf-8') as file:
+        ranges = json.load(file)
+
+    buckets = [None] * settings.SHARD_BUCKETS
+    for alias, alias_ranges in ranges.items():
+        if alias not in settings.DATABASES:
+            raise ValueError(f'Шард {alias} не описан в DATABASES.')
+        for first, last in alias_ranges:
+            for bucket in range(first, last + 1):
+                buckets[bucket] = alias
+
+    if None in buckets:
+        raise ValueError(f'Карта шардов {path} покрывает не все корзины 0..{settings.SHARD_BUCKETS - 1}.')
+    return buckets
+
+
+@functools.lru_cache(maxsize=None)
+def shard_map():
+    """
+    Возвращает действующую карту шардов: из файла SHARD_MAP_FILE или, если шард один, карту по умолчанию.
+
+    Карта читается один раз на процесс, поэтому после ее изменения процессы нужно перезапустить.
+
+    Returns:
+        list of str: Алиас БД для каждой корзины.
+
+    Raises:
+        ImproperlyConfigured: Если шардов несколько, а SHARD_MAP_FILE не указан.
+    """
+    if settings.SHARD_MAP_FILE:
+        return read_shard_map(settings.SHARD_MAP_FILE)
+    if len(shards()) > 1:
+        raise ImproperlyConfigured('При нескольких шардах назначений нужно указать карту шардов в SHARD_MAP_FILE.')
+    return default_shard_map()
+
+
+def bucket_for(key):
+    """
+    Возвращает корзину для значения ключа шардирования.
+
+    Parameters:
+        key (int): Значение ключа шардирования (ID пациента).
+
+    Returns:
+        int: Номер корзины.
+    """
+    return int(key) % settings.SHARD_BUCKETS
+
+
+def shard_for(key):
+    """
+    Возвращает алиас БД шарда для значения ключа шардирования.
+
+    Parameters:
+        key (int): Значение ключа шардирования (ID пациента).
+
+    Returns:
+        str: Алиас БД.
+    """
+    return shard_map()[bucket_for(key)]
+
+
+def shard_for_instance(instance):
+    """
+    Возвращает алиас БД шарда для объекта шардируемой модели.
+
+    Parameters:
+        instance (Model): Объект шардируемой модели.
+
+    Returns:
+        str or None: Алиас БД или None, если ключ шардирования не заполнен.
+    """
+    key = getattr(instance, SHARD_KEYS[instance._meta.label_lower], None)
+    return shard_for(key) if key is not None else None
+
+
+def fan_out(queryset):
+    """
+    Выполняет запрос на всех шардах.
+
+    Parameters:
+        queryset (QuerySet): Запрос к шардируемой модели.
+
+    Returns:
+        list of QuerySet: Запрос, привязанный к каждому шарду.
+    """
+    return [queryset.using(alias) for alias in shards()]
+
+
+def merge(querysets, key):
+    """
+    Объединяет отсортированные результаты запросов к шардам с сохранением порядка.
+
+    Parameters:
+        querysets (list of QuerySet): Запросы к шардам, отсортированные по одному и тому же ключу.
+        key (callable): Функция, возвращающая ключ сортировки объекта.
+
+    Returns:
+        list: Объединенный отсортированный список объектов.
+    """
+    return list(heapq.merge(*querysets, key=key))
+
+
+class ShardRouter:
+    """
+    Роутер БД для шардируемых моделей (см. SHARD_KEYS).
+
+    Запись и чтение объекта идут в шард, определяемый ключом шардирования объекта (подсказка instance).
+    Запросы без объекта попадают в первый шард, поэтому выборки по пациенту нужно делать через
+    Appointment.objects.for_patient(), а выборки по врачу - через Appointment.objects.for_doctor(),
+    которые обходят все шарды. Для нешардируемых моделей роутер ничего не решает.
+
+    """
+
+    def _db_for(self, model, instance=None, **hints):
+        if not is_sharded(model):
+            return None
+        if instance is not None and is_sharded(type(instance)):
+            alias = shard_for_instance(instance)
+            if alias is not None:
+                return alias
+        return shards()[0]
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        label = f'{app_label}.{model_name}'
+        if label in SHARD_KEYS:
+            return db in shards()
+        return None
@@ -0,0 +1,211 @@
+import datetime
+import logging
+import os
+import socket
+import time
+
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+#: Ошибка задачи, воркер которой перестал отвечать во время выполнения (см. requeue_stale()).
+WORKER_LOST = 'WorkerLost'
+
+#: Интервал в секундах, с которым воркер ищет зависшие задачи.
+REQUEUE_INTERVAL = 60
+
+
+def register(name=None, max_attempts=3):
+    """
+    Декоратор для регистрации функции как фоновой задачи.
+
+    Модули с задачами импортируются в ApiConfig.ready(). Функция задачи первым аргументом получает объект Task,
+    через который может сообщать прогресс (task.set_progress). Возвращаемое значение должно сериализоваться
+    в JSON и сохраняется в Task.result.
+
+    Parameters:
+        name (str, optional): Имя задачи. По умолчанию - имя функции.
+        max_attempts (int): Количество попыток выполнения до перевода задачи в FAILED.
+
+    Returns:
+        function: Декоратор, возвращающий исходную функцию.
+
+    Example:
+        ```
+        @register(max_attempts=5)
+        def export_appointments(task, path):
+            ...
+        ```
+    """
+
+    def decorator(func):
+        func.task_name = name or func.__name__
+        func.max_attempts = max_attempts
+        _registry[func.task_name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Ставит задачу в очередь. Задача будет выполнена воркером (python manage.py run_tasks).
+
+    Parameters:
+        func (function or str): Зарегистрированная функция задачи или ее имя.
+        *args: Позиционные аргументы функции (должны сериализоваться в JSON).
+        **kwargs: Именованные аргументы функции (должны сериализоваться в JSON).
+
+    Returns:
+        Task: Созданная задача.
+    """
+    if isinstance(func, str):
+        name, max_attempts = func, getattr(_registry.get(func), 'max_attempts', 3)
+    else:
+        name, max_attempts = func.task_name, func.max_attempts
+
+    return Task.objects.create(name=name, args=list(args), kwargs=kwargs, max_attempts=max_attempts)
+
+
+def claim(worker):
+    """
+    Забирает из очереди одну готовую к выполнению задачу.
+
+    Задача захватывается условным UPDATE по статусу, поэтому несколько воркеров могут работать с одной
+    очередью без блокировок строк, что работает одинаково на Postgres и SQLite.
+
+    Parameters:
+        worker (str): Идентификатор воркера.
+
+    Returns:
+        Task or None: Захваченная задача или None, если очередь пуста.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(status=Task.PENDING, run_after__lte=now) \
+        .order_by('run_after', 'pk') \
+        .values_list('pk', flat=True)[:10]
+
+    for pk in candidates:
+        claimed = Task.objects.filter(pk=pk, status=Task.PENDING).update(
+            status=Task.RUNNING,
+            worker=worker,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+
+    return None
+
+
+def execute(task):
+    """
+    Выполняет захваченную задачу и сохраняет результат.
+
+    При ошибке задача возвращается в очередь с экспоненциальной задержкой, пока не исчерпаны попытки,
+    после чего переводится в статус FAILED.
+
+    Результат сохраняется условным UPDATE по воркеру и статусу RUNNING: если задача выполнялась дольше
+    stale_after и уже возвращена в очередь (см. requeue_stale()), результат устаревшей попытки отбрасывается
+    и не перезаписывает состояние задачи, захваченной другим воркером.
+
+    Parameters:
+        task (Task): Задача в статусе RUNNING.
+
+    Returns:
+        bool: True, если состояние задачи сохранено.
+    """
+    task.attempts += 1
+    try:
+        func = _registry[task.name]
+        result = func(task, *task.args, **task.kwargs)
+    except Exception as e:
+        # Статус задачи доступен без авторизации, а трейсбек может содержать данные пациентов,
+        # поэтому в задаче сохраняется только класс исключения, а трейсбек - в логе
+        task.error = type(e).__name__
+        if task.attempts < task.max_attempts:
+            task.status = Task.PENDING
+            task.run_after = timezone.now() + datetime.timedelta(seconds=2 ** task.attempts)
+            logger.warning('Задача %s #%s завершилась ошибкой, повтор через %s с', task.name, task.pk,
+                           2 ** task.attempts, exc_info=True)
+        else:
+            task.status = Task.FAILED
+            task.finished_at = timezone.now()
+            logger.error('Задача %s #%s завершилась ошибкой', task.name, task.pk, exc_info=True)
+        fields = ['attempts', 'status', 'error', 'run_after', 'finished_at']
+    else:
+        task.status = Task.SUCCEEDED
+        task.result = result
+        task.finished_at = timezone.now()
+        fields = ['attempts', 'status', 'result', 'finished_at']
+
+    saved = Task.objects.filter(pk=task.pk, worker=task.worker, status=Task.RUNNING).update(
+        **{field: getattr(task, field) for field in fields}
+    )
+    if not saved:
+        logger.warning('Задача %s #%s возвращена в очередь во время выполнения, результат попытки отброшен',
+                       task.name, task.pk)
+    return bool(saved)
+
+
+def requeue_stale(timeout):
+    """
+    Возвращает в очередь задачи, зависшие в статусе RUNNING (например, после падения воркера): задачи,
+    которые не сообщали прогресс (Task.set_progress) дольше timeout секунд после захвата или последнего сообщения.
+
+    Падение воркера засчитывается как попытка: задача, которая роняет воркер, после max_attempts попыток
+    переводится в статус FAILED с ошибкой WORKER_LOST, а не возвращается в очередь бесконечно.
+
+    Parameters:
+        timeout (int): Время в секундах без сигнала воркера, после которого выполняющаяся задача считается зависшей.
+
+    Returns:
+        int: Количество возвращенных в очередь задач.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(status=Task.RUNNING, heartbeat_at__lt=now - datetime.timedelta(seconds=timeout))
+    stale.filter(attempts__gte=F('max_attempts') - 1).update(
+        status=Task.FAILED,
+        attempts=F('attempts') + 1,
+        error=WORKER_LOST,
+        worker='',
+        finished_at=now
+    )
+    return stale.update(status=Task.PENDING, attempts=F('attempts') + 1, worker='')
+
+
+def work(poll_interval=1.0, once=False, stale_after=3600):
+    """
+    Цикл воркера: забирает и выполняет задачи, пока процесс не будет остановлен.
+
+    Раз в REQUEUE_INTERVAL секунд воркер возвращает в очередь задачи, зависшие дольше stale_after секунд,
+    поэтому задачи упавшего воркера подхватываются без перезапуска остальных.
+
+    Parameters:
+        poll_interval (float): Пауза в секундах между опросами пустой очереди.
+        once (bool): Если True, выполнить все готовые задачи и выйти.
+        stale_after (int): Время в секундах, после которого выполняющаяся задача возвращается в очередь.
+    """
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    logger.info('Воркер %s запущен', worker)
+
+    requeue_at = 0.0
+    while True:
+        if time.monotonic() >= requeue_at:
+            requeued = requeue_stale(stale_after)
+            if requeued:
+                logger.warning('Возвращено в очередь зависших задач: %s', requeued)
+            requeue_at = time.monotonic() + min(stale_after, REQUEUE_INTERVAL)
+
+        task = claim(worker)
+        if task is not None:
+            execute(task)
+        elif once:
+            return
+        else:
+            time.sleep(poll_interval)
@@ -0,0 +1,47 @@
+from django.apps import apps
+
+from api import deletion
+from api.taskqueue import register
+
+
+@register()
+def purge_objects(task, model_label, pks):
+    """
+    Фоновая задача физического удаления объектов вместе с зависимыми записями.
+
+    Parameters:
+        task (Task): Выполняемая задача.
+        model_label (str): Метка модели в формате "api.Doctor".
+        pks (list): Идентификаторы удаляемых объектов.
+
+    Returns:
+        dict: Количество удаленных объектов.
+    """
+    model = apps.get_model(model_label)
+    task.set_progress(0, len(pks))
+    deleted = deletion.purge(model, pks)
+    task.set_progress(len(pks))
+
+    return {'deleted': deleted}
+
+
+@register()
+def purge_deleted(task, batch_size=1000):
+    """
+    Фоновая задача физического удаления всех мягко удаленных врачей, пациентов и упражнений.
+
+    Parameters:
+        task (Task): Выполняемая задача.
+        batch_size (int): Количество объектов, удаляемых в одной транзакции.
+
+    Returns:
+        dict: Количество удаленных объектов по моделям.
+    """
+    result = {}
+    models = [apps.get_model('api', name) for name in ('Doctor', 'Patient', 'Exercise')]
+    for done, model in enumerate(models):
+        task.set_progress(done, len(models))
+        result[model._meta.label] = deletion.purge_deleted(model, batch_size=batch_size)
+    task.set_progress(len(models))
+
+    return result
@@ -0,0 +1,64 @@
+import re
+
+from django.template.loaders import filesystem
+
+#: Теги Django и Jinja2, которые сами ничего не выводят. Теги вроде {% url %}, {% translate %}
+#: и {% firstof %} выводят текст, поэтому перевод строки после них сохраняется.
+SILENT_TAGS = (
+    'autoescape', 'block', 'comment', 'elif', 'else', 'empty', 'extends', 'for', 'from', 'if', 'import', 'load',
+    'macro', 'set', 'spaceless', 'with',
+)
+
+#: Строка, состоящая только из тегов шаблона ({% ... %}), которые сами ничего не выводят.
+TAG_LINE = re.compile(r'^(\{%%-?\s*(end)?(%s)\b.*?-?%%\}\s*)+$' % '|'.join(SILENT_TAGS))
+
+
+def strip_whitespace(contents):
+    """
+    Убирает отступы, пустые строки и переводы строк после строк, состоящих только из тегов шаблона,
+    которые ничего не выводят (см. SILENT_TAGS).
+
+    Остальные переводы строк сохраняются, поэтому однострочные комментарии во встроенных скриптах продолжают
+    работать. Шаблоны с тегами <pre> и <textarea> возвращаются без изменений.
+
+    Parameters:
+        contents (str): Исходный текст шаблона.
+
+    Returns:
+        str: Текст шаблона без отступов и пустых строк.
+    """
+    if '<pre' in contents or '<textarea' in contents:
+        return contents
+
+    lines = []
+    for line in contents.splitlines():
+        line = line.strip()
+        if line:
+            lines.append(line if TAG_LINE.match(line) else line + '\n')
+    return ''.join(lines)
+
+
+class MinifyingLoaderMixin:
+    """
+    Примесь для загрузчиков шаблонов, убирающая отступы из HTML-шаблонов при загрузке.
+
+    Обработка выполняется один раз при компиляции шаблона, поэтому в сочетании с кэширующим загрузчиком
+    не добавляет затрат на рендеринг.
+
+    """
+
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if origin.name.endswith('.html'):
+            return strip_whitespace(contents)
+        return contents
+
+
+class FilesystemLoader(MinifyingLoaderMixin, filesystem.Loader):
+    """
+    Загрузчик шаблонов проекта с удалением отступов.
+
+    Каталоги передаются в настройке загрузчика. Шаблоны сторонних приложений (например, админки) загружаются
+    стандартным загрузчиком без изменений: их разметка может зависеть от пробелов.
+
+    """
@@ -0,0 +1,196 @@
+import datetime
+import itertools
+import random
+
+from django.utils import timezone
+
+from api import sharding
+from api.models import Appointment, Doctor, Exercise, Patient, Speciality
+
+#: Размер стандартного набора данных, который создает seed().
+SEED_SIZES = {
+    'specialities': 4,
+    'exercises': 24,
+    'patients': 200,
+    'doctors': 20,
+    'patients_per_doctor': 15,
+    'appointments_per_patient': 3,
+}
+
+_sequence = itertools.count(1)
+
+
+def specialities(count, **fields):
+    """
+    Создает специальности одним INSERT.
+
+    Parameters:
+        count (int): Количество специальностей.
+        **fields: Значения полей модели, общие для всех записей.
+
+    Returns:
+        list of Speciality: Созданные специальности.
+    """
+    return Speciality.objects.bulk_create([
+        Speciality(**{'title': f'Специальность {next(_sequence)}', **fields}) for _ in range(count)
+    ])
+
+
+def exercises(count, specialities=(), **fields):
+    """
+    Создает упражнения и их связи со специальностями: по одному INSERT на упражнения и на связи.
+
+    Parameters:
+        count (int): Количество упражнений.
+        specialities (list of Speciality): Специальности, к которым относится каждое упражнение.
+        **fields: Значения полей модели, общие для всех записей.
+
+    Returns:
+        list of Exercise: Созданные упражнения.
+    """
+    created = Exercise.objects.bulk_create([
+        Exercise(**{
+            'title': f'Упражнение {index}',
+            'description': f'Описание упражнения {index}',
+            **fields
+        })
+        for index in itertools.islice(_sequence, count)
+    ])
+    link_specialities(created, specialities)
+    return created
+
+
+def patients(count, **fields):
+    """
+    Создает пациентов одним INSERT.
+
+    Parameters:
+        count (int): Количество пациентов.
+        **fields: Значения полей модели, общие для всех записей.
+
+    Returns:
+        list of Patient: Созданные пациенты.
+    """
+    return Patient.objects.bulk_create([
+        Patient(**{'name': f'Пациент {index}', **fields}) for index in itertools.islice(_sequence, count)
+    ])
+
+
+def doctors(count, speciality, patients=(), **fields):
+    """
+    Создает врачей одной специальности и их связи с пациентами: по одному INSERT на врачей и на связи.
+
+    Parameters:
+        count (int): Количество врачей.
+        speciality (Speciality): Специальность врачей.
+        patients (list of Patient): Пациенты, связанные с каждым врачом.
+        **fields: Значения полей модели, общие для всех записей.
+
+    Returns:
+        list of Doctor: Созданные врачи.
+    """
+    created = Doctor.objects.bulk_create([
+        Doctor(**{'name': f'Врач {index}', 'speciality': speciality, **fields})
+        for index in itertools.islice(_sequence, count)
+    ])
+    link_patients(created, patients)
+    return created
+
+
+def link_specialities(exercises, specialities):
+    """
+    Связывает каждое упражнение с каждой специальностью одним INSERT в промежуточную таблицу.
+
+    Parameters:
+        exercises (list of Exercise): Упражнения.
+        specialities (list of Speciality): Специальности.
+    """
+    through = Exercise.specialisations.through
+    through.objects.bulk_create([
+        through(exercise_id=exercise.pk, speciality_id=speciality.pk)
+        for exercise in exercises for speciality in specialities
+    ])
+
+
+def link_patients(doctors, patients):
+    """
+    Связывает каждого врача с каждым пациентом одним INSERT в промежуточную таблицу.
+
+    Parameters:
+        doctors (list of Doctor): Врачи.
+        patients (list of Patient): Пациенты.
+    """
+    through = Doctor.patients.through
+    through.objects.bulk_create([
+        through(doctor_id=doctor.pk, patient_id=patient.pk) for doctor in doctors for patient in patients
+    ])
+
+
+def appointments(rows):
+    """
+    Создает назначения в шардах их пациентов: по одному INSERT на шард.
+
+    Parameters:
+        rows (list of tuple): Врач, пациент, упражнение и дата назначения (Doctor, Patient, Exercise, datetime).
+            Дата может быть None - тогда назначение создается текущим временем.
+
+    Returns:
+        list of Appointment: Созданные назначения.
+    """
+    by_shard = {}
+    for doctor, patient, exercise, appointment_date in rows:
+        by_shard.setdefault(sharding.shard_for(patient.pk), []).append(Appointment(
+            doctor=doctor,
+            patient=patient,
+            exercise=exercise,
+            appointment_date=appointment_date or timezone.now()
+        ))
+    return [
+        appointment
+        for alias, shard_appointments in by_shard.items()
+        for appointment in Appointment.objects.using(alias).bulk_create(shard_appointments)
+    ]
+
+
+def seed():
+    """
+    Создает стандартный набор данных (SEED_SIZES), общий для всех тестов процесса.
+
+    Набор детерминирован: у каждого врача SEED_SIZES['patients_per_doctor'] пациентов, у каждого упражнения
+    одна специальность, а назначения пациентов распределены по последним 90 дням и по обоим шардам.
+    """
+    rng = random.Random(44)
+    now = timezone.now()
+
+    speciality_list = specialities(SEED_SIZES['specialities'])
+    frequencies = itertools.cycle(frequency for frequency, _ in Exercise.EXERCISE_FREQUENCY)
+    exercises_by_speciality = {
+        speciality.pk: exercises(
+            SEED_SIZES['exercises'] // len(speciality_list),
+            [speciality],
+            frequency=next(frequencies)
+        )
+        for speciality in speciality_list
+    }
+
+    patient_list = patients(SEED_SIZES['patients'])
+    doctor_list = [
+        doctor
+        for speciality in speciality_list
+        for doctor in doctors(SEED_SIZES['doctors'] // len(speciality_list), speciality)
+    ]
+
+    through = Doctor.patients.through
+    links, rows = [], []
+    for doctor in doctor_list:
+        for patient in rng.sample(patient_list, SEED_SIZES['patients_per_doctor']):
+            links.append(through(doctor_id=doctor.pk, patient_id=patient.pk))
+            for _ in range(SEED_SIZES['appointments_per_patient']):
+                rows.append((
+                    doctor,
+                    patient,
+                    rng.choice(exercises_by_speciality[doctor.speciality_id]),
+                    now - datetime.timedelta(days=rng.randrange(90), seconds=rng.randrange(86400))
+                ))
+    through.objects.bulk_create(links)
+    appointments(rows)
@@ -0,0 +1,68 @@
+import contextlib
+import json
+import time
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class JsonClientMixin:
+    """
+    Запросы к API с JSON-телом.
+
+    """
+
+    def send(self, method, url, data=None, **extra):
+        return getattr(self.client, method)(
+            url,
+            data=json.dumps(data) if data is not None else '',
+            content_type='application/json',
+            **extra
+        )
+
+
+class QueryCountMixin:
+    """
+    Подсчет SQL-запросов ко всем БД: основной и шардам назначений.
+
+    """
+
+    @contextlib.contextmanager
+    def assertQueries(self, expected):
+        """
+        Проверяет суммарное количество запросов ко всем БД внутри блока with.
+
+        Parameters:
+            expected (int): Ожидаемое количество запросов.
+        """
+        with contextlib.ExitStack() as stack:
+            contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            yield
+        queries = [query['sql'] for context in contexts for query in context.captured_queries]
+        self.assertEqual(len(queries), expected, '\n'.join(queries))
+
+
+class BudgetMixin:
+    """
+    Проверка времени выполнения по лучшему из нескольких замеров.
+
+    Бюджеты в тестах примерно в десять раз больше времени на машине разработчика: они ловят изменения
+    сложности (N+1-запросы, квадратичные циклы, лишние импорты), а не колебания загрузки процессора.
+
+    """
+
+    def assertFasterThan(self, budget_ms, func, repeat=5):
+        """
+        Проверяет, что func выполняется быстрее бюджета.
+
+        Parameters:
+            budget_ms (float): Бюджет в миллисекундах.
+            func (callable): Проверяемая функция без аргументов.
+            repeat (int): Количество замеров.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.assertLess(min(timings), budget_ms, f'Лучший замер {min(timings):.1f} мс, бюджет {budget_ms} мс')
@@ -0,0 +1,50 @@
+from django.test.runner import DiscoverRunner, ParallelTestSuite
+
+
+def ensure_seeded():
+    """
+    Создает стандартный набор данных (см. factories.seed()), если тестовая БД процесса еще пуста.
+    """
+    # Модели импортируются после django.setup(), который процесс spawn выполняет в ParallelTestSuite.init_worker
+    from api.models import Speciality
+    from api.tests import factories
+
+    if not Speciality.objects.exists():
+        factories.seed()
+
+
+def _init_seeded_worker(*args, **kwargs):
+    """
+    Подключает процесс --parallel к его копии тестовых БД и при необходимости заполняет ее.
+
+    Процессы, запущенные через fork, получают копию уже заполненной БД родителя, а процессы, запущенные
+    через spawn, - копию, снятую до заполнения, и создают набор данных сами. Подключение к БД выполняет
+    стандартный инициализатор ParallelTestSuite.init_worker. Функция должна быть определена на уровне модуля,
+    чтобы multiprocessing мог передать ее в процесс.
+    """
+    ParallelTestSuite.init_worker(*args, **kwargs)
+    ensure_seeded()
+
+
+class SeededParallelTestSuite(ParallelTestSuite):
+    init_worker = _init_seeded_worker
+
+
+class SeededTestRunner(DiscoverRunner):
+    """
+    Тестовый раннер, который создает тестовые данные один раз на процесс.
+
+    После миграций тестовые БД заполняются стандартным набором данных factories.seed() - снимком, общим
+    для всех тестов процесса. Тесты наследуются от django.test.TestCase: каждый тест выполняется
+    в транзакции, которая откатывается, поэтому снимок не пересоздается между тестами. Данные, нужные
+    отдельному классу тестов, создаются в setUpTestData и откатываются после класса.
+
+    """
+    parallel_test_suite = SeededParallelTestSuite
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+        # Если запущены только тесты без БД (SimpleTestCase), тестовые БД не создаются и заполнять нечего
+        if old_config:
+            ensure_seeded()
+        return old_config
@@ -0,0 +1,166 @@
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from api import sharding
+from api.admin import DateProbingQuerySet
+from api.events import broker
+from api.models import Appointment, Doctor, Exercise, OutboxEvent, Patient
+from api.tests import factories
+from api.tests.mixins import QueryCountMixin
+
+
+class AdminQueryTests(QueryCountMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_changelists(self):
+        # Сессия, пользователь, COUNT(*) и страница записей. У врачей - еще специальности для фильтра,
+        # у упражнений - еще COUNT(*) всех записей (show_full_result_count)
+        for model, expected in ((Doctor, 5), (Patient, 4), (Exercise, 5)):
+            with self.subTest(model=model.__name__), self.assertQueries(expected):
+                response = self.client.get(reverse(f'admin:api_{model._meta.model_name}_changelist'))
+            self.assertEqual(response.status_code, 200)
+
+    def test_appointment_date_hierarchy(self):
+        url = reverse('admin:api_appointment_changelist')
+        month = timezone.localtime().strftime('%Y-%m').split('-')
+        params = {'appointment_date__year': month[0], 'appointment_date__month': int(month[1])}
+
+        with CaptureQueriesContext(connections['default']) as before:
+            self.client.get(url, params)
+
+        doctor = Doctor.objects.first()
+        # Админка показывает назначения основной БД
+        patient = next(
+            patient for patient in doctor.patients.order_by('pk') if sharding.shard_for(patient.pk) == 'default'
+        )
+        exercise = Exercise.objects.filter(specialisations=doctor.speciality_id).first()
+        # Назначения того же дня не добавляют запросов: на каждый день иерархии - один запрос
+        factories.appointments([(doctor, patient, exercise, timezone.now())] * 200)
+
+        with self.assertQueries(len(before)):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+    def test_date_probing(self):
+        queryset = Appointment.objects.all()
+        probing = DateProbingQuerySet(model=Appointment, query=queryset.query, using=queryset.db)
+
+        for kind in ('year', 'month', 'day'):
+            with self.subTest(kind=kind):
+                expected = list(queryset.datetimes('appointment_date', kind))
+                # Один запрос на каждый период и один, не нашедший следующего
+                with self.assertQueries(len(expected) + 1):
+                    self.assertEqual(probing.datetimes('appointment_date', kind), expected)
+
+
+class AdminShardTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.speciality, = factories.specialities(1)
+        cls.exercise, = factories.exercises(1, [cls.speciality])
+        cls.patients = factories.patients(2)
+        cls.doctor, = factories.doctors(1, cls.speciality, cls.patients)
+        cls.appointments = factories.appointments([
+            (cls.doctor, patient, cls.exercise, None) for patient in cls.patients
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_appointment_shards(self):
+        for appointment in self.appointments:
+            alias = appointment._state.db
+            with self.subTest(shard=alias):
+                response = self.client.get(reverse('admin:api_appointment_changelist'), {'shard': alias})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['cl'].queryset.filter(pk=appointment.pk).exists())
+
+                url = reverse('admin:api_appointment_change', args=[appointment.pk])
+                response = self.client.get(url, {'_changelist_filters': f'shard={alias}'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['original']._state.db, alias)
+                self.assertEqual(response.context['original'].patient_id, appointment.patient_id)
+
+    def test_delete_through_purge(self):
+        self.assertEqual(len({appointment._state.db for appointment in self.appointments}), 2)
+
+        response = self.client.post(reverse('admin:api_doctor_delete', args=[self.doctor.pk]), {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Doctor.objects.filter(pk=self.doctor.pk).exists())
+        self.assertFalse(any(Appointment.objects.for_patient(patient.pk).exists() for patient in self.patients))
+        self.assertTrue(OutboxEvent.objects.filter(model='doctor', object_id=self.doctor.pk,
+                                                   action=OutboxEvent.DELETE).exists())
+
+    def test_save_records_events(self):
+        response = self.client.post(reverse('admin:api_patient_add'), {'name': 'Пациент из админки'})
+        self.assertEqual(response.status_code, 302)
+        patient = Patient.objects.get(name='Пациент из админки')
+
+        response = self.client.post(reverse('admin:api_patient_change', args=[patient.pk]), {'name': 'Новое имя'})
+        self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(
+            list(OutboxEvent.objects.filter(model='patient', object_id=patient.pk).values_list('action', flat=True)),
+            [OutboxEvent.CREATE, OutboxEvent.UPDATE]
+        )
+
+    def test_appointment_events(self):
+        # Назначения пациента хранятся не в основной БД
+        patient = next(patient for patient in self.patients if sharding.shard_for(patient.pk) != 'default')
+        alias = sharding.shard_for(patient.pk)
+        now = timezone.localtime()
+
+        with mock.patch.object(broker, 'publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:api_appointment_add'), {
+                'doctor': self.doctor.pk,
+                'patient': patient.pk,
+                'exercise': self.exercise.pk,
+                'appointment_date_0': now.strftime('%Y-%m-%d'),
+                'appointment_date_1': now.strftime('%H:%M:%S'),
+            })
+        self.assertEqual(response.status_code, 302)
+        appointment = Appointment.objects.using(alias).filter(patient=patient).latest('pk')
+        publish.assert_any_call(f'patient:{patient.pk}', mock.ANY)
+
+        url = reverse('admin:api_appointment_delete', args=[appointment.pk])
+        response = self.client.post(f'{url}?{urlencode({"_changelist_filters": f"shard={alias}"})}', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+
+        self.assertFalse(Appointment.objects.using(alias).filter(pk=appointment.pk).exists())
+        self.assertEqual(
+            list(OutboxEvent.objects.using(alias).filter(model='appointment', object_id=appointment.pk)
+                 .values_list('action', flat=True)),
+            [OutboxEvent.CREATE, OutboxEvent.DELETE]
+        )
+
+    def test_delete_selected_appointments(self):
+        for appointment in self.appointments:
+            alias = appointment._state.db
+            with self.subTest(shard=alias):
+                response = self.client.post(f"{reverse('admin:api_appointment_changelist')}?shard={alias}", {
+                    'action': 'delete_selected',
+                    '_selected_action': [appointment.pk],
+                    'post': 'yes',
+                })
+                self.assertEqual(response.status_code, 302)
+                self.assertFalse(Appointment.objects.using(alias).filter(pk=appointment.pk).exists())
+                self.assertTrue(OutboxEvent.objects.using(alias).filter(model='appointment', object_id=appointment.pk,
+                                                                        action=OutboxEvent.DELETE).exists())
@@ -0,0 +1,42 @@
+import datetime
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from api import sharding
+from api.models import Appointment
+from api.tests import factories
+from api.tests.mixins import QueryCountMixin
+
+
+class AnalyticsTests(QueryCountMixin, TestCase):
+    databases = '__all__'
+
+    def test_reports(self):
+        window = {'from': (timezone.localdate() - datetime.timedelta(days=100)).isoformat(), 'period': 'month'}
+        total = sum(Appointment.objects.using(alias).count() for alias in sharding.shards())
+
+        response = self.client.get(reverse('analytics_doctors'), window)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), factories.SEED_SIZES['doctors'])
+        self.assertEqual(sum(row['appointments'] for row in results), total)
+        self.assertEqual({row['patients'] for row in results}, {factories.SEED_SIZES['patients_per_doctor']})
+
+        for name in ('analytics_specialities', 'analytics_frequencies'):
+            with self.subTest(report=name):
+                response = self.client.get(reverse(name), window)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(sum(row['appointments'] for row in response.json()['results']), total)
+
+    def test_invalid_period(self):
+        response = self.client.get(reverse('analytics_doctors'), {'period': 'century'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_queries(self):
+        # Связи врач-пациент, ID удаленных врачей, пациентов и упражнений, назначения с каждого шарда и врачи
+        with self.assertQueries(5):
+            response = self.client.get(reverse('analytics_doctors'), {'period': 'hour'})
+        self.assertEqual(response.status_code, 200)
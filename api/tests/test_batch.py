@@ -0,0 +1,60 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from api.batch import MAX_ID
+from api.models import Doctor, Exercise
+from api.tests.mixins import BudgetMixin, QueryCountMixin
+
+
+class BatchTests(BudgetMixin, QueryCountMixin, TestCase):
+    databases = '__all__'
+
+    def test_ids_and_fields(self):
+        doctor = Doctor.objects.first()
+        patient_ids = sorted(doctor.patients.values_list('pk', flat=True))
+
+        response = self.client.get(reverse('doctor'),
+                                   {'ids': f'{doctor.pk},{doctor.pk},{MAX_ID}', 'fields': 'patients'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'status': 'success',
+            'results': [{'id': doctor.pk, 'patients': patient_ids}],
+            'missing': [MAX_ID],
+        })
+
+    def test_detail_fields(self):
+        exercise = Exercise.objects.first()
+
+        response = self.client.get(reverse('exercise_detail', args=[exercise.pk]), {'fields': 'title,frequency'})
+
+        self.assertEqual(response.json()['results'], [
+            {'id': exercise.pk, 'title': exercise.title, 'frequency': exercise.frequency}
+        ])
+        self.assertEqual(self.client.get(reverse('exercise_detail', args=[10 ** 9]), {'fields': 'title'}).status_code,
+                         404)
+
+    def test_invalid_params(self):
+        for params in ({'ids': 'a,b'}, {'ids': ','}, {'ids': '1', 'fields': 'password'}, {'fields': 'name'},
+                       {'ids': ','.join(map(str, range(101)))}, {'ids': '1,99999999999999999999'}, {'ids': '0'},
+                       {'ids': '-1'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('patient'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
+
+    def test_queries(self):
+        ids = ','.join(str(pk) for pk in Doctor.objects.values_list('pk', flat=True)[:100])
+
+        # Врачи и связи с пациентами
+        with self.assertQueries(2):
+            response = self.client.get(reverse('doctor'), {'ids': ids})
+        self.assertEqual(len(response.json()['results']), Doctor.objects.count())
+
+        with self.assertQueries(1):
+            self.client.get(reverse('exercise'), {'ids': ids, 'fields': 'title,frequency'})
+
+    def test_budget(self):
+        ids = ','.join(str(pk) for pk in Doctor.objects.values_list('pk', flat=True)[:100])
+
+        self.assertFasterThan(50, lambda: self.client.get(reverse('doctor'), {'ids': ids}))
@@ -0,0 +1,58 @@
+import gzip
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from api.models import Doctor
+from api.template_loaders import strip_whitespace
+
+
+class CompressionTests(TestCase):
+    databases = '__all__'
+
+    def test_gzip(self):
+        doctor = Doctor.objects.first()
+
+        response = self.client.get(reverse('doctor'), HTTP_ACCEPT_ENCODING='gzip;q=1.0, br;q=0')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn(doctor.name, gzip.decompress(response.content).decode())
+
+    def test_identity(self):
+        response = self.client.get(reverse('doctor'), HTTP_ACCEPT_ENCODING='identity')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+
+class TemplateWhitespaceTests(TestCase):
+    databases = '__all__'
+
+    def test_strip_whitespace(self):
+        source = (
+            "{% extends 'base.html' %}\n"
+            "  {% block main %}\n"
+            "    {% for item in items %}{% if item %}\n"
+            "      {% translate 'Welcome,' %}\n"
+            "      <strong>{% firstof item.name item.pk %}</strong>\n"
+            "    {% endif %}{% endfor %}\n"
+            "  {% endblock %}\n"
+        )
+
+        # После строк только из невыводящих тегов перевод строки удаляется, после выводящих - сохраняется
+        self.assertEqual(strip_whitespace(source), (
+            "{% extends 'base.html' %}{% block main %}{% for item in items %}{% if item %}"
+            "{% translate 'Welcome,' %}\n<strong>{% firstof item.name item.pk %}</strong>\n"
+            "{% endif %}{% endfor %}{% endblock %}"
+        ))
+
+    def test_admin_templates_unchanged(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+
+        content = self.client.get(reverse('admin:index')).content.decode()
+
+        self.assertNotIn('Welcome,<strong>', content)
+        self.assertRegex(content, r'Welcome,\s+<strong>admin</strong>')
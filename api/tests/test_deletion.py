@@ -0,0 +1,72 @@
+import datetime
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api import sharding
+from api.models import Appointment, Doctor, OutboxEvent
+from api.tests import factories
+from api.tests.mixins import JsonClientMixin, QueryCountMixin
+
+
+class DeleteTests(JsonClientMixin, QueryCountMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.exercise, = factories.exercises(1, [cls.speciality])
+        cls.patient, = factories.patients(1)
+        cls.doctor, = factories.doctors(1, cls.speciality, [cls.patient])
+
+    def test_delete(self):
+        response = self.send('delete', reverse('doctor_detail', args=[self.doctor.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Doctor.all_objects.filter(pk=self.doctor.pk).exists())
+        self.assertFalse(Doctor.patients.through.objects.filter(doctor_id=self.doctor.pk).exists())
+        self.assertTrue(OutboxEvent.objects.filter(object_id=self.doctor.pk, action=OutboxEvent.DELETE).exists())
+        self.assertEqual(self.send('delete', reverse('doctor_detail', args=[self.doctor.pk])).status_code, 404)
+
+    @override_settings(SOFT_DELETE=True)
+    def test_soft_delete(self):
+        response = self.send('delete', reverse('doctor_detail', args=[self.doctor.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Doctor.all_objects.filter(pk=self.doctor.pk, deleted_at__isnull=False).exists())
+        self.assertEqual(self.client.get(reverse('doctor_detail', args=[self.doctor.pk])).status_code, 404)
+
+    @override_settings(SOFT_DELETE=True)
+    def test_soft_deleted_patient_appointments(self):
+        patient, = factories.patients(1)
+        exercise, = factories.exercises(1, [self.speciality])
+        self.doctor.patients.add(patient)
+        factories.appointments([(self.doctor, person, exercise, None) for person in (self.patient, patient)])
+        window = {'from': (timezone.localdate() - datetime.timedelta(days=1)).isoformat()}
+
+        def appointments():
+            caches['default'].clear()
+            results = self.client.get(reverse('analytics_doctors'), window).json()['results']
+            return next(row['appointments'] for row in results if row['doctor_id'] == self.doctor.pk)
+
+        self.assertEqual(appointments(), 2)
+        self.assertEqual(self.send('delete', reverse('patient_detail', args=[patient.pk])).status_code, 200)
+
+        # Назначения удаленного пациента не видны до физического удаления фоновой задачей
+        self.assertTrue(Appointment.objects.using(sharding.shard_for(patient.pk)).filter(patient=patient).exists())
+        response = self.client.get(reverse('doctor_exercises', args=[self.doctor.pk]))
+        self.assertContains(response, self.patient.name)
+        self.assertNotContains(response, patient.name)
+        self.assertEqual(appointments(), 1)
+
+    def test_delete_queries(self):
+        factories.appointments([(self.doctor, self.patient, self.exercise, None)] * 50)
+
+        # В каждом шарде своя транзакция: SAVEPOINT, ID назначений и RELEASE, а в шарде с назначениями - еще
+        # их удаление и события одной пачкой; затем SAVEPOINT, удаление связей и врача, событие и RELEASE
+        with self.assertQueries(13):
+            response = self.client.delete(reverse('doctor_detail', args=[self.doctor.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Appointment.objects.for_patient(self.patient.pk).exists())
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import socket
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import events, sharding
+from api.events import EventStreamApplication, RESYNC, appointment_message, broker
+from api.tests import factories
+
+
+class BrokerTests(SimpleTestCase):
+
+    async def test_publish(self):
+        local = events.Broker(queue_size=1)
+        first = local.subscribe(['patient:1', 'doctor:1'])
+        second = local.subscribe(['doctor:1'])
+        patient = local.subscribe(['patient:2'])
+
+        with self.assertLogs('api.events', 'WARNING'):
+            local.publish('doctor:1', {'id': 1})
+            local.publish('doctor:1', {'id': 2})
+            await asyncio.sleep(0)
+
+        # Очередь на одно сообщение: остальные отброшены
+        self.assertEqual(first.get_nowait(), {'id': 1})
+        self.assertEqual(second.get_nowait(), {'id': 1})
+        self.assertTrue(patient.empty())
+
+        local.unsubscribe(['patient:1', 'doctor:1'], first)
+        local.broadcast(RESYNC)
+        await asyncio.sleep(0)
+        self.assertTrue(first.empty())
+        self.assertIs(second.get_nowait(), RESYNC)
+        self.assertIs(patient.get_nowait(), RESYNC)
+
+    def test_cursor(self):
+        self.assertEqual(events._parse_cursor('7'), {'default': 7, 'shard_0': 7})
+        self.assertEqual(events._parse_cursor('default:3,shard_0:12,unknown:5'), {'default': 3, 'shard_0': 12})
+        for value in ('', 'default:x', 'unknown:1'):
+            with self.subTest(value=value):
+                self.assertIsNone(events._parse_cursor(value))
+
+
+class FakeConnection:
+    """
+    Соединение psycopg2 с сокетом, в который тест пишет уведомления.
+
+    """
+
+    def __init__(self):
+        self.server, self.client = socket.socketpair()
+        self.notifies = []
+
+    def fileno(self):
+        return self.client.fileno()
+
+    def notify(self, message):
+        self.notifies.append(mock.Mock(payload=json.dumps(message)))
+        self.server.send(b'.')
+
+    def poll(self):
+        if not self.client.recv(1024):
+            raise ConnectionError('server closed the connection')
+
+    def close(self):
+        self.client.close()
+        self.server.close()
+
+
+@override_settings(EVENTS_BACKEND='postgres')
+class ListenerTests(SimpleTestCase):
+
+    async def test_reconnect(self):
+        first, second = FakeConnection(), FakeConnection()
+        queue = broker.subscribe(['patient:1'])
+        self.addCleanup(broker.unsubscribe, ['patient:1'], queue)
+
+        with mock.patch.object(events, '_connect', side_effect=[first, second]), \
+                mock.patch.object(events, 'RECONNECT_DELAY', 0), self.assertLogs('api.events', 'ERROR'):
+            events.ensure_listener()
+            listener = events._listeners.pop(asyncio.get_running_loop())
+            try:
+                self.assertIs(await asyncio.wait_for(queue.get(), 1), RESYNC)
+
+                first.notify({'id': 1, 'patient_id': 1, 'doctor_id': 1})
+                self.assertEqual((await asyncio.wait_for(queue.get(), 1))['id'], 1)
+
+                # Обрыв соединения: слушатель переподключается и просит подписчиков дослать пропущенное
+                first.server.close()
+                self.assertIs(await asyncio.wait_for(queue.get(), 1), RESYNC)
+                second.notify({'id': 2, 'patient_id': 1, 'doctor_id': 1})
+                self.assertEqual((await asyncio.wait_for(queue.get(), 1))['id'], 2)
+            finally:
+                listener.cancel()
+                second.close()
+
+
+class EventStreamTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.exercise, = factories.exercises(1, [cls.speciality])
+        cls.patients = factories.patients(2)
+        cls.doctor, = factories.doctors(1, cls.speciality, cls.patients)
+
+    def appoint(self, patient):
+        appointment, = factories.appointments([(self.doctor, patient, self.exercise, None)])
+        return appointment
+
+    async def connect(self, path, last_event_id=None):
+        """
+        Открывает поток и возвращает очередь отправленных клиенту сообщений и функцию отключения.
+        """
+        headers = [(b'last-event-id', last_event_id.encode())] if last_event_id else []
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': headers}
+        sent = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        call = asyncio.ensure_future(EventStreamApplication(None)(scope, receive, sent.put))
+        self.assertEqual((await sent.get())['status'], 200)
+
+        async def disconnect():
+            disconnected.set()
+            await call
+
+        return sent, disconnect
+
+    async def next_body(self, sent):
+        return (await asyncio.wait_for(sent.get(), 1))['body'].decode()
+
+    def parse(self, body):
+        fields = dict(line.split(': ', 1) for line in body.strip().split('\n'))
+        return fields['id'], json.loads(fields['data']) if 'data' in fields else None
+
+    async def test_reconnect_replays_every_shard(self):
+        path = f'/api/doctor/{self.doctor.pk}/events/'
+        sent, disconnect = await self.connect(path)
+
+        cursor, _ = self.parse(await self.next_body(sent))
+        positions = await sync_to_async(events._positions.func)()
+        self.assertEqual(events._parse_cursor(cursor), positions)
+
+        appointment = await sync_to_async(self.appoint)(self.patients[0])
+        events._dispatch(appointment_message(appointment))
+        cursor, message = self.parse(await self.next_body(sent))
+        self.assertEqual(message['id'], appointment.pk)
+        await disconnect()
+
+        # Пока клиент отключен, в обоих шардах появляются назначения. Ключи шардов независимы, и ключ
+        # нового назначения одного шарда может быть меньше уже полученного из другого
+        missed = [await sync_to_async(self.appoint)(patient) for patient in self.patients]
+        self.assertEqual(len({sharding.shard_for(patient.pk) for patient in self.patients}), 2)
+
+        sent, disconnect = await self.connect(path, cursor)
+        replayed = [self.parse(await self.next_body(sent))[1]['id'] for _ in missed]
+        self.assertEqual(sorted(replayed), sorted(appointment.pk for appointment in missed))
+
+        # Досланное событие из брокера не повторяется, а RESYNC досылает пропущенное
+        events._dispatch(appointment_message(missed[0]))
+        late = await sync_to_async(self.appoint)(self.patients[1])
+        broker.broadcast(RESYNC)
+        self.assertEqual(self.parse(await self.next_body(sent))[1]['id'], late.pk)
+        events._dispatch(appointment_message(late))
+        await asyncio.sleep(0.05)
+        self.assertTrue(sent.empty())
+        await disconnect()
+
+    async def test_patient_legacy_id(self):
+        patient = self.patients[0]
+        first, second = [await sync_to_async(self.appoint)(patient) for _ in range(2)]
+
+        sent, disconnect = await self.connect(f'/api/patient/{patient.pk}/events/', str(first.pk))
+        cursor, message = self.parse(await self.next_body(sent))
+        self.assertEqual(message['id'], second.pk)
+        self.assertIn(f'{sharding.shard_for(patient.pk)}:{second.pk}', cursor)
+        await disconnect()
+
+    async def test_not_found(self):
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/patient/1000000000/events/', 'headers': []}
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await EventStreamApplication(None)(scope, None, send)
+        self.assertEqual(sent[0]['status'], 404)
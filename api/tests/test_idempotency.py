@@ -0,0 +1,62 @@
+import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from api.middleware import IdempotencyMiddleware
+from api.models import IdempotencyKey, Patient
+from api.tests.mixins import JsonClientMixin
+
+
+class IdempotencyKeyTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    def test_replay(self):
+        url = reverse('patient')
+        first = self.send('post', url, {'name': 'Пациент с ключом'}, HTTP_IDEMPOTENCY_KEY='key-1')
+        second = self.send('post', url, {'name': 'Пациент с ключом'}, HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(Patient.objects.filter(name='Пациент с ключом').count(), 1)
+
+    def test_lease(self):
+        url = reverse('patient')
+        key = IdempotencyMiddleware.scope('127.0.0.1', 'key-3')
+
+        # Ключ запроса, процесс которого упал, освобождается по истечении короткой аренды
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() - datetime.timedelta(days=2)):
+            first, created = IdempotencyMiddleware.claim(key, 'fingerprint')
+        self.assertTrue(created)
+        self.assertLess(IdempotencyKey.objects.get(pk=key).expires_at, timezone.now())
+        self.assertEqual(self.send('post', url, {'name': 'Пациент'}, HTTP_IDEMPOTENCY_KEY='key-3').status_code, 200)
+
+        # Сохраненный ответ хранится IDEMPOTENCY_TTL
+        stored = IdempotencyKey.objects.get(pk=key)
+        ttl = datetime.timedelta(seconds=settings.IDEMPOTENCY_TTL)
+        self.assertGreater(stored.expires_at, timezone.now() + ttl - datetime.timedelta(minutes=1))
+
+        # Запрос, аренда которого истекла, завершается позже повтора и не перезаписывает его ответ
+        middleware = IdempotencyMiddleware(lambda request: JsonResponse({'status': 'success'}, status=201))
+        response = middleware.get_response_and_store(RequestFactory().post(url), first)
+        self.assertEqual(response.status_code, 201)
+        replayed = IdempotencyKey.objects.get(pk=key)
+        self.assertEqual((replayed.status_code, replayed.content), (stored.status_code, stored.content))
+
+        # Строка запроса входит в отпечаток
+        response = self.send('post', f'{url}?dry_run=1', {'name': 'Пациент'}, HTTP_IDEMPOTENCY_KEY='key-3')
+        self.assertEqual(response.status_code, 422)
+
+    def test_per_client(self):
+        url = reverse('patient')
+        for address in ('192.0.2.1', '192.0.2.2'):
+            response = self.send('post', url, {'name': 'Пациент клиента'}, HTTP_IDEMPOTENCY_KEY='key-4',
+                                 REMOTE_ADDR=address)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Idempotent-Replayed', response.headers)
+        self.assertEqual(Patient.objects.filter(name='Пациент клиента').count(), 2)
@@ -0,0 +1,46 @@
+from django.test import SimpleTestCase
+
+from api import loadtest
+
+
+class StatsTests(SimpleTestCase):
+
+    def test_summary(self):
+        stats = loadtest.Stats()
+        for latency in range(1, 101):
+            stats.record('list', 200, float(latency))
+        stats.record('appoint', 429, 3.0)
+        stats.record('appoint', 500, 4.0)
+        stats.record('appoint', None, 5000.0)
+
+        summary = stats.summary(duration=2.0)
+
+        total, appoint = summary['total'], summary['operations']['appoint']
+        self.assertEqual((total['requests'], total['rps']), (103, 51.5))
+        self.assertEqual(summary['operations']['list']['p50'], 51.0)
+        self.assertEqual(summary['operations']['list']['p95'], 96.0)
+        # Ошибки соединения и 5xx - ошибки, 429 - отказ ограничителя
+        self.assertEqual((appoint['throttled'], appoint['client_errors']), (1, 1))
+        self.assertAlmostEqual(appoint['error_rate'], 2 / 3)
+        self.assertEqual(sum(total['histogram']), 103)
+        self.assertEqual(total['histogram'][-1], 0)
+        self.assertEqual(total['histogram'][-2], 1)
+
+    def test_compare(self):
+        baseline = {
+            'total': {'rps': 100.0, 'p95': 50.0, 'error_rate': 0.0},
+            'operations': {'list': {'rps': 60.0, 'p95': 40.0, 'error_rate': 0.0}},
+        }
+        within = {
+            'total': {'rps': 90.0, 'p95': 55.0, 'error_rate': 0.005},
+            # Пропускная способность отдельных операций не сравнивается
+            'operations': {'list': {'rps': 10.0, 'p95': 45.0, 'error_rate': 0.0}},
+        }
+        worse = {
+            'total': {'rps': 70.0, 'p95': 80.0, 'error_rate': 0.05},
+            # Операции, которых нет в эталоне, не сравниваются
+            'operations': {'delete': {'rps': 1.0, 'p95': 1.0, 'error_rate': 0.0}},
+        }
+
+        self.assertEqual(loadtest.compare(within, baseline, 0.2), [])
+        self.assertEqual(len(loadtest.compare(worse, baseline, 0.2)), 3)
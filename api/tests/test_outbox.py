@@ -0,0 +1,152 @@
+import datetime
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api import deletion, outbox
+from api.models import Appointment, Doctor, OutboxCheckpoint, OutboxEvent
+from api.tests import factories
+
+
+class RelayOutboxTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+
+    def relay(self, consumer='default', **options):
+        call_command('relay_outbox', consumer=consumer, output=self.path, batch_size=2, **options)
+
+    def messages(self):
+        lines = []
+        for name in sorted(os.listdir(self.path)):
+            with open(os.path.join(self.path, name), encoding='utf-8') as file:
+                lines.extend(json.loads(line) for line in file)
+        return lines
+
+    def test_relay_all_shards(self):
+        patients = factories.patients(2)
+        outbox.record(patients, OutboxEvent.CREATE)
+        doctor, = factories.doctors(1, factories.specialities(1)[0], patients)
+        exercise, = factories.exercises(1)
+        appointments = factories.appointments([(doctor, patient, exercise, None) for patient in patients])
+        outbox.record(appointments, OutboxEvent.CREATE)
+
+        self.relay()
+
+        messages = self.messages()
+        self.assertEqual(
+            sorted((message['db'], message['model'], message['pk']) for message in messages),
+            sorted([('default', 'patient', patient.pk) for patient in patients]
+                   + [(appointment._state.db, 'appointment', appointment.pk) for appointment in appointments])
+        )
+        self.assertEqual({message['db'] for message in messages}, {'default', 'shard_0'})
+        # Пачки по batch_size событий, позиция - последнее переданное событие
+        self.assertEqual(len(os.listdir(self.path)), 3)
+        self.assertEqual(outbox.checkpoint('default', 'default').last_event_id,
+                         OutboxEvent.objects.latest('pk').pk)
+
+        self.relay()
+        self.assertEqual(len(self.messages()), len(messages))
+
+    def test_prune(self):
+        patients = factories.patients(3)
+        outbox.record(patients, OutboxEvent.CREATE)
+        OutboxCheckpoint.objects.create(consumer='slow', database='default', last_event_id=0)
+
+        self.relay(prune=True)
+        # Потребитель slow еще ничего не получил
+        self.assertEqual(OutboxEvent.objects.count(), 3)
+
+        self.relay(consumer='slow', prune=True)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+        # Новый потребитель после очистки начинает с оставшихся событий
+        outbox.record(factories.patients(1), OutboxEvent.UPDATE)
+        self.relay(consumer='new')
+        self.assertEqual(self.messages()[-1]['action'], OutboxEvent.UPDATE)
+
+    def test_cascade_delete_events(self):
+        patients = factories.patients(2)
+        doctor, = factories.doctors(1, factories.specialities(1)[0], patients)
+        exercise, = factories.exercises(1)
+        appointments = factories.appointments([(doctor, patient, exercise, None) for patient in patients] * 2)
+
+        with self.settings(SOFT_DELETE=False):
+            deletion.delete_objects(Doctor, [doctor.pk])
+
+        # Назначения удалены в обоих шардах, и о каждом добавлено событие в его шарде
+        for alias in ('default', 'shard_0'):
+            with self.subTest(alias=alias):
+                self.assertFalse(Appointment.objects.using(alias).filter(doctor=doctor.pk).exists())
+                self.assertEqual(
+                    sorted(OutboxEvent.objects.using(alias).filter(model='appointment', action=OutboxEvent.DELETE)
+                           .values_list('object_id', flat=True)),
+                    sorted(appointment.pk for appointment in appointments if appointment._state.db == alias)
+                )
+        self.assertTrue(OutboxEvent.objects.filter(model='doctor', object_id=doctor.pk,
+                                                   action=OutboxEvent.DELETE).exists())
+
+    def test_late_event_after_horizon(self):
+        first, second, third = (
+            OutboxEvent.objects.create(model='patient', object_id=index, action=OutboxEvent.CREATE)
+            for index in range(3)
+        )
+        second_pk = second.pk
+        second.delete()
+        OutboxEvent.objects.filter(pk=third.pk).update(created_at=timezone.now() - datetime.timedelta(minutes=1))
+        self.relay()
+        self.relay()
+
+        # Позиция прошла пропуск, а транзакция с событием second зафиксирована только теперь
+        self.assertEqual([message['id'] for message in self.messages()], [first.pk, third.pk])
+        self.assertEqual(outbox.checkpoint('default', 'default').last_event_id, third.pk)
+        second.pk = second_pk
+        second.save(force_insert=True)
+
+        self.relay()
+
+        # Событие передается вне порядка отдельной пачкой
+        self.assertEqual([message['id'] for message in self.messages()], [first.pk, third.pk, second.pk])
+        self.assertEqual(outbox.checkpoint('default', 'default').gaps, [])
+
+    def test_gap_retention(self):
+        first, second, third = (
+            OutboxEvent.objects.create(model='patient', object_id=index, action=OutboxEvent.CREATE)
+            for index in range(3)
+        )
+        second_pk = second.pk
+        second.delete()
+        OutboxEvent.objects.filter(pk=third.pk).update(created_at=timezone.now() - datetime.timedelta(minutes=1))
+        self.relay()
+        self.relay()
+        # Пропуск не удаляется из журнала, пока ждет событий
+        self.relay(prune=True)
+        self.assertTrue(OutboxEvent.objects.filter(pk=first.pk).exists())
+
+        with self.settings(OUTBOX_GAP_RETENTION=0):
+            self.relay()
+        second.pk = second_pk
+        second.save(force_insert=True)
+        self.relay()
+
+        self.assertEqual([message['id'] for message in self.messages()], [first.pk, third.pk])
+
+    def test_gap(self):
+        first, second, third = (
+            OutboxEvent.objects.create(model='patient', object_id=index, action=OutboxEvent.CREATE)
+            for index in range(3)
+        )
+        # Событие second еще не зафиксировано: его транзакция выполняется
+        second.delete()
+
+        self.assertEqual(outbox.pending('default', first.pk, 10, gap_timeout=30), [])
+
+        OutboxEvent.objects.filter(pk=third.pk).update(created_at=timezone.now() - datetime.timedelta(minutes=1))
+        self.assertEqual(outbox.pending('default', first.pk, 10, gap_timeout=30), [third])
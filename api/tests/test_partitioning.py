@@ -0,0 +1,150 @@
+import contextlib
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from api import partitioning, sharding
+from api.models import Appointment
+from api.tests import factories
+from api.tests.mixins import JsonClientMixin
+
+
+class ArchiveTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    #: Месяц, в котором нет назначений из общих тестовых данных.
+    month = datetime.date(2000, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        speciality, = factories.specialities(1)
+        cls.exercise, = factories.exercises(1, [speciality])
+        cls.patients = factories.patients(2)
+        cls.doctor, = factories.doctors(1, speciality, cls.patients)
+        start, _ = partitioning.month_bounds(cls.month)
+        cls.appointments = factories.appointments([
+            (cls.doctor, patient, cls.exercise, start + datetime.timedelta(days=day))
+            for day in range(5) for patient in cls.patients
+        ])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def archived(self, alias):
+        """
+        Возвращает ID назначений из всех файлов архива шарда.
+        """
+        ids = []
+        path = os.path.join(self.directory, alias)
+        for name in sorted(os.listdir(path)):
+            self.assertTrue(name.endswith('.ndjson.gz'), name)
+            with gzip.open(os.path.join(path, name), 'rt', encoding='utf-8') as file:
+                ids.extend(json.loads(line)['id'] for line in file)
+        return ids
+
+    def test_archive_month(self):
+        for alias in sharding.shards():
+            with self.subTest(shard=alias):
+                expected = sorted(appointment.pk for appointment in self.appointments
+                                  if appointment._state.db == alias)
+
+                count = partitioning.archive_month(connections[alias], self.month, self.directory, batch_size=2)
+
+                self.assertEqual(count, len(expected))
+                self.assertEqual(self.archived(alias), expected)
+                _, end = partitioning.month_bounds(self.month)
+                self.assertFalse(Appointment.objects.using(alias).filter(appointment_date__lt=end).exists())
+
+    def test_duplicate_of_old_appointment(self):
+        response = self.send('post', reverse('doctor_appoint', args=[self.doctor.pk]),
+                             {'patient_id': self.patients[1].pk, 'exercise_id': self.exercise.pk})
+
+        # Дубликат ищется во всех партициях шарда пациента, а не только в свежих
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Такое назначение уже существует.')
+
+    def test_retry_after_failure(self):
+        alias = sharding.shard_for(self.patients[0].pk)
+        connection = connections[alias]
+        expected = sorted(appointment.pk for appointment in self.appointments if appointment._state.db == alias)
+        raw_delete = QuerySet._raw_delete
+        calls = []
+
+        def failing_delete(queryset, using):
+            calls.append(using)
+            if len(calls) == 2:
+                raise OSError('Соединение потеряно')
+            return raw_delete(queryset, using)
+
+        # Вторая пачка записана в архив, но ее удаление откатилось
+        with mock.patch.object(QuerySet, '_raw_delete', failing_delete), self.assertRaises(OSError):
+            partitioning.archive_month(connection, self.month, self.directory, batch_size=2)
+        self.assertEqual(len(self.archived(alias)), 4)
+
+        partitioning.archive_month(connection, self.month, self.directory, batch_size=2)
+
+        # Повторная выгрузка перезаписала файл пачки, а не дописала строки
+        self.assertEqual(self.archived(alias), expected)
+
+    def test_write_rows_replaces_file(self):
+        path = os.path.join(self.directory, 'default', 'part.ndjson.gz')
+        now = timezone.now()
+
+        partitioning._write_rows(path, [(1, 1, 1, 1, now), (2, 1, 1, 1, now)])
+        partitioning._write_rows(path, [(1, 1, 1, 1, now)])
+
+        self.assertEqual(self.archived('default'), [1])
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['part.ndjson.gz'])
+
+
+class ArchivePartitionTests(TestCase):
+    """
+    Порядок транзакций выгрузки партиции Postgres на подставном соединении.
+
+    """
+    databases = '__all__'
+
+    def test_detach_in_own_transaction(self):
+        log = []
+        row = (1, 1, 1, 1, timezone.now())
+
+        def cursor(kind):
+            cursor = mock.MagicMock()
+            cursor.__enter__.return_value = cursor
+            cursor.execute.side_effect = lambda sql, params=None: log.append((kind, sql.split()[0]))
+            cursor.fetchmany.side_effect = [[row], []]
+            return cursor
+
+        @contextlib.contextmanager
+        def atomic(using):
+            log.append('BEGIN')
+            yield
+            log.append('COMMIT')
+
+        connection = mock.Mock(alias='default')
+        connection.cursor.side_effect = lambda: cursor('client')
+        connection.chunked_cursor.side_effect = lambda: cursor('server')
+        month = datetime.date(2000, 1, 1)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(partitioning, 'partitions', return_value={month: 'api_appointment_y2000m01'}), \
+                mock.patch.object(partitioning.transaction, 'atomic', atomic):
+            self.assertEqual(partitioning.archive_partition(connection, month, directory), 1)
+
+        # Таблица назначений заблокирована только на время DETACH, а выгрузка читает серверный курсор
+        self.assertEqual(log, [
+            'BEGIN', ('client', 'ALTER'), 'COMMIT',
+            'BEGIN', ('server', 'SELECT'), 'COMMIT',
+            'BEGIN', ('client', 'DROP'), 'COMMIT',
+        ])
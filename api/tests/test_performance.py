@@ -0,0 +1,27 @@
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api.tests import factories
+from api.tests.mixins import BudgetMixin
+
+
+class ResponseBudgetTests(BudgetMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.exercises = factories.exercises(10, [cls.speciality])
+        cls.patient, = factories.patients(1)
+        cls.doctor, = factories.doctors(1, cls.speciality, [cls.patient])
+        factories.appointments([
+            (cls.doctor, cls.patient, cls.exercises[index % 10], None) for index in range(1000)
+        ])
+
+    def test_patient_exercises(self):
+        url = reverse('patient_exercises', args=[self.patient.pk])
+
+        for engine in [engine.name for engine in engines.all()]:
+            with self.subTest(engine=engine), override_settings(LIST_TEMPLATE_ENGINE=engine):
+                self.assertFasterThan(500, lambda: self.client.get(url))
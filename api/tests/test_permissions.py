@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from api import permission_graph
+from api.models import Doctor, Exercise
+from api.tests import factories
+from api.tests.mixins import BudgetMixin
+
+
+class PermissionSnapshotTests(BudgetMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.settings = override_settings(PERMISSION_SNAPSHOT_FILE=os.path.join(cls.directory.name, 'graph.bin'))
+        cls.settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings.disable()
+        # Снимок и счетчик версии процесса относятся к временному файлу
+        permission_graph._snapshot = permission_graph._version_buffer = None
+        cls.directory.cleanup()
+
+    def setUp(self):
+        permission_graph.build()
+        self.links = list(Doctor.patients.through.objects.values_list('doctor_id', 'patient_id'))
+        self.doctors = {doctor.pk: doctor for doctor in Doctor.objects.all()}
+
+    def test_checks_without_queries(self):
+        exercise = Exercise.objects.first()
+        speciality_id = exercise.specialisations.get().pk
+
+        with self.assertNumQueries(0, using='default'):
+            for doctor_id, patient_id in self.links:
+                self.assertTrue(permission_graph.doctor_has_patient(self.doctors[doctor_id], patient_id))
+            self.assertFalse(permission_graph.doctor_has_patient(self.doctors[self.links[0][0]], 10 ** 9))
+            self.assertTrue(permission_graph.exercise_has_speciality(exercise, speciality_id))
+            self.assertFalse(permission_graph.exercise_has_speciality(exercise, speciality_id + 1))
+
+    def test_stale_after_change(self):
+        doctor = self.doctors[self.links[0][0]]
+        patient, = factories.patients(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.patients.add(patient)
+
+        # Снимок устарел, проверка идет запросом к БД
+        self.assertIsNone(permission_graph.snapshot())
+        with self.assertNumQueries(1, using='default'):
+            self.assertTrue(permission_graph.doctor_has_patient(doctor, patient.pk))
+
+    def test_check_budget(self):
+        links = self.links * (10000 // len(self.links) + 1)
+
+        def check():
+            for doctor_id, patient_id in links[:10000]:
+                permission_graph.doctor_has_patient(self.doctors[doctor_id], patient_id)
+
+        self.assertFasterThan(300, check)
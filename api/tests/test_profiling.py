@@ -0,0 +1,33 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api.tests.mixins import JsonClientMixin
+
+
+class ProfilingTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    def test_slow_query_log_without_values(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'slow_queries.log')
+
+        with override_settings(PROFILING_HEADER=True, SLOW_QUERY_MS=0, SLOW_QUERY_LOG=path):
+            response = self.send('post', reverse('patient'), {'name': 'Секретный пациент'}, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+
+        with open(path, encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        inserts = [record for record in records if record.get('sql', '').startswith('INSERT INTO "api_patient"')]
+        self.assertIn('str', inserts[0]['params'])
+        self.assertNotIn('Секретный', ''.join(json.dumps(record, ensure_ascii=False) for record in records))
+
+    def test_header_ignored_by_default(self):
+        self.assertFalse(settings.PROFILING_HEADER)
+        response = self.client.get(reverse('patient'), HTTP_X_PROFILE='1')
+        self.assertNotIn('Server-Timing', response.headers)
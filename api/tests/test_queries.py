@@ -0,0 +1,63 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from api.tests import factories
+from api.tests.mixins import QueryCountMixin
+
+
+class ReadQueryTests(QueryCountMixin, TestCase):
+    """
+    Количество запросов страниц не зависит от количества записей.
+
+    """
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.exercises = factories.exercises(3, [cls.speciality])
+        cls.patients = factories.patients(2)
+        cls.doctor, = factories.doctors(1, cls.speciality, cls.patients)
+        # У первого пациента одно назначение, у второго - сто
+        factories.appointments([(cls.doctor, cls.patients[0], cls.exercises[0], None)])
+        factories.appointments([
+            (cls.doctor, cls.patients[1], cls.exercises[index % 3], None) for index in range(100)
+        ])
+
+    def test_patient_exercises(self):
+        # Пациент, ID удаленных врачей и упражнений, назначения из его шарда, врачи и упражнения назначений
+        for patient in self.patients:
+            with self.subTest(patient=patient.pk), self.assertQueries(5):
+                response = self.client.get(reverse('patient_exercises', args=[patient.pk]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_doctor_exercises(self):
+        # Врач, ID удаленных пациентов и упражнений, назначения с каждого из двух шардов, пациенты и упражнения
+        with self.assertQueries(6):
+            response = self.client.get(reverse('doctor_exercises', args=[self.doctor.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+class WriteQueryTests(QueryCountMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.exercise, = factories.exercises(1, [cls.speciality])
+        cls.patient, = factories.patients(1)
+        cls.doctor, = factories.doctors(1, cls.speciality, [cls.patient])
+
+    def test_appoint(self):
+        # Врач, упражнение и пациент; проверки специальности и связи с пациентом; проверки внешних ключей
+        # в full_clean(); ID удаленных врачей и упражнений и проверка дубликата; SAVEPOINT, назначение, событие
+        # и RELEASE в шарде пациента
+        with self.assertQueries(14):
+            response = self.client.post(
+                reverse('doctor_appoint', args=[self.doctor.pk]),
+                json.dumps({'patient_id': self.patient.pk, 'exercise_id': self.exercise.pk}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from api.ratelimit import AdmissionController, CacheRateLimiter, LocalRateLimiter, QueryTimer
+from api.tests import factories
+from api.tests.mixins import BudgetMixin, JsonClientMixin
+
+
+class RateLimitTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.exercise, = factories.exercises(1, [cls.speciality])
+        cls.patients = factories.patients(1)
+        cls.doctor, = factories.doctors(1, cls.speciality, cls.patients)
+
+    def appoint(self, **extra):
+        return self.send('post', reverse('doctor_appoint', args=[self.doctor.pk]),
+                         {'patient_id': self.patients[0].pk, 'exercise_id': self.exercise.pk}, **extra)
+
+    def test_rate_limit(self):
+        _, burst = settings.RATELIMIT_ROUTES['doctor_appoint']
+        statuses = [self.appoint().status_code for _ in range(burst + 1)]
+
+        self.assertEqual(statuses[-1], 429)
+
+    @override_settings(RATELIMIT_PROXY_HOPS=1)
+    def test_rate_limit_behind_proxy(self):
+        _, burst = settings.RATELIMIT_ROUTES['doctor_appoint']
+
+        def appoint(client):
+            # Прокси дописывает адрес клиента в конец, левее - подделанный клиентом адрес
+            return self.appoint(HTTP_X_FORWARDED_FOR=f'10.0.0.1, {client}').status_code
+
+        statuses = [appoint('192.0.2.1') for _ in range(burst + 1)]
+        self.assertEqual(statuses[-1], 429)
+        # Клиент за тем же прокси ограничивается отдельно
+        self.assertNotEqual(appoint('192.0.2.2'), 429)
+
+    def test_overload_keeps_tokens(self):
+        _, burst = settings.RATELIMIT_ROUTES['doctor_appoint']
+
+        with mock.patch.object(AdmissionController, 'try_acquire', return_value=False):
+            statuses = {self.appoint(REMOTE_ADDR='192.0.2.3').status_code for _ in range(burst + 1)}
+        self.assertEqual(statuses, {503})
+
+        # Запросы, отклоненные с кодом 503, не расходуют маркеры клиента
+        self.assertNotEqual(self.appoint(REMOTE_ADDR='192.0.2.3').status_code, 429)
+
+    def test_rate_limited_request_releases_admission(self):
+        _, burst = settings.RATELIMIT_ROUTES['doctor_appoint']
+
+        with mock.patch.object(AdmissionController, 'try_acquire', autospec=True,
+                               side_effect=AdmissionController.try_acquire) as acquire, \
+                mock.patch.object(AdmissionController, 'release', autospec=True,
+                                  side_effect=AdmissionController.release) as release:
+            statuses = [self.appoint(REMOTE_ADDR='192.0.2.4').status_code for _ in range(burst + 1)]
+
+        self.assertEqual(statuses[-1], 429)
+        self.assertEqual(release.call_count, acquire.call_count)
+        # Отклоненный запрос не выполнялся и не меняет среднее время SQL-запроса
+        self.assertEqual(release.call_args.args[1:], ())
+
+
+class AdmissionControllerTests(SimpleTestCase):
+
+    def test_query_timer_average(self):
+        timer = QueryTimer()
+        self.assertIsNone(timer.average)
+
+        with mock.patch('time.perf_counter', side_effect=[0.0, 0.01, 1.0, 1.03]):
+            for _ in range(2):
+                timer(lambda *args: None, 'SELECT 1', (), False, {})
+
+        self.assertEqual(timer.count, 2)
+        self.assertAlmostEqual(timer.average, 0.02)
+
+    def test_latency_per_query(self):
+        admission = AdmissionController(limit=2, latency_limit=0.1)
+
+        # Много быстрых SQL-запросов в одном HTTP-запросе (100 запросов за 0.5 с) не считаются перегрузкой
+        for _ in range(20):
+            self.assertTrue(admission.try_acquire())
+            admission.release(0.5 / 100)
+        self.assertFalse(admission.overloaded)
+
+        for _ in range(20):
+            self.assertTrue(admission.try_acquire())
+            admission.release(0.5)
+        self.assertTrue(admission.overloaded)
+        # При перегрузке запросы выполняются по одному, а запрос без обращений к БД не меняет среднее
+        self.assertTrue(admission.try_acquire())
+        self.assertFalse(admission.try_acquire())
+        admission.release()
+        self.assertTrue(admission.overloaded)
+        self.assertEqual(admission.in_flight, 0)
+
+
+class CacheRateLimiterTests(TestCase):
+
+    def test_window(self):
+        limiter = CacheRateLimiter(caches['default'])
+        self.addCleanup(caches['default'].clear)
+
+        with mock.patch('time.time', return_value=1000.0):
+            self.assertEqual([limiter.acquire('client:route', 2, 5) for _ in range(5)], [0.0] * 5)
+            # Окно 5 / 2 = 2.5 с, следующее начинается в 1002.5
+            self.assertEqual(limiter.acquire('client:route', 2, 5), 2.5)
+            self.assertEqual(limiter.acquire('other:route', 2, 5), 0.0)
+
+        with mock.patch('time.time', return_value=1002.5):
+            self.assertEqual(limiter.acquire('client:route', 2, 5), 0.0)
+
+
+class LocalRateLimiterTests(BudgetMixin, SimpleTestCase):
+
+    def test_acquire_budget(self):
+        limiter = LocalRateLimiter()
+
+        def acquire():
+            for index in range(10000):
+                limiter.acquire(f'127.0.0.{index % 1000}:doctor_appoint', 2, 5)
+
+        self.assertFasterThan(200, acquire)
@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api.tests.mixins import JsonClientMixin
+
+
+@override_settings(REPLICA_DATABASES=['replica_0'])
+class ReplicaRoutingTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    def reads_replica(self, method, url, data=None, **extra):
+        """
+        Выполняет запрос и проверяет, читал ли он с реплики.
+
+        Реплика тестов - основная БД, поэтому запрос выполняется как обычно.
+
+        Parameters:
+            method (str): HTTP-метод.
+            url (str): Адрес запроса.
+            data (dict, optional): JSON-тело запроса.
+
+        Returns:
+            tuple: Ответ и True, если роутер выбирал реплику.
+        """
+        with mock.patch('api.routers.random.choice', return_value='default') as choice:
+            response = self.send(method, url, data, **extra)
+        return response, choice.called
+
+    def test_get_reads_replica(self):
+        response, replica = self.reads_replica('get', reverse('doctor'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica)
+
+    def test_read_your_writes(self):
+        response, replica = self.reads_replica('post', reverse('patient'), {'name': 'Пациент'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(replica)
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        # Чтения после записи идут в основную БД, пока не истечет cookie
+        self.assertFalse(self.reads_replica('get', reverse('patient'))[1])
+
+        self.client.cookies.clear()
+        self.assertTrue(self.reads_replica('get', reverse('patient'))[1])
+        self.assertFalse(self.reads_replica('get', reverse('patient'), HTTP_X_READ_PRIMARY='1')[1])
@@ -0,0 +1,77 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from api import sharding
+from api.models import Appointment, OutboxEvent
+from api.tests import factories
+from api.tests.mixins import JsonClientMixin
+
+
+class ShardingTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.exercise, = factories.exercises(1, [cls.speciality])
+        # Пациенты с четным и нечетным ID хранят назначения в разных шардах
+        cls.patients = factories.patients(2)
+        cls.doctor, = factories.doctors(1, cls.speciality, cls.patients)
+
+    def write_map(self, ranges):
+        """
+        Записывает карту шардов во временный файл.
+
+        Parameters:
+            ranges (dict): Диапазоны корзин по алиасу шарда.
+
+        Returns:
+            str: Путь к файлу карты.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'shards.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(ranges, file)
+        return path
+
+    def test_appoint_in_patient_shard(self):
+        self.assertEqual({sharding.shard_for(patient.pk) for patient in self.patients}, {'default', 'shard_0'})
+
+        for patient in self.patients:
+            response = self.send('post', reverse('doctor_appoint', args=[self.doctor.pk]),
+                                 {'patient_id': patient.pk, 'exercise_id': self.exercise.pk})
+
+            self.assertEqual(response.status_code, 200, response.content)
+            alias = sharding.shard_for(patient.pk)
+            appointment = Appointment.objects.using(alias).get(patient_id=patient.pk)
+            self.assertEqual((appointment.doctor_id, appointment.exercise_id), (self.doctor.pk, self.exercise.pk))
+            self.assertTrue(OutboxEvent.objects.using(alias).filter(model='appointment',
+                                                                    object_id=appointment.pk).exists())
+
+    def test_reshard(self):
+        patient = next(patient for patient in self.patients if sharding.shard_for(patient.pk) == 'default')
+        appointment, = factories.appointments([(self.doctor, patient, self.exercise, None)])
+        current = self.write_map({'default': [[0, 0]], 'shard_0': [[1, 1]]})
+        # Корзина четных пациентов переезжает в shard_0
+        target = self.write_map({'shard_0': [[0, 1]]})
+
+        call_command('reshard_appointments', target, from_map=current, batch_size=1, stdout=io.StringIO())
+        # Копирование не удаляет назначения из старого шарда: процессы еще пишут по текущей карте
+        for alias in ('default', 'shard_0'):
+            self.assertTrue(Appointment.objects.using(alias).filter(pk=appointment.pk, patient=patient).exists())
+
+        call_command('reshard_appointments', target, from_map=current, cleanup=True, stdout=io.StringIO())
+        self.assertTrue(Appointment.objects.using('shard_0').filter(pk=appointment.pk, patient=patient).exists())
+        self.assertFalse(Appointment.objects.using('default').filter(patient=patient).exists())
+
+    def test_invalid_map(self):
+        for ranges in ({'default': [[0, 0]]}, {'default': [[0, 0]], 'unknown': [[1, 1]]}):
+            with self.subTest(ranges=ranges), self.assertRaises(ValueError):
+                sharding.read_shard_map(self.write_map(ranges))
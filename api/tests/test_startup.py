@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase
+
+from api.management.commands.bench_startup import measure
+
+
+class StartupTests(SimpleTestCase):
+    """
+    Холодный старт профилей APP_PROFILE (см. команду bench_startup).
+
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.full = measure('full')
+        cls.api = measure('api')
+
+    def test_api_profile_imports(self):
+        for package in ('tornado', 'livereload', 'django.contrib.admin', 'django.contrib.auth',
+                        'django.contrib.sessions', 'django.contrib.messages'):
+            with self.subTest(package=package):
+                self.assertIn(package, self.full['packages'])
+                self.assertNotIn(package, self.api['packages'])
+
+        self.assertLess(self.api['modules'], self.full['modules'])
+
+    def test_startup_budget(self):
+        self.assertLess(self.api['startup_ms'], 2000)
+        self.assertLess(self.full['startup_ms'], 3000)
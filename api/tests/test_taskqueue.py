@@ -0,0 +1,129 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from api import taskqueue
+from api.models import Task
+
+
+@taskqueue.register(name='test_flaky', max_attempts=2)
+def flaky(task, fail):
+    if fail:
+        raise ValueError('Пациент Иванов')
+    return {'ok': True}
+
+
+@taskqueue.register(name='test_slow')
+def slow(task):
+    # Попытка длится дольше stale_after: задачу возвращают в очередь и захватывает другой воркер
+    Task.objects.filter(pk=task.pk).update(heartbeat_at=timezone.now() - datetime.timedelta(hours=2))
+    taskqueue.requeue_stale(3600)
+    taskqueue.claim('other:1')
+    return {'ok': True}
+
+
+class TaskQueueTests(TestCase):
+    databases = '__all__'
+
+    def run_once(self):
+        with self.assertLogs('api.taskqueue', 'INFO'):
+            taskqueue.work(once=True)
+
+    def test_success(self):
+        task = taskqueue.enqueue(flaky, fail=False)
+
+        self.run_once()
+
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.result), (Task.SUCCEEDED, 1, {'ok': True}))
+        self.assertIsNotNone(task.finished_at)
+
+    def test_retry_backoff(self):
+        task = taskqueue.enqueue(flaky, fail=True)
+
+        started = timezone.now()
+        self.run_once()
+
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.error), (Task.PENDING, 1, 'ValueError'))
+        # Повтор через 2 ** attempts секунд, до этого воркер задачу не берет
+        self.assertGreaterEqual(task.run_after, started + datetime.timedelta(seconds=2))
+        self.assertIsNone(taskqueue.claim('test'))
+
+        Task.objects.filter(pk=task.pk).update(run_after=timezone.now())
+        self.run_once()
+
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.error), (Task.FAILED, 2, 'ValueError'))
+        self.assertIsNotNone(task.finished_at)
+
+    def test_requeue_stale(self):
+        heartbeat_at = timezone.now() - datetime.timedelta(hours=2)
+        first, last = (
+            Task.objects.create(name='test_flaky', kwargs={'fail': False}, status=Task.RUNNING, worker='lost:1',
+                                started_at=heartbeat_at, heartbeat_at=heartbeat_at, attempts=attempts,
+                                max_attempts=2)
+            for attempts in (0, 1)
+        )
+        # Задача выполняется дольше timeout, но сообщает прогресс
+        running = Task.objects.create(name='test_flaky', status=Task.RUNNING, worker='alive:1',
+                                      started_at=heartbeat_at, heartbeat_at=heartbeat_at)
+        running.set_progress(1, 10)
+
+        self.assertEqual(taskqueue.requeue_stale(3600), 1)
+
+        first.refresh_from_db()
+        last.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.worker), (Task.PENDING, 1, ''))
+        # Задача, которая роняет воркер, не возвращается в очередь бесконечно
+        self.assertEqual((last.status, last.attempts, last.error), (Task.FAILED, 2, taskqueue.WORKER_LOST))
+        self.assertEqual(running.status, Task.RUNNING)
+
+    def test_stale_attempt_result_discarded(self):
+        task = taskqueue.enqueue(slow)
+
+        claimed = taskqueue.claim('first:1')
+        with self.assertLogs('api.taskqueue', 'WARNING'):
+            self.assertFalse(taskqueue.execute(claimed))
+
+        task.refresh_from_db()
+        # Состояние задачи принадлежит второму воркеру: результат первой попытки не записан
+        self.assertEqual((task.status, task.worker, task.attempts, task.result), (Task.RUNNING, 'other:1', 1, None))
+        self.assertFalse(claimed.set_progress(1))
+
+    def test_work_requeues_periodically(self):
+        with mock.patch.object(taskqueue, 'requeue_stale', return_value=0) as requeue, \
+                mock.patch.object(taskqueue, 'REQUEUE_INTERVAL', 0):
+            task = taskqueue.enqueue(flaky, fail=False)
+            taskqueue.enqueue(flaky, fail=False)
+            self.run_once()
+
+        # Проверка перед каждой задачей и перед выходом из пустой очереди
+        self.assertEqual(requeue.call_count, 3)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.SUCCEEDED)
+
+    def test_view_hides_traceback(self):
+        task = taskqueue.enqueue(flaky, fail=True)
+        Task.objects.filter(pk=task.pk).update(max_attempts=1)
+
+        with self.assertLogs('api.taskqueue', 'ERROR') as logs:
+            taskqueue.work(once=True)
+
+        self.assertIn('Пациент Иванов', '\n'.join(logs.output))
+        response = self.client.get(reverse('task_detail', args=[task.pk]))
+        self.assertEqual(response.json()['task']['error'], 'ValueError')
+        self.assertNotIn('Иванов', str(response.json()))
+
+    def test_view_progress(self):
+        task = Task.objects.create(name='purge_deleted', progress_current=5, progress_total=10)
+
+        response = self.client.get(reverse('task_detail', args=[task.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['task']['progress'], {'current': 5, 'total': 10})
+        self.assertEqual(self.client.get(reverse('task_detail', args=[10 ** 9])).status_code, 404)
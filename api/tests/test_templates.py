@@ -0,0 +1,32 @@
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api.tests import factories
+
+
+class TemplateEngineTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.exercise, = factories.exercises(1, [cls.speciality])
+        # Пациенты с четным и нечетным ID хранят назначения в разных шардах
+        cls.patients = factories.patients(2)
+        cls.doctor, = factories.doctors(1, cls.speciality, cls.patients)
+        factories.appointments([(cls.doctor, patient, cls.exercise, None) for patient in cls.patients])
+
+    def test_exercise_pages(self):
+        # jinja2 - необязательный шаблонизатор
+        for engine in [engine.name for engine in engines.all()]:
+            with self.subTest(engine=engine), override_settings(LIST_TEMPLATE_ENGINE=engine):
+                response = self.client.get(reverse('doctor_exercises', args=[self.doctor.pk]))
+                self.assertEqual(response.status_code, 200)
+                # Назначения обоих шардов
+                for patient in self.patients:
+                    self.assertContains(response, patient.name)
+
+                response = self.client.get(reverse('patient_exercises', args=[self.patients[1].pk]))
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, self.exercise.title)
@@ -0,0 +1,157 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from api.models import Appointment, Doctor, Exercise, OutboxEvent, Patient
+from api.tests import factories
+from api.tests.mixins import JsonClientMixin
+
+
+class DoctorViewTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, = factories.specialities(1)
+        cls.patient, = factories.patients(1)
+        cls.doctor, = factories.doctors(1, cls.speciality, [cls.patient])
+
+    def test_list(self):
+        response = self.client.get(reverse('doctor'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.doctor.name)
+        self.assertContains(response, self.patient.name)
+
+    def test_detail_not_found(self):
+        response = self.client.get(reverse('doctor_detail', args=[10 ** 9]))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_create(self):
+        response = self.send('post', reverse('doctor'), {'name': 'Новый врач', 'speciality': self.speciality.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'success')
+        doctor = Doctor.objects.get(name='Новый врач')
+        event = OutboxEvent.objects.get(model='doctor', object_id=doctor.pk)
+        self.assertEqual(event.action, OutboxEvent.CREATE)
+        self.assertEqual(event.data['speciality'], self.speciality.pk)
+
+    def test_create_invalid(self):
+        response = self.send('post', reverse('doctor'), {'name': '', 'speciality': self.speciality.pk})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'error')
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_update(self):
+        response = self.send('put', reverse('doctor_detail', args=[self.doctor.pk]),
+                             {'name': 'Переименованный врач', 'speciality': self.speciality.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.name, 'Переименованный врач')
+        self.assertTrue(OutboxEvent.objects.filter(object_id=self.doctor.pk, action=OutboxEvent.UPDATE).exists())
+
+    def test_partial_update(self):
+        response = self.send('patch', reverse('doctor_detail', args=[self.doctor.pk]), {'name': 'Врач после PATCH'})
+
+        self.assertEqual(response.status_code, 200)
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.name, 'Врач после PATCH')
+        self.assertEqual(self.doctor.speciality_id, self.speciality.pk)
+
+
+class AppointTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality, other_speciality = factories.specialities(2)
+        cls.exercise, = factories.exercises(1, [cls.speciality])
+        cls.other_exercise, = factories.exercises(1, [other_speciality])
+        # Пациенты с четным и нечетным ID хранят назначения в разных шардах
+        cls.patients = factories.patients(2)
+        cls.stranger, = factories.patients(1)
+        cls.doctor, = factories.doctors(1, cls.speciality, cls.patients)
+
+    def appoint(self, patient, exercise):
+        return self.send('post', reverse('doctor_appoint', args=[self.doctor.pk]),
+                         {'patient_id': patient.pk, 'exercise_id': exercise.pk})
+
+    def test_duplicate(self):
+        self.assertEqual(self.appoint(self.patients[0], self.exercise).status_code, 200)
+
+        response = self.appoint(self.patients[0], self.exercise)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Такое назначение уже существует.')
+
+    def test_foreign_patient(self):
+        response = self.appoint(self.stranger, self.exercise)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Appointment.objects.for_patient(self.stranger.pk).exists())
+
+    def test_wrong_speciality(self):
+        response = self.appoint(self.patients[0], self.other_exercise)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Appointment.objects.for_patient(self.patients[0].pk).exists())
+
+    def test_missing_field(self):
+        response = self.send('post', reverse('doctor_appoint', args=[self.doctor.pk]), {'patient_id': 1})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class PatientViewTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    def test_create_update_delete(self):
+        self.assertEqual(self.send('post', reverse('patient'), {'name': 'Пациент'}).status_code, 200)
+        patient = Patient.objects.get(name='Пациент')
+
+        response = self.send('patch', reverse('patient_detail', args=[patient.pk]), {'name': 'Пациент 2'})
+        self.assertEqual(response.status_code, 200)
+        patient.refresh_from_db()
+        self.assertEqual(patient.name, 'Пациент 2')
+
+        self.assertEqual(self.send('delete', reverse('patient_detail', args=[patient.pk])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('patient_detail', args=[patient.pk])).status_code, 404)
+        self.assertEqual(
+            list(OutboxEvent.objects.filter(object_id=patient.pk).values_list('action', flat=True)),
+            [OutboxEvent.CREATE, OutboxEvent.UPDATE, OutboxEvent.DELETE]
+        )
+
+    def test_update_not_found(self):
+        response = self.send('put', reverse('patient_detail', args=[10 ** 9]), {'name': 'Пациент'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ExerciseViewTests(JsonClientMixin, TestCase):
+    databases = '__all__'
+
+    def test_create_invalid_frequency(self):
+        response = self.send('post', reverse('exercise'),
+                             {'title': 'Упражнение', 'description': 'Описание', 'frequency': 'never'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Exercise.objects.filter(title='Упражнение').exists())
+
+    def test_update(self):
+        exercise, = factories.exercises(1)
+
+        response = self.send('put', reverse('exercise_detail', args=[exercise.pk]),
+                             {'title': 'Новое название', 'description': 'Описание', 'frequency': Exercise.EVERY_WEEK})
+
+        self.assertEqual(response.status_code, 200)
+        exercise.refresh_from_db()
+        self.assertEqual((exercise.title, exercise.frequency), ('Новое название', Exercise.EVERY_WEEK))
+
+    def test_list(self):
+        response = self.client.get(reverse('exercise'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, Exercise.objects.first().title)
@@ -15,4 +15,11 @@ urlpatterns = [
 
     path('exercise/', views.ExerciseView.as_view(), name='exercise'),
     path('exercise/<int:pk>/', views.ExerciseView.as_view(), name='exercise_detail'),
+
+    path('tasks/<int:pk>/', views.TaskView.as_view(), name='task_detail'),
+
+    path('analytics/doctors/', views.AnalyticsView.as_view(report='doctors'), name='analytics_doctors'),
+    path('analytics/specialities/', views.AnalyticsView.as_view(report='specialities'),
+         name='analytics_specialities'),
+    path('analytics/frequencies/', views.AnalyticsView.as_view(report='frequencies'), name='analytics_frequencies'),
 ]
@@ -1,14 +1,20 @@
 import json
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import QuerySet
-from django.http import HttpResponse
+from django.db.models import QuerySet, prefetch_related_objects
+from django.http import Http404, HttpResponse
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.cache import cache_page
 
-from api.models import Doctor, Patient, Exercise, Appointment
+from api import analytics, batch, outbox, permission_graph
+from api.deletion import delete_object_or_404
+from api.events import publish_appointment
+from api.models import Doctor, Patient, Exercise, Appointment, OutboxEvent, Task
 
 
 def api(request):
@@ -32,11 +38,53 @@ def api(request):
     return HttpResponse('<h1>API page</h1>')
 
 
+def batch_response(request, queryset, pk=None):
+    """
+    Возвращает записи в JSON для запросов с параметрами ids и fields (см. api/batch.py).
+
+    Parameters:
+        request (HttpRequest): Объект запроса от клиента.
+        queryset (QuerySet): Записи, из которых выбираются запрошенные.
+        pk (int, optional): ID записи, если запрос к деталям записи.
+
+    Returns:
+        JsonResponse: JSON-ответ с записями и запрошенными ID, которых нет, или ошибкой в параметрах.
+
+    Raises:
+        Http404: Если не найдена запись с ID pk.
+    """
+    try:
+        results, missing = batch.lookup(queryset, request.GET, pk)
+    except ValueError as e:
+        return JsonResponse(
+            {
+                'status': 'error',
+                'message': str(e)
+            },
+            status=400
+        )
+
+    if pk is not None and not results:
+        raise Http404(f'Не найдена запись с ID {pk}.')
+
+    return JsonResponse(
+        {
+            'status': 'success',
+            'results': results,
+            'missing': missing
+        }
+    )
+
+
 class DoctorView(View):
     """
     Класс представления для работы с доктором.
 
+    Attributes:
+        use_replica (bool): GET-запросы читают данные с реплик БД (см. api/routers.py).
+
     """
+    use_replica = True
 
     def get(self, request, pk=None):
         """
@@ -48,26 +96,35 @@ class DoctorView(View):
 
         Returns:
             HttpResponse: HTTP-ответ с отображением списка докторов или деталей конкретного доктора.
+                С параметрами ids и fields - JSON-ответ только с запрошенными докторами и полями (см. batch_response).
 
         Raises:
             Http404: Если не найден доктор с указанным ID (при запросе деталей конкретного доктора).
         """
 
+        if ('ids' in request.GET or 'fields' in request.GET) and not request.path.endswith('exercises/'):
+            return batch_response(request, Doctor.objects.all(), pk)
+
         template = 'api/html/doctor.html'
+        using = None
 
         if pk is not None:
             doctors = get_object_or_404(Doctor, pk=pk)
 
-            template = 'api/html/doctor_exercises.html' \
-                if request.path.endswith('exercises/') \
-                else template
+            if request.path.endswith('exercises/'):
+                template = 'api/html/doctor_exercises.html'
+                using = settings.LIST_TEMPLATE_ENGINE
+                # Назначения хранятся в шардах, поэтому загружаются отдельно от врача
+                doctors.appointments = Appointment.objects.for_doctor(pk)
+                prefetch_related_objects(doctors.appointments, 'patient', 'exercise')
         else:
             doctors = Doctor.objects.all()
 
         return render(
             request,
             template,
-            context={'doctors': doctors if isinstance(doctors, QuerySet) else [doctors]}
+            context={'doctors': doctors if isinstance(doctors, QuerySet) else [doctors]},
+            using=using
         )
 
     def post(self, request, pk=None):
@@ -94,10 +151,13 @@ class DoctorView(View):
                 exercise = Exercise.objects.get(pk=exercise_id)
                 patient = Patient.objects.get(pk=patient_id)
 
-                if exercise.specialisations.filter(pk=doctor.speciality.pk).exists():
-                    if patient in doctor.patients.all():
-                        appointment_exists = Appointment.objects.filter(doctor=doctor, patient=patient,
-                                                                        exercise=exercise).exists()
+                if permission_graph.exercise_has_speciality(exercise, doctor.speciality_id):
+                    if permission_graph.doctor_has_patient(doctor, patient.pk):
+                        # Проверяются все назначения шарда пациента, а не только свежие партиции
+                        appointment_exists = Appointment.objects.for_patient(patient.pk).filter(
+                            doctor=doctor,
+                            exercise=exercise
+                        ).exists()
                         if appointment_exists:
                             return JsonResponse(
                                 {
@@ -115,7 +175,8 @@ class DoctorView(View):
                                 appointment_date=timezone.now()  # Используем из модуля django.utils.timezone
                             )
                             appointment.full_clean()
-                            appointment.save()
+                            outbox.save(appointment, OutboxEvent.CREATE)
+                            publish_appointment(appointment)
 
                             return JsonResponse(
                                 {
@@ -157,7 +218,7 @@ class DoctorView(View):
             )
 
             doctor.full_clean()
-            doctor.save()
+            outbox.save(doctor, OutboxEvent.CREATE)
 
             return JsonResponse(
                 {
@@ -196,7 +257,7 @@ class DoctorView(View):
             doctor.speciality_id = data['speciality']
 
             doctor.full_clean()
-            doctor.save()
+            outbox.save(doctor, OutboxEvent.UPDATE)
 
             return JsonResponse(
                 {
@@ -238,7 +299,7 @@ class DoctorView(View):
                 doctor.speciality_id = data['speciality']
 
             doctor.full_clean()
-            doctor.save()
+            outbox.save(doctor, OutboxEvent.UPDATE)
 
             return JsonResponse(
                 {
@@ -271,8 +332,7 @@ class DoctorView(View):
 
         """
 
-        doctor = get_object_or_404(Doctor, pk=pk)
-        doctor.delete()
+        delete_object_or_404(Doctor, pk)
 
         return JsonResponse(
             {
@@ -286,7 +346,11 @@ class PatientView(View):
     """
     Класс представления для работы с пациентом.
 
+    Attributes:
+        use_replica (bool): GET-запросы читают данные с реплик БД (см. api/routers.py).
+
     """
+    use_replica = True
 
     def get(self, request, pk=None):
         """
@@ -299,27 +363,36 @@ class PatientView(View):
 
         Returns:
             HttpResponse: Ответ с отображением информации о пациентах.
+                С параметрами ids и fields - JSON-ответ только с запрошенными пациентами и полями (см. batch_response).
 
         Raises:
             Http404: Если не найден пациент с указанным ID.
 
         """
 
+        if ('ids' in request.GET or 'fields' in request.GET) and not request.path.endswith('exercises/'):
+            return batch_response(request, Patient.objects.all(), pk)
+
         template = 'api/html/patient.html'
+        using = None
 
         if pk is not None:
             patients = get_object_or_404(Patient, pk=pk)
 
-            template = 'api/html/patient_exercises.html' \
-                if request.path.endswith('exercises/') \
-                else template
+            if request.path.endswith('exercises/'):
+                template = 'api/html/patient_exercises.html'
+                using = settings.LIST_TEMPLATE_ENGINE
+                # Назначения хранятся в шардах, поэтому загружаются отдельно от пациента
+                patients.appointments = list(Appointment.objects.for_patient(pk))
+                prefetch_related_objects(patients.appointments, 'doctor', 'exercise')
         else:
             patients = Patient.objects.all()
 
         return render(
             request,
             template,
-            context={'patients': patients if isinstance(patients, QuerySet) else [patients]}
+            context={'patients': patients if isinstance(patients, QuerySet) else [patients]},
+            using=using
         )
 
     def post(self, request):
@@ -344,7 +417,7 @@ class PatientView(View):
             )
 
             patient.full_clean()
-            patient.save()
+            outbox.save(patient, OutboxEvent.CREATE)
 
             return JsonResponse(
                 {
@@ -383,7 +456,7 @@ class PatientView(View):
             patient.name = data['name']
 
             patient.full_clean()
-            patient.save()
+            outbox.save(patient, OutboxEvent.UPDATE)
 
             return JsonResponse(
                 {
@@ -423,7 +496,7 @@ class PatientView(View):
                 patient.name = data['name']
 
             patient.full_clean()
-            patient.save()
+            outbox.save(patient, OutboxEvent.UPDATE)
 
             return JsonResponse(
                 {
@@ -453,8 +526,7 @@ class PatientView(View):
 
         """
 
-        patient = get_object_or_404(Patient, pk=pk)
-        patient.delete()
+        delete_object_or_404(Patient, pk)
 
         return JsonResponse(
             {
@@ -468,7 +540,11 @@ class ExerciseView(View):
     """
     Класс представления для работы с упражнением.
 
+    Attributes:
+        use_replica (bool): GET-запросы читают данные с реплик БД (см. api/routers.py).
+
     """
+    use_replica = True
 
     def get(self, request, pk=None):
         """
@@ -481,10 +557,14 @@ class ExerciseView(View):
 
         Returns:
             HttpResponse or JsonResponse: Ответ с HTML-страницей (если запрошен список упражнений) или JSON-ответом
-            с информацией об упражнении (если передан идентификатор упражнения).
+            с информацией об упражнении (если передан идентификатор упражнения). С параметрами ids и fields -
+            JSON-ответ только с запрошенными упражнениями и полями (см. batch_response).
 
         """
 
+        if 'ids' in request.GET or 'fields' in request.GET:
+            return batch_response(request, Exercise.objects.all(), pk)
+
         template = 'api/html/exercise.html'
 
         if pk is not None:
@@ -519,7 +599,7 @@ class ExerciseView(View):
             )
 
             exercise.full_clean()
-            exercise.save()
+            outbox.save(exercise, OutboxEvent.CREATE)
 
             return JsonResponse(
                 {
@@ -557,7 +637,7 @@ class ExerciseView(View):
             exercise.frequency = data['frequency']
 
             exercise.full_clean()
-            exercise.save()
+            outbox.save(exercise, OutboxEvent.UPDATE)
 
             return JsonResponse(
                 {
@@ -598,7 +678,7 @@ class ExerciseView(View):
                 exercise.frequency = data['frequency']
 
             exercise.full_clean()
-            exercise.save()
+            outbox.save(exercise, OutboxEvent.UPDATE)
 
             return JsonResponse(
                 {
@@ -628,8 +708,7 @@ class ExerciseView(View):
 
         """
 
-        exercise = get_object_or_404(Exercise, pk=pk)
-        exercise.delete()
+        delete_object_or_404(Exercise, pk)
 
         return JsonResponse(
             {
@@ -637,3 +716,106 @@ class ExerciseView(View):
                 'message': 'Упражнение успешно удалено.'
             }
         )
+
+
+class TaskView(View):
+    """
+    Класс представления для отслеживания фоновых задач.
+
+    """
+
+    def get(self, request, pk):
+        """
+        Обработчик GET-запроса для получения статуса и прогресса фоновой задачи.
+
+        Parameters:
+            request (HttpRequest): Объект запроса от клиента.
+            pk (int): Идентификатор задачи.
+
+        Returns:
+            JsonResponse: JSON-ответ со статусом, прогрессом и результатом задачи.
+
+        Raises:
+            Http404: Если не найдена задача с указанным ID.
+
+        """
+
+        task = get_object_or_404(Task, pk=pk)
+
+        return JsonResponse(
+            {
+                'status': 'success',
+                'task': {
+                    'id': task.pk,
+                    'name': task.name,
+                    'status': task.status,
+                    'attempts': task.attempts,
+                    'progress': {
+                        'current': task.progress_current,
+                        'total': task.progress_total,
+                    },
+                    'result': task.result,
+                    'error': task.error if task.status == Task.FAILED else None,
+                    'created_at': task.created_at,
+                    'finished_at': task.finished_at,
+                }
+            }
+        )
+
+
+@method_decorator(cache_page(settings.ANALYTICS_CACHE_TIMEOUT), name='get')
+class AnalyticsView(View):
+    """
+    Класс представления для аналитики нагрузки врачей.
+
+    Отчеты считаются группирующими запросами на стороне БД (см. api/analytics.py), а ответы кэшируются
+    на ANALYTICS_CACHE_TIMEOUT секунд с учетом параметров запроса.
+
+    Attributes:
+        use_replica (bool): Отчеты читают данные с реплик БД (см. api/routers.py).
+        report (str): Имя отчета: "doctors", "specialities" или "frequencies". Передается в as_view().
+
+    """
+    use_replica = True
+    report = None
+
+    def get(self, request):
+        """
+        Обработчик GET-запроса для получения отчета.
+
+        Parameters:
+            request (HttpRequest): Объект запроса от клиента. GET-параметры from и to (YYYY-MM-DD) задают
+                временное окно, period (hour, day, week или month) - шаг группировки.
+
+        Returns:
+            JsonResponse: JSON-ответ с записями отчета или ошибкой в параметрах.
+
+        """
+
+        try:
+            start, end, period = analytics.parse_window(request.GET)
+        except ValueError as e:
+            return JsonResponse(
+                {
+                    'status': 'error',
+                    'message': str(e)
+                },
+                status=400
+            )
+
+        if self.report == 'doctors':
+            results = analytics.doctor_workload(start, end)
+        elif self.report == 'specialities':
+            results = analytics.appointments_by_speciality(start, end, period)
+        else:
+            results = analytics.appointments_by_frequency(start, end, period)
+
+        return JsonResponse(
+            {
+                'status': 'success',
+                'from': start,
+                'to': end,
+                'period': period,
+                'results': results
+            }
+        )
@@ -6,6 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    # Тесты по умолчанию выполняются на SQLite (см. urbanmedic/test_settings.py)
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urbanmedic.test_settings')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urbanmedic.settings')
     try:
         from django.core.management import execute_from_command_line
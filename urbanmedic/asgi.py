@@ -3,6 +3,10 @@ ASGI config for urbanmedic project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Server-sent event streams (``/api/patient/<pk>/events/`` and ``/api/doctor/<pk>/events/``)
+are served by ``api.events.EventStreamApplication`` in front of Django, so they are only
+available when the project runs under an ASGI server (uvicorn, daphne).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -13,4 +17,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urbanmedic.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.events import EventStreamApplication  # noqa: E402
+
+application = EventStreamApplication(django_application)
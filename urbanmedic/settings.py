@@ -10,8 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
-from decouple import config
+from decouple import Choices, Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,7 +25,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config("DEBUG", default=True, cast=bool)
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1']
 
@@ -45,13 +46,30 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'api.middleware.RateLimitMiddleware',
+    'api.middleware.IdempotencyMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Профиль приложения: "full" - API, админка, сессии и livereload; "api" - только то, что нужно маршрутам /api/.
+# Процессы с профилем "api" не импортируют админку, авторизацию, сессии и livereload (вместе с tornado),
+# поэтому быстрее стартуют и занимают меньше памяти. Миграции выполняются с профилем "full".
+APP_PROFILE = config("APP_PROFILE", default="full", cast=Choices(['full', 'api']))
+
+if APP_PROFILE == 'api':
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app in ('api', 'static_precompiler')]
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if not middleware.startswith(('django.contrib.sessions.', 'django.contrib.auth.', 'django.contrib.messages.'))
+    ]
+
 ROOT_URLCONF = 'urbanmedic.urls'
 
 TEMPLATES = [
@@ -59,18 +77,43 @@ TEMPLATES = [
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Загрузчик убирает отступы из HTML-шаблонов проекта при компиляции, кэширующий загрузчик хранит результат.
+            # Шаблоны остальных приложений (админки) загружаются без изменений
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    ('api.template_loaders.FilesystemLoader', [BASE_DIR / 'templates', BASE_DIR / 'api' / 'templates']),
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
+            ] + ([
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-            ],
+            ] if APP_PROFILE == 'full' else []),
         },
     },
 ]
 
+# Jinja2 - необязательный шаблонизатор для больших списков назначений (pip install jinja2).
+# Шаблоны лежат в api/jinja2, перечитываются с диска только при перезапуске процесса, как и шаблоны Django.
+if find_spec('jinja2') is not None:
+    TEMPLATES.append({
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'environment': 'api.jinja2_env.environment',
+            'auto_reload': False,
+        },
+    })
+
+# Шаблонизатор страниц назначений врача и пациента (doctor/<pk>/exercises/, patient/<pk>/exercises/):
+# "django" или "jinja2".
+LIST_TEMPLATE_ENGINE = config("LIST_TEMPLATE_ENGINE", default="django")
+
 WSGI_APPLICATION = 'urbanmedic.wsgi.application'
 
 
@@ -88,6 +131,44 @@ DATABASES = {
     }
 }
 
+# Реплики основной БД для чтения: список адресов "host" или "host:port" через запятую.
+# Каждая реплика становится отдельной БД с алиасом replica_<номер> (см. api/routers.py).
+for index, replica in enumerate(config("DB_REPLICAS", default="", cast=Csv())):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Дополнительные шарды назначений: список адресов "host" или "host:port" через запятую.
+# Каждый шард становится отдельной БД с алиасом shard_<номер> (см. api/sharding.py).
+for index, shard in enumerate(config("DB_SHARDS", default="", cast=Csv())):
+    host, _, port = shard.partition(':')
+    DATABASES[f'shard_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+    }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias.startswith('replica_')]
+
+# Шарды назначений. Основная БД остается первым шардом, поэтому без DB_SHARDS все работает как раньше.
+APPOINTMENT_SHARDS = ['default'] + [alias for alias in DATABASES if alias.startswith('shard_')]
+
+# Количество корзин, по которым распределяются пациенты (patient_id % SHARD_BUCKETS), и файл карты
+# корзин по шардам. При нескольких шардах файл обязателен: карта, вычисленная по списку шардов, изменилась бы
+# при добавлении шарда, и пациенты молча переехали бы в другие шарды без своих назначений.
+SHARD_BUCKETS = 1024
+SHARD_MAP_FILE = config("SHARD_MAP_FILE") if len(APPOINTMENT_SHARDS) > 1 else config("SHARD_MAP_FILE", default="")
+
+DATABASE_ROUTERS = ['api.sharding.ShardRouter', 'api.routers.PrimaryReplicaRouter']
+
+# Время в секундах, в течение которого чтения клиента после записи идут в основную БД.
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)
+REPLICA_STICKY_COOKIE = 'primary_until'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -141,3 +222,86 @@ STATICFILES_FINDERS = (
 )
 
 STATIC_ROOT = BASE_DIR / 'static'
+
+# LESS компилируется при сборке (python manage.py compilestatic), а не при рендеринге: фильтр compile в шаблонах
+# только подставляет путь к скомпилированному файлу, не проверяя актуальность исходников на диске.
+STATIC_PRECOMPILER_DISABLE_AUTO_COMPILE = config(
+    "STATIC_PRECOMPILER_DISABLE_AUTO_COMPILE", default=not DEBUG, cast=bool
+)
+
+# Мягкое удаление врачей, пациентов и упражнений: DELETE-запрос только помечает запись удаленной,
+# а связанные назначения физически удаляются фоновой задачей (`python manage.py run_tasks`).
+SOFT_DELETE = config("SOFT_DELETE", default=False, cast=bool)
+
+# Транспорт событий о назначениях для SSE-потоков: "local" - внутрипроцессный pub/sub,
+# "postgres" - LISTEN/NOTIFY для доставки событий между процессами.
+EVENTS_BACKEND = config("EVENTS_BACKEND", default="local")
+
+# Время кэширования ответов /api/analytics/ в секундах.
+ANALYTICS_CACHE_TIMEOUT = config("ANALYTICS_CACHE_TIMEOUT", default=60, cast=int)
+
+# Минимальный размер ответа в байтах, начиная с которого CompressionMiddleware сжимает ответ.
+COMPRESSION_MIN_LENGTH = config("COMPRESSION_MIN_LENGTH", default=200, cast=int)
+
+# Количество последних месяцев, назначения за которые остаются в БД: более старые месяцы
+# команда appointment_partitions выгружает в архив.
+APPOINTMENT_HOT_MONTHS = config("APPOINTMENT_HOT_MONTHS", default=12, cast=int)
+
+# Ограничение частоты изменяющих запросов: маркерная корзина на пару (IP клиента, маршрут).
+# RATELIMIT_RATE - запросов в секунду, RATELIMIT_BURST - допустимый всплеск; RATELIMIT_ROUTES задает
+# лимиты (запросов в секунду, всплеск) для отдельных маршрутов по имени URL.
+RATELIMIT_RATE = config("RATELIMIT_RATE", default=10, cast=float)
+RATELIMIT_BURST = config("RATELIMIT_BURST", default=20, cast=int)
+RATELIMIT_ROUTES = {
+    'doctor_appoint': (2, 5),
+}
+
+# Алиас кэша из CACHES для корзин, общих для всех процессов. По умолчанию корзины хранятся в памяти процесса.
+RATELIMIT_CACHE = config("RATELIMIT_CACHE", default="")
+
+# Количество доверенных обратных прокси перед приложением. Если больше 0, IP клиента для ограничения частоты
+# берется из X-Forwarded-For (N-й адрес с конца), иначе - из REMOTE_ADDR.
+RATELIMIT_PROXY_HOPS = config("RATELIMIT_PROXY_HOPS", default=0, cast=int)
+
+# Контроль допуска изменяющих запросов: максимум одновременно выполняемых запросов на процесс
+# и среднее время одного SQL-запроса в миллисекундах, выше которого запросы выполняются по одному.
+ADMISSION_MAX_CONCURRENT = config("ADMISSION_MAX_CONCURRENT", default=16, cast=int)
+ADMISSION_DB_LATENCY_MS = config("ADMISSION_DB_LATENCY_MS", default=100, cast=int)
+
+# Время хранения ответов на POST-запросы с заголовком Idempotency-Key в секундах.
+IDEMPOTENCY_TTL = config("IDEMPOTENCY_TTL", default=86400, cast=int)
+
+# Время в секундах, на которое ключ Idempotency-Key занимается выполняющимся запросом. Должно быть не меньше
+# таймаута обработки запроса (таймаута воркера и прокси): после него ключ, занятый упавшим процессом,
+# освобождается, и повтор выполняет запрос заново.
+IDEMPOTENCY_LEASE = config("IDEMPOTENCY_LEASE", default=300, cast=int)
+
+# Файл снимка связей врачей, пациентов и упражнений, по которому проверяются права на назначение
+# (см. api/permission_graph.py). Снимок строится командой build_permission_snapshot; пустое значение -
+# проверки выполняются запросами к БД. Снимок старше PERMISSION_SNAPSHOT_MAX_AGE секунд не используется.
+PERMISSION_SNAPSHOT_FILE = config("PERMISSION_SNAPSHOT_FILE", default="")
+PERMISSION_SNAPSHOT_MAX_AGE = config("PERMISSION_SNAPSHOT_MAX_AGE", default=300, cast=int)
+
+# Профилирование SQL-запросов (см. api/middleware.py, ProfilingMiddleware): доля профилируемых запросов,
+# разрешение профилировать запрос заголовком X-Profile (выключено по умолчанию: заголовок может прислать
+# любой клиент), порог медленного запроса в миллисекундах, файл журнала медленных запросов (пустое
+# значение - логгер api.profiling) и каталог для флеймграфов.
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+PROFILING_HEADER = config("PROFILING_HEADER", default=False, cast=bool)
+SLOW_QUERY_MS = config("SLOW_QUERY_MS", default=100, cast=float)
+SLOW_QUERY_LOG = config("SLOW_QUERY_LOG", default=str(BASE_DIR / 'slow_queries.log'))
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / 'profiles'))
+
+# Максимальное количество ID в параметре ids запросов списков врачей, пациентов и упражнений (см. api/batch.py).
+BATCH_MAX_IDS = config("BATCH_MAX_IDS", default=100, cast=int)
+
+# Минимальное ожидаемое количество строк, начиная с которого списки врачей, пациентов и назначений в админке
+# берут количество записей из оценки планировщика Postgres вместо COUNT(*) (см. api/admin.py).
+ADMIN_ESTIMATED_COUNT_MIN = config("ADMIN_ESTIMATED_COUNT_MIN", default=100000, cast=int)
+
+# Время в секундах, которое события после пропуска в ID ждут фиксации транзакции с пропущенным ID, прежде
+# чем позиция потребителя пройдет пропуск (см. api/outbox.py)
+OUTBOX_GAP_TIMEOUT = config("OUTBOX_GAP_TIMEOUT", default=30, cast=float)
+# Время в секундах, в течение которого пропуск в ID, пройденный позицией потребителя, ждет событий долгих
+# транзакций. Должно быть больше времени самой долгой транзакции, изменяющей данные.
+OUTBOX_GAP_RETENTION = config("OUTBOX_GAP_RETENTION", default=3600, cast=float)
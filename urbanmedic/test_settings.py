@@ -0,0 +1,53 @@
+"""
+Настройки для тестов: python manage.py test [--parallel].
+
+Тесты выполняются на SQLite в памяти и не требуют Postgres и переменных окружения. Назначения хранятся
+в двух шардах (default и shard_0), поэтому тесты проходят через те же маршруты шардирования, что и продакшен.
+Тестовые данные создаются один раз на процесс (см. api/tests/runner.py), а каждый тест откатывается транзакцией.
+"""
+
+import os
+
+# Основные настройки требуют этих переменных, но тестам они не нужны: БД заменяется ниже
+for name in ('SECRET_KEY', 'DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_PORT'):
+    os.environ.setdefault(name, 'test')
+
+from urbanmedic.settings import *  # noqa: E402,F401,F403
+
+DEBUG = False
+
+# Тестовые БД создаются в памяти: при --parallel каждый процесс получает свою копию
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'shard_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+REPLICA_DATABASES = []
+APPOINTMENT_SHARDS = ['default', 'shard_0']
+# Две корзины: пациенты с четными ID хранятся в default, с нечетными - в shard_0
+SHARD_BUCKETS = 2
+SHARD_MAP_FILE = BASE_DIR / 'api' / 'tests' / 'shard_map.json'
+
+TEST_RUNNER = 'api.tests.runner.SeededTestRunner'
+
+# Быстрый хешер для пользователей админки, созданных в тестах
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+STATIC_PRECOMPILER_DISABLE_AUTO_COMPILE = True
+SOFT_DELETE = False
+EVENTS_BACKEND = 'local'
+RATELIMIT_CACHE = ''
+PERMISSION_SNAPSHOT_FILE = ''
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_HEADER = False